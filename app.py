@@ -19,6 +19,7 @@ from src.ui.cards import render_review_cards_tab
 from src.ui.dashboard import render_dashboard_tab
 from src.ui.training import render_training_tab
 from src.ui.menu import render_menu_tab
+from src.watcher import start_watcher
 
 # 초기 설정
 st.set_page_config(**get_page_config())
@@ -31,6 +32,8 @@ def main():
 
     # 사이드바 렌더링 (여기서 store_name을 받음)
     selected_tone, store_name = render_sidebar()
+    # (선택) KB_WATCH=1이면 UI 밖에서 바뀐 현재 가게의 템플릿/메뉴 파일을 자동 반영
+    start_watcher()
 
     # 탭 구성
     tab1, tab2, tab3, tab4 = st.tabs([
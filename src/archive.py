@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+from pathlib import Path
+import pandas as pd
+from filelock import FileLock
+from src import tenancy
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+LEGACY_FILE = "saved_reviews.json"
+ARCHIVE_DIR_NAME = "saved_reviews"
+MANIFEST_FILE = "manifest.json"
+ID_INDEX_FILE = "id_index.json"
+# 가게별 데이터 폴더 아래 run/ (저장 기록 쓰기를 세션/작업 워커/다른 프로세스 사이에서 직렬화)
+WRITE_LOCK_NAME = "saved_reviews.lock"
+
+# timestamp가 없는 구형 데이터용 파티션 (기간 조회에서는 제외, 전체 조회에서만 포함)
+UNDATED_PARTITION = "undated"
+
+
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+
+def _archive_dir():
+    return tenancy.data_dir() / ARCHIVE_DIR_NAME
+
+
+def write_lock():
+    """
+    현재 가게의 저장 기록(파티션/ID 색인/집계/스냅샷) 쓰기 잠금.
+    같은 스레드에서는 다시 잡을 수 있고, 다른 스레드/프로세스와는 파일 잠금으로 겹치지 않습니다.
+    """
+    lock_path = tenancy.data_dir() / "run" / WRITE_LOCK_NAME
+    with _write_locks_guard:
+        lock = _write_locks.get(lock_path)
+        if lock is None:
+            lock_path.parent.mkdir(parents=True, exist_ok=True)
+            lock = _write_locks[lock_path] = FileLock(str(lock_path))
+        return lock
+
+
+def _read_json(path, default):
+    if not path.exists():
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return default
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def local_timestamp(value):
+    """
+    저장 기록의 시각 값 -> 로컬 시간 기준 tz 없는 Timestamp (없거나 읽을 수 없으면 None).
+    앱은 시각을 로컬 시간(tz 없음)으로 기록하므로, tz가 붙은 값(가져온 파일 등)도 로컬 시간으로 바꿔
+    파티션/집계/스냅샷/대시보드 기간/스케줄러가 모두 같은 시간대를 쓰도록 합니다.
+    """
+    if value is None or value == "":
+        return None
+    try:
+        ts = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        return None
+    if pd.isna(ts):
+        return None
+    if ts.tzinfo is not None:
+        ts = pd.Timestamp(ts.to_pydatetime().astimezone().replace(tzinfo=None))
+    return ts
+
+
+def partition_key(review):
+    """리뷰가 속할 월 파티션 키 (YYYY-MM)"""
+    ts = local_timestamp(review.get("timestamp"))
+    return ts.strftime("%Y-%m") if ts is not None else UNDATED_PARTITION
+
+
+def _sort_key(key):
+    # undated 파티션은 가장 오래된 것으로 취급
+    return (key != UNDATED_PARTITION, key)
+
+
+def _partition_path(key):
+    return _archive_dir() / f"{key}.json"
+
+
+def load_manifest():
+    """파티션별 {min_ts, max_ts, count} 목록"""
+    ensure_migrated()
+    return _read_json(_archive_dir() / MANIFEST_FILE, {"partitions": {}})
+
+
+def _load_id_index():
+    return _read_json(_archive_dir() / ID_INDEX_FILE, {})
+
+
+def load_partition(key):
+    return _read_json(_partition_path(key), [])
+
+
+def _summarize(records):
+    stamps = [str(ts) for ts in (local_timestamp(r.get("timestamp")) for r in records) if ts is not None]
+    return {
+        "count": len(records),
+        "min_ts": min(stamps) if stamps else None,
+        "max_ts": max(stamps) if stamps else None
+    }
+
+
+def _write_partition(manifest, key, records):
+    if records:
+        _write_json(_partition_path(key), records)
+        manifest["partitions"][key] = _summarize(records)
+    else:
+        _partition_path(key).unlink(missing_ok=True)
+        manifest["partitions"].pop(key, None)
+
+
+# ------------------------------------------------------------------
+# [Migration] 단일 saved_reviews.json -> 월별 파티션
+# ------------------------------------------------------------------
+def ensure_migrated():
+    """구형 단일 파일이 남아있으면 월별 파티션으로 분할 (최초 1회)"""
+    legacy_path = tenancy.data_dir() / LEGACY_FILE
+    if not legacy_path.exists() or (_archive_dir() / MANIFEST_FILE).exists():
+        return
+
+    with write_lock():
+        # 잠금을 기다리는 동안 다른 세션이 이미 옮겼으면 건너뜀
+        if not legacy_path.exists() or (_archive_dir() / MANIFEST_FILE).exists():
+            return
+        _migrate(legacy_path)
+
+
+def _migrate(legacy_path):
+    legacy = _read_json(legacy_path, [])
+    print(f"[INFO] Migrating {len(legacy)} saved reviews into monthly partitions...")
+
+    partitions = {}
+    for review in legacy:
+        partitions.setdefault(partition_key(review), []).append(review)
+
+    manifest = {"partitions": {}}
+    id_index = {}
+    for key, records in partitions.items():
+        _write_partition(manifest, key, records)
+        for r in records:
+            if r.get("id"):
+                id_index[r["id"]] = key
+
+    _write_json(_archive_dir() / ID_INDEX_FILE, id_index)
+    _write_json(_archive_dir() / MANIFEST_FILE, manifest)
+
+    # 원본은 지우지 않고 이름만 바꿔 보관
+    os.replace(legacy_path, legacy_path.with_suffix(".json.migrated"))
+    print(f"[SUCCESS] Migrated into {len(manifest['partitions'])} partitions.")
+
+
+# ------------------------------------------------------------------
+# [Write] ID 기준 upsert
+# ------------------------------------------------------------------
+def upsert_review(review):
+    """
+    리뷰를 해당 월 파티션에 저장합니다. 같은 ID가 있으면 교체합니다. (호출 시 write_lock() 보유)
+    교체된 이전 레코드(없으면 None)와 이전 파티션 키를 반환합니다.
+    """
+    manifest = load_manifest()
+    id_index = _load_id_index()
+
+    target_id = review.get("id")
+    new_key = partition_key(review)
+    old_record, old_key = None, id_index.get(target_id) if target_id else None
+
+    if old_key:
+        old_records = load_partition(old_key)
+        for idx, item in enumerate(old_records):
+            if item.get("id") == target_id:
+                old_record = old_records.pop(idx)
+                break
+        if old_key != new_key:
+            _write_partition(manifest, old_key, old_records)
+
+    records = old_records if old_key == new_key else load_partition(new_key)
+    records.append(review)
+    _write_partition(manifest, new_key, records)
+
+    if target_id:
+        id_index[target_id] = new_key
+        _write_json(_archive_dir() / ID_INDEX_FILE, id_index)
+    _write_json(_archive_dir() / MANIFEST_FILE, manifest)
+
+    return old_record, old_key
+
+
+# ------------------------------------------------------------------
+# [Read] 필요한 파티션만 열기
+# ------------------------------------------------------------------
+def partitions_since(since=None):
+    """since(Timestamp) 이후 데이터가 있을 수 있는 파티션 키만 오래된 순으로 반환"""
+    keys = []
+    partitions = load_manifest()["partitions"]
+    for key in sorted(partitions, key=_sort_key):
+        info = partitions[key]
+        if since is not None:
+            if key == UNDATED_PARTITION or not info.get("max_ts"):
+                continue
+            if local_timestamp(info["max_ts"]) < since:
+                continue
+        keys.append(key)
+    return keys
+
+
+def load_reviews(since=None):
+    """since 이후 저장된 리뷰 (since가 None이면 전체)"""
+    reviews = []
+    for key in partitions_since(since):
+        for r in load_partition(key):
+            if since is None:
+                reviews.append(r)
+                continue
+            ts = local_timestamp(r.get("timestamp"))
+            if ts is not None and ts >= since:
+                reviews.append(r)
+    return reviews
+
+
+def iter_reviews():
+    """저장된 전체 리뷰를 파티션 하나씩 읽으며 순회 (한 번에 한 파티션만 메모리에 올림)"""
+    for key in partitions_since(None):
+        yield from load_partition(key)
+
+
+def load_recent_partitions(n):
+    """최근 n개 월 파티션의 리뷰와, 더 오래된 파티션이 남아있는지 여부"""
+    keys = sorted(load_manifest()["partitions"], key=_sort_key)
+    selected = keys[-n:] if n else keys
+    reviews = []
+    for key in selected:
+        reviews.extend(load_partition(key))
+    return reviews, len(selected) < len(keys)
+
+
+def count_reviews():
+    return sum(info["count"] for info in load_manifest()["partitions"].values())
+
+
+def clear_archive():
+    """저장 기록 전체 삭제 (호출 시 write_lock() 보유)"""
+    archive_dir = _archive_dir()
+    if archive_dir.exists():
+        for path in archive_dir.glob("*.json"):
+            path.unlink(missing_ok=True)
+    _write_json(archive_dir / MANIFEST_FILE, {"partitions": {}})
+    _write_json(archive_dir / ID_INDEX_FILE, {})
@@ -0,0 +1,292 @@
+"""
+헤드리스 일괄 답글 생성 (Streamlit 없이 실행)
+
+사용 예:
+    python -m src.batch reviews.jsonl --tone 친근한 --concurrency 4
+    python -m src.batch reviews.csv --kobert-workers 2
+    python -m src.batch reviews.jsonl --store tteokbokki-gangnam
+
+- 입력: JSONL / CSV / JSON 배열 / XLSX (customer_name, menu_name, text 컬럼. id는 선택, 플랫폼 내보내기 컬럼명도 인식)
+- KoBERT 감정 분석은 프로세스 풀에서, LLM 호출은 asyncio 동시 실행으로 처리합니다.
+- 답글은 톤/감정이 같은 리뷰끼리 묶어 한 번의 호출로 생성합니다. (--group-size, 실패한 건만 개별 재생성)
+- 고정/낮은 별점/오래된 리뷰를 먼저, KoBERT 분석이 끝난 묶음 안에서는 부정 리뷰를 먼저 처리합니다.
+  --time-budget / --call-budget을 다 쓰면 새 묶음을 시작하지 않고 멈추며, 남은 리뷰는 다시 실행하면 이어서 처리합니다.
+  (--call-budget은 호출마다 차감하므로 처리 중인 묶음에서도 예산을 넘는 호출은 보내지 않습니다)
+- 결과는 한 건씩 결과 파일(JSONL)에 바로 기록되며, 중단 후 다시 실행하면 이어서 처리합니다.
+- 완료 후 결과를 draft_reviews.json에 반영하여 리뷰 관리 탭에서 바로 확인할 수 있습니다.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from dotenv import load_dotenv
+
+# 가게별 데이터 폴더 아래 batch/
+BATCH_DIR_NAME = "batch"
+
+# KoBERT 프로세스 풀에 한 번에 넘기는 리뷰 수
+KOBERT_CHUNK_SIZE = 32
+
+
+# ------------------------------------------------------------------
+# 입력 파일 읽기
+# ------------------------------------------------------------------
+def read_reviews(path):
+    """리뷰 파일을 읽어 리뷰 내용이 있는 행만 반환 (컬럼명 정규화는 ingest와 동일)"""
+    from src.ingest import iter_reviews
+    return list(iter_reviews(path))
+
+
+# ------------------------------------------------------------------
+# 체크포인트 (결과 JSONL)
+# ------------------------------------------------------------------
+def load_checkpoint(output_path):
+    """이미 성공적으로 처리된 리뷰 ID -> 결과 카드"""
+    done = {}
+    if not output_path.exists():
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 비정상 종료로 마지막 줄이 잘린 경우
+                continue
+            if record.get("card"):
+                done[record["id"]] = record["card"]
+    return done
+
+
+def _ends_mid_line(output_path):
+    """비정상 종료로 마지막 기록이 줄바꿈 없이 잘렸는지 (이어 쓰기 전에 줄을 바꿔야 함)"""
+    if not output_path.exists() or output_path.stat().st_size == 0:
+        return False
+    with open(output_path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+# ------------------------------------------------------------------
+# KoBERT (프로세스 풀)
+# ------------------------------------------------------------------
+def _kobert_labels(texts):
+    # 워커 프로세스 안에서 실행됨 (모델은 프로세스당 1회 로드)
+    from src.models import analyze_review_sentiments
+    return [r["label"] for r in analyze_review_sentiments(texts)]
+
+
+async def _process_chunk(chunk, kobert_future, handle_group, slice_size):
+    from src import scheduler
+
+    try:
+        labels = await asyncio.wrap_future(kobert_future)
+    except Exception as e:
+        # 풀에서 실패하면 analyze_node가 직접 KoBERT를 실행
+        print(f"[WARN] KoBERT pool failed, falling back to in-graph analysis: {e}")
+        labels = [None] * len(chunk)
+
+    label_map = {review["id"]: label for review, label in zip(chunk, labels)}
+    # 부정 리뷰가 먼저 생성되도록 KoBERT 결과로 묶음 안의 순서를 다시 정함
+    chunk = scheduler.prioritize(chunk, label_map)
+    await asyncio.gather(*(
+        handle_group(chunk[i:i + slice_size], label_map) for i in range(0, len(chunk), slice_size)
+    ))
+
+
+# ------------------------------------------------------------------
+# 메인 실행
+# ------------------------------------------------------------------
+async def run_batch(reviews, output_path, store_name, tone, concurrency, kobert_workers, reuse_mode="off",
+                    group_size=8, budget=None):
+    from src.workflow import build_graph, run_reviews, apply_result
+    from src.llm_gateway import CallBudgetExceeded, CallMeter, metered
+    from src import scheduler
+
+    prepare_app = build_graph(generate=False)
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"done": 0, "failed": 0, "skipped": 0, "stopped": None}
+    started = time.perf_counter()
+    started_at = time.time()
+    # 고정/별점/대기 시간 기준으로 먼저 정렬 (KoBERT 감정은 묶음별로 나중에 반영)
+    reviews = scheduler.prioritize(reviews)
+    total = len(reviews)
+    # 긍정/부정 그룹이 각각 group_size만큼 찰 수 있도록 두 배씩 묶어서 처리
+    slice_size = max(1, group_size) * 2
+
+    # 호출 예산은 게이트웨이가 호출마다 차감 (묶음 사이에서만 확인하면 한 묶음만큼 넘칠 수 있음)
+    meter = CallMeter(limit=(budget or {}).get("llm_calls"))
+    mid_line = _ends_mid_line(output_path)
+    with open(output_path, 'a', encoding='utf-8') as out, metered(meter):
+        if mid_line:
+            # 잘린 줄에 이어 붙이면 첫 결과까지 읽을 수 없게 됨
+            out.write("\n")
+
+        async def handle_group(group, kobert_labels):
+            async with semaphore:
+                reason = scheduler.budget_exhausted(budget, started_at, meter.calls)
+                if reason:
+                    # 체크포인트에 기록하지 않으므로 다시 실행하면 이어서 처리됨
+                    stats["stopped"] = reason
+                    stats["skipped"] += len(group)
+                    return
+                try:
+                    outcomes = await asyncio.to_thread(
+                        run_reviews, prepare_app, group, store_name, tone, group_size=group_size,
+                        reuse_mode=reuse_mode, kobert_labels=kobert_labels
+                    )
+                except Exception as e:
+                    outcomes = {review["id"]: e for review in group}
+
+            for review in group:
+                result = outcomes.get(review["id"], RuntimeError("no result"))
+                if isinstance(result, CallBudgetExceeded):
+                    # 체크포인트에 기록하지 않으므로 다시 실행하면 이어서 처리됨
+                    stats["stopped"] = "llm_calls"
+                    stats["skipped"] += 1
+                    continue
+                if isinstance(result, Exception):
+                    record = {"id": review["id"], "error": str(result)}
+                    stats["failed"] += 1
+                else:
+                    card = dict(review)
+                    apply_result(card, result)
+                    record = {"id": review["id"], "card": card}
+                    stats["done"] += 1
+                    scheduler.record_reply(review, card.get("sentiment"))
+
+                # 이벤트 루프 단일 스레드에서만 기록하므로 별도 잠금 불필요
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+
+                processed = stats["done"] + stats["failed"]
+                elapsed_min = (time.perf_counter() - started) / 60
+                rate = processed / elapsed_min if elapsed_min > 0 else 0
+                print(f"[{processed}/{total}] {review['id'][:8]} "
+                      f"{'OK' if 'card' in record else 'FAIL'} ({rate:.1f} reviews/min)")
+
+        chunks = [reviews[i:i + KOBERT_CHUNK_SIZE] for i in range(0, total, KOBERT_CHUNK_SIZE)]
+        mp_context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=kobert_workers, mp_context=mp_context) as pool:
+            futures = [pool.submit(_kobert_labels, [r["text"] for r in chunk]) for chunk in chunks]
+            # KoBERT가 끝난 청크부터 바로 LLM 단계로 넘어감
+            await asyncio.gather(*(
+                _process_chunk(chunk, future, handle_group, slice_size) for chunk, future in zip(chunks, futures)
+            ))
+
+    elapsed_min = (time.perf_counter() - started) / 60
+    stats["reviews_per_min"] = (stats["done"] + stats["failed"]) / elapsed_min if elapsed_min > 0 else 0
+    return stats
+
+
+def _print_generation_stats():
+    """생성 호출 수 / 리뷰당 프롬프트 토큰 (묶음 생성 효과 확인용)"""
+    from src import metrics
+    snap = metrics.snapshot()
+    counters = snap["counters"]
+    calls = counters.get("llm.calls.generate", 0) + counters.get("llm.calls.generate_batch", 0)
+    per_review = snap["observations"].get("generate.prompt_tokens_per_review", {}).get("avg")
+    fallback = counters.get("fallback.used", 0)
+    if fallback:
+        print(f"[WARN] {fallback} replies fell back to templates after the deadline (reply_source=fallback)")
+    print(f"[INFO] Generation calls={calls} "
+          f"(batched reviews={counters.get('generate.batched_reviews', 0)}, "
+          f"fallback={counters.get('generate.batch_fallback', 0)})"
+          + (f", ~{per_review:.0f} prompt tokens/review (batched)" if per_review else ""))
+    retrievals = counters.get("retrieval.queries", 0)
+    if retrievals:
+        print(f"[INFO] Retrievals answered without an embedding: "
+              f"{counters.get('retrieval.lexical_only', 0)}/{retrievals}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI ReplyMate 헤드리스 일괄 답글 생성")
+    parser.add_argument("input", help="리뷰 파일 (.jsonl / .csv / .json / .xlsx)")
+    parser.add_argument("--tone", default="친근한", choices=["정중한", "친근한", "유머러스한", "사장님 말투"])
+    parser.add_argument("--store-name", default=None, help="가게 이름 (기본: store_info.json)")
+    parser.add_argument("--store", default=None, help="가게 ID (기본: default)")
+    parser.add_argument("--api-key", default=None, help="STORE_API_KEYS에 등록된 가게 API 키 (--store 대신)")
+    parser.add_argument("--output", default=None, help="결과/체크포인트 파일 (기본: <가게 데이터>/batch/<입력파일명>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시에 처리할 리뷰 묶음 수")
+    parser.add_argument("--group-size", type=int, default=8, help="한 번의 LLM 호출로 답글을 생성할 리뷰 수 (1: 한 건씩)")
+    parser.add_argument("--kobert-workers", type=int, default=1, help="KoBERT 프로세스 수")
+    parser.add_argument("--reuse", default="off", choices=["off", "confirm", "auto"],
+                        help="비슷한 리뷰의 승인 답글 재사용 (confirm: 리뷰 관리 탭에서 확인 필요)")
+    parser.add_argument("--no-drafts", action="store_true", help="완료 후 draft_reviews.json에 반영하지 않음")
+    parser.add_argument("--time-budget", type=float, default=None, help="이 시간(초)이 지나면 새 묶음을 시작하지 않음")
+    parser.add_argument("--call-budget", type=int, default=None, help="LLM 호출이 이 횟수에 이르면 새 묶음을 시작하지 않음")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if not os.getenv("GOOGLE_API_KEY"):
+        print("[CRITICAL] GOOGLE_API_KEY가 .env 파일에 설정되지 않았습니다.")
+        return 1
+
+    # 가게별 설정(STORE_RPM 등)을 .env에서 읽도록 load_dotenv 이후에 임포트
+    from src import tenancy
+
+    store_id = tenancy.validate_store_id(args.store or tenancy.DEFAULT_STORE)
+    if args.api_key:
+        store_id = tenancy.store_for_api_key(args.api_key)
+        if store_id is None:
+            print("[CRITICAL] 등록되지 않은 가게 API 키입니다. (STORE_API_KEYS)")
+            return 1
+    if not tenancy.data_dir(store_id).exists():
+        print(f"[CRITICAL] 가게 '{store_id}'가 없습니다.")
+        return 1
+    # CLI 프로세스 전체가 한 가게를 처리 (asyncio 작업과 submit()으로 넘긴 스레드에도 전달됨)
+    tenancy.set_store(store_id)
+
+    from src.data_manager import load_store_name, merge_drafts
+
+    store_name = args.store_name or load_store_name() or "우리 가게"
+    output_path = Path(args.output) if args.output else tenancy.data_dir() / BATCH_DIR_NAME / f"{Path(args.input).stem}.results.jsonl"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    reviews = read_reviews(args.input)
+    done = load_checkpoint(output_path)
+    pending = [r for r in reviews if r["id"] not in done]
+    print(f"[INFO] {len(reviews)} reviews, {len(done)} already done (checkpoint), {len(pending)} to process")
+
+    if pending:
+        from src import scheduler
+
+        budget = scheduler.default_budget()
+        if args.time_budget:
+            budget["seconds"] = args.time_budget
+        if args.call_budget:
+            budget["llm_calls"] = args.call_budget
+        stats = asyncio.run(run_batch(
+            pending, output_path, store_name, args.tone, args.concurrency, args.kobert_workers, args.reuse,
+            args.group_size, budget
+        ))
+        print(f"[SUCCESS] done={stats['done']} failed={stats['failed']} "
+              f"throughput={stats['reviews_per_min']:.1f} reviews/min")
+        if stats["stopped"]:
+            print(f"[WARN] Stopped: {stats['stopped']} budget used up, {stats['skipped']} reviews left "
+                  f"(run the same command again to continue)")
+        negative_wait = scheduler.negative_time_to_reply()
+        if negative_wait is not None:
+            print(f"[INFO] Negative reviews answered {negative_wait / 3600:.1f}h after posting on average")
+        _print_generation_stats()
+        if args.reuse != "off":
+            from src.reuse import hit_rate
+            rate = hit_rate()
+            print(f"[INFO] Approved reply reuse hit rate: {rate * 100:.1f}%" if rate is not None else
+                  "[INFO] Approved reply reuse: no lookups")
+
+    if not args.no_drafts:
+        results = load_checkpoint(output_path)
+        cards = [results[r["id"]] for r in reviews if r["id"] in results]
+        added = merge_drafts(cards)
+        print(f"[INFO] Drafts updated: {len(cards)} results ({added} new) -> draft_reviews.json")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,30 @@
 import json
+import os
 import platform
+import threading
 from pathlib import Path
 import pandas as pd
 from wordcloud import WordCloud
+from src import archive, snapshot, reuse, tenancy
 
-# 경로 설정
+# 경로 설정 (데이터 폴더는 가게별: tenancy.data_dir())
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
-SAVED_REVIEWS_FILE = "saved_reviews.json"
 TEMPLATES_FILE = "templates.json"
 DRAFTS_FILE = "draft_reviews.json"
 STORE_INFO_FILE = "store_info.json"
+ROLLUPS_FILE = "daily_rollups.json"
+
+# draft_reviews.json은 세션들과 백그라운드 작업이 함께 쓰므로 프로세스 단위 잠금 사용
+_drafts_lock = threading.RLock()
+
+# 대시보드 기간 필터 -> 포함할 날짜 수 (오늘 포함, 로컬 시간 0시 기준의 달력 날짜 단위)
+#   "오늘"은 오늘 0시부터, "7일"은 6일 전 0시부터 (최근 24시간/7x24시간 같은 롤링 구간이 아님)
+#   일별 집계 테이블이 날짜 단위라 추이 차트와 목록/지표가 같은 날짜 경계를 쓰도록 맞춤
+PERIOD_DAYS = {"오늘": 1, "7일": 7, "1개월": 30}
 
 def _get_path(filename):
-    return DATA_DIR / filename
+    return tenancy.data_dir() / filename
 
 
 def load_json_data(filename):
@@ -29,11 +40,13 @@ def load_json_data(filename):
 
 def save_json_data(filename, data):
     file_path = _get_path(filename)
-    if not DATA_DIR.exists():
-        DATA_DIR.mkdir(parents=True)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(file_path, 'w', encoding='utf-8') as f:
+    # 쓰는 도중에 다른 세션이 읽어도 반쯤 쓰인 파일이 보이지 않도록 교체 방식으로 저장
+    tmp_path = file_path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, file_path)
 
 
 def save_store_name(name):
@@ -51,42 +64,277 @@ def load_store_name():
     return
 
 
+def load_saved_reviews(since=None):
+    """저장된 리뷰 로드 (월별 파티션 중 since 이후 데이터가 있는 파티션만 읽음)"""
+    return archive.load_reviews(since)
+
+
+def iter_saved_reviews():
+    return archive.iter_reviews()
+
+
+def load_recent_saved_reviews(months):
+    """최근 months개 월 파티션만 로드. (리뷰 목록, 더 오래된 기록 존재 여부) 반환"""
+    return archive.load_recent_partitions(months)
+
+
+def count_saved_reviews():
+    """파티션 manifest의 건수 합계 (리뷰 파일을 열지 않음)"""
+    return archive.count_reviews()
+
+
 # [FIX] 중복 저장 방지 로직 (ID 기준 덮어쓰기)
 def save_completed_review(review_data):
-    current_data = load_json_data(SAVED_REVIEWS_FILE)
-
-    # 전달받은 데이터에 ID가 있는지 확인
-    target_id = review_data.get("id")
-
-    if target_id:
-        # 이미 같은 ID가 있는지 검사
-        found_index = -1
-        for idx, item in enumerate(current_data):
-            if item.get("id") == target_id:
-                found_index = idx
-                break
-
-        if found_index != -1:
-            # 있으면 교체 (Update)
-            current_data[found_index] = review_data
-            print(f"[INFO] Updated review {target_id}")
+    # 파티션/집계/스냅샷은 읽고-고쳐-쓰는 방식이라, 여러 세션과 작업 워커가 동시에 저장해도 값을 잃지 않도록 잠금
+    with archive.write_lock():
+        # 집계 파일이 없으면 저장 전 상태로 먼저 재구축되도록 미리 로드
+        rollups = load_rollups()
+
+        # 월별 파티션에 upsert (같은 ID가 있으면 교체, 없으면 추가)
+        old_record, old_key = archive.upsert_review(review_data)
+
+        if old_record is not None:
+            # 교체 (Update) - 집계에서 이전 값은 빼고 새 값을 더함
+            old_partition = archive.load_partition(old_key)
+            _apply_rollup(rollups, old_record, -1, remaining=old_partition)
+            print(f"[INFO] Updated review {review_data.get('id')}")
+
+            # 다른 달 파티션으로 옮겨졌다면 이전 파티션 스냅샷에서 제거
+            if old_key != archive.partition_key(review_data) and snapshot.exists():
+                snapshot.rebuild_partition(old_key, old_partition)
         else:
-            # 없으면 추가 (Create)
-            current_data.append(review_data)
-            print(f"[INFO] Created new review {target_id}")
+            print(f"[INFO] Created new review {review_data.get('id')}")
+
+        _apply_rollup(rollups, review_data, 1)
+        save_json_data(ROLLUPS_FILE, {"rows": rollups})
+
+        # 분석용 컬럼형 스냅샷에도 추가 (append-on-save)
+        snapshot.append_review(review_data)
+
+    # 승인된 답글을 유사 리뷰 재사용 인덱스에 추가
+    reuse.index_approved_reply(review_data)
+
+
+# ------------------------------------------------------------------
+# [Rollup] 일별 집계 테이블 (day, sentiment, category, menu) -> count
+# ------------------------------------------------------------------
+def _rollup_key(review):
+    """집계 행 키 생성: 'YYYY-MM-DD|sentiment|category|menu'"""
+    ts = archive.local_timestamp(review.get("timestamp"))
+    if ts is None:
+        return None
+    day = ts.strftime("%Y-%m-%d")
+    sentiment = review.get("sentiment") or "unknown"
+    category = review.get("category") or "unknown"
+    menu = review.get("menu_name") or ""
+    return f"{day}|{sentiment}|{category}|{menu}"
+
+
+def load_rollups():
+    """집계 테이블 로드 (없으면 저장된 리뷰로부터 1회 재구축)"""
+    data = load_json_data(ROLLUPS_FILE)
+    if not isinstance(data, dict) or "rows" not in data:
+        return rebuild_rollups()
+    return data["rows"]
+
+
+def rebuild_rollups():
+    """저장된 리뷰 전체를 다시 읽어 집계 테이블을 새로 생성"""
+    rows = {}
+    with archive.write_lock():
+        for review in load_saved_reviews():
+            _apply_rollup(rows, review, 1)
+        save_json_data(ROLLUPS_FILE, {"rows": rows})
+    print(f"[INFO] Rebuilt rollups ({len(rows)} rows)")
+    return rows
+
+
+def _apply_rollup(rows, review, sign, remaining=()):
+    """
+    집계 행에 리뷰 1건을 더하거나(sign=1) 뺌(sign=-1).
+    뺄 때는 remaining(뺀 리뷰가 있던 파티션의 남은 레코드)으로 행의 latest를 다시 계산합니다.
+    """
+    key = _rollup_key(review)
+    if key is None:
+        return
+
+    row = rows.setdefault(key, {"count": 0, "latest": None})
+    row["count"] += sign
+
+    if row["count"] <= 0:
+        del rows[key]
+    elif sign > 0:
+        ts = str(archive.local_timestamp(review.get("timestamp")))
+        if row["latest"] is None or ts > row["latest"]:
+            row["latest"] = ts
     else:
-        # ID가 없으면 그냥 추가 (구형 데이터 호환)
-        current_data.append(review_data)
+        stamps = [str(archive.local_timestamp(r.get("timestamp"))) for r in remaining if _rollup_key(r) == key]
+        row["latest"] = max(stamps) if stamps else None
+
+
+def period_start(filter_period, now=None):
+    """기간 필터의 시작 시각 (시작 날짜의 로컬 0시). '전체'면 None"""
+    days = PERIOD_DAYS.get(filter_period)
+    if days is None:
+        return None
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    return now.normalize() - pd.Timedelta(days=days - 1)
+
+
+def _iter_rollup_rows(rows, start=None, sentiment=None):
+    start_day = start.strftime("%Y-%m-%d") if start is not None else None
 
-    save_json_data(SAVED_REVIEWS_FILE, current_data)
+    for key, row in rows.items():
+        day, row_sentiment, category, menu = key.split("|", 3)
+        if start_day and day < start_day:
+            continue
+        if sentiment and row_sentiment != sentiment:
+            continue
+        yield day, row_sentiment, category, menu, row
+
+
+def query_daily_series(start=None, sentiment=None):
+    """
+    일별 리뷰 수 / 부정 비율 시계열 (집계 테이블 기반).
+    start는 period_start()의 결과를 그대로 넘겨, 같은 화면의 목록/지표와 같은 날짜 경계를 씁니다.
+    """
+    volume, negative = {}, {}
+    for day, row_sentiment, _, _, row in _iter_rollup_rows(load_rollups(), start, sentiment):
+        volume[day] = volume.get(day, 0) + row["count"]
+        if row_sentiment == "negative":
+            negative[day] = negative.get(day, 0) + row["count"]
+
+    if not volume:
+        return pd.DataFrame(columns=["리뷰 수", "부정 비율(%)"])
+
+    series = pd.DataFrame({"리뷰 수": pd.Series(volume)})
+    series["부정 비율(%)"] = pd.Series(negative).reindex(series.index).fillna(0) / series["리뷰 수"] * 100
+    series.index = pd.to_datetime(series.index)
+    return series.sort_index()
+
+
+def summarize_frame(df):
+    """대시보드 상단 지표 (리뷰 수, 긍정 수, 최근 활동) - 아래 목록/워드클라우드와 같은 DataFrame에서 계산"""
+    if df.empty:
+        return {"count": 0, "positive": 0, "latest": None}
+    latest = df["timestamp"].max()
+    return {
+        "count": len(df),
+        "positive": int((df["sentiment"] == "positive").sum()),
+        "latest": latest if pd.notna(latest) else None
+    }
 
 
 def save_drafts(draft_data):
-    save_json_data(DRAFTS_FILE, draft_data)
+    with _drafts_lock:
+        save_json_data(DRAFTS_FILE, draft_data)
 
 
 def load_drafts():
-    return load_json_data(DRAFTS_FILE)
+    with _drafts_lock:
+        return load_json_data(DRAFTS_FILE)
+
+
+def update_draft(review_id, fields):
+    """
+    작성 중 목록에서 리뷰 1건의 필드만 갱신 (화면 편집/백그라운드 작업 결과 반영용).
+    파일 전체를 세션 목록으로 덮어쓰지 않으므로, 다른 카드에 워커가 방금 쓴 결과를 지우지 않습니다.
+    """
+    with _drafts_lock:
+        drafts = load_json_data(DRAFTS_FILE)
+        for d in drafts:
+            if d.get("id") == review_id:
+                if d.get("status") != "saved":
+                    d.update(fields)
+                    save_json_data(DRAFTS_FILE, drafts)
+                return True
+    return False
+
+
+def add_draft(review):
+    """새 리뷰 카드 1건을 작성 중 목록 맨 앞에 추가"""
+    return prepend_drafts([review])
+
+
+def delete_drafts(review_ids):
+    """작성 중 목록에서 주어진 ID의 카드만 삭제하고 삭제한 건수를 반환"""
+    review_ids = set(review_ids)
+    with _drafts_lock:
+        drafts = load_json_data(DRAFTS_FILE)
+        remaining = [d for d in drafts if d.get("id") not in review_ids]
+        if len(remaining) != len(drafts):
+            save_json_data(DRAFTS_FILE, remaining)
+    return len(drafts) - len(remaining)
+
+
+def merge_drafts(updated_reviews):
+    """
+    작성 중 목록에 리뷰 카드들을 ID 기준으로 병합 (있으면 갱신, 없으면 맨 앞에 추가).
+    Streamlit 밖(배치 CLI 등)에서 만든 결과를 리뷰 관리 탭에 반영할 때 사용합니다.
+    """
+    with _drafts_lock:
+        drafts = load_drafts()
+        index = {d.get("id"): i for i, d in enumerate(drafts)}
+
+        new_items = []
+        for review in updated_reviews:
+            idx = index.get(review.get("id"))
+            if idx is None:
+                new_items.append(review)
+            elif drafts[idx].get("status") != "saved":
+                drafts[idx].update(review)
+
+        save_drafts(new_items + drafts)
+    return len(new_items)
+
+
+def iter_drafts():
+    """
+    작성 중 목록을 한 건씩 반환.
+    잠금을 잡은 채로 호출자에게 넘기지 않도록, 잠금 안에서 목록을 읽어 둔 뒤 잠금을 풀고 반환합니다.
+    """
+    with _drafts_lock:
+        drafts = load_json_data(DRAFTS_FILE)
+    yield from drafts
+
+
+def _stream_drafts(file_path):
+    # _drafts_lock을 잡은 쪽에서만 호출 (목록 전체를 메모리에 올리지 않고 한 건씩 읽음)
+    from src.ingest import iter_json_array
+
+    if not file_path.exists():
+        return
+    with open(file_path, 'r', encoding='utf-8') as f:
+        try:
+            yield from iter_json_array(f)
+        except ValueError:
+            return
+
+
+def prepend_drafts(new_items):
+    """
+    새 리뷰 카드들(이터러블)을 작성 중 목록 맨 앞에 한 번에 추가하고 추가한 건수를 반환.
+    새 카드와 기존 카드를 한 건씩 임시 파일로 옮겨 써서, 대량 가져오기에서도 목록 전체를 메모리에 올리지 않습니다.
+    """
+    with _drafts_lock:
+        file_path = _get_path(DRAFTS_FILE)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = file_path.with_suffix(".tmp")
+        added = written = 0
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("[")
+            for item in new_items:
+                f.write(",\n" if written else "\n")
+                json.dump(item, f, ensure_ascii=False)
+                added += 1
+                written += 1
+            for item in _stream_drafts(file_path):
+                f.write(",\n" if written else "\n")
+                json.dump(item, f, ensure_ascii=False)
+                written += 1
+            f.write("\n]")
+        os.replace(tmp_path, file_path)
+    return added
 
 
 def get_korean_font_path():
@@ -104,13 +352,38 @@ def get_korean_font_path():
     return None
 
 
-def generate_analytics_data():
-    reviews = load_json_data(SAVED_REVIEWS_FILE)
-    df = pd.DataFrame(reviews)
+def load_analytics_frame(since=None):
+    """
+    분석용 DataFrame 로드 (since가 있으면 해당 기간 파티션만 읽음).
+    컬럼형 스냅샷(Arrow)이 있으면 memory-map으로 읽고, 없으면 원본에서 1회 생성합니다.
+    """
+    if snapshot.is_available():
+        if not snapshot.exists():
+            with archive.write_lock():
+                if not snapshot.exists():
+                    snapshot.rebuild_snapshot(load_saved_reviews())
+        df = snapshot.load_snapshot(since)
+        if df is not None:
+            return df
+
+    # pyarrow가 없는 환경: JSON 파티션 경로
+    df = pd.DataFrame(load_saved_reviews(since))
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'].map(archive.local_timestamp))
+    if not df.empty and 'sentiment' not in df.columns:
+        df['sentiment'] = 'unknown'
+    return df
+
+
+def generate_analytics_data(build_wordcloud=True, since=None):
+    df = load_analytics_frame(since)
 
     if df.empty:
         return pd.DataFrame(), None
 
+    if not build_wordcloud:
+        return df, None
+
     text_corpus = " ".join(df['review_text'].astype(str).tolist())
     if not text_corpus.strip():
         return df, None
@@ -133,8 +406,11 @@ def generate_analytics_data():
 
 def reset_app_data():
     print("[INFO] Resetting all data...")
-    save_json_data(SAVED_REVIEWS_FILE, [])
-    save_json_data(DRAFTS_FILE, [])
+    with archive.write_lock():
+        archive.clear_archive()
+        save_json_data(ROLLUPS_FILE, {"rows": {}})
+        snapshot.clear_snapshot()
+    save_drafts([])
 
     templates = load_json_data(TEMPLATES_FILE)
     if templates:
@@ -0,0 +1,132 @@
+import os
+import re
+import threading
+from functools import lru_cache
+from langchain_core.embeddings import Embeddings
+
+# 임베딩 백엔드: google(Gemini API) / local(CPU 한국어 문장 임베딩)
+GOOGLE_MODEL = "models/text-embedding-004"
+LOCAL_MODEL = "jhgan/ko-sroberta-multitask"
+
+# 같은 질의(예: 템플릿 검색의 고정 질의)는 다시 임베딩하지 않음
+QUERY_CACHE_SIZE = 512
+
+
+class LocalSentenceEmbeddings(Embeddings):
+    """sentence-transformers 모델을 CPU에서 배치 추론 (선택적으로 int8 동적 양자화)"""
+
+    is_remote = False
+
+    def __init__(self, model_name=LOCAL_MODEL, quantize=False, batch_size=64):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError(
+                "EMBEDDING_BACKEND=local을 쓰려면 sentence-transformers 패키지가 필요합니다. "
+                "(pip install sentence-transformers)"
+            ) from None
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        if quantize:
+            import torch
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+
+    def _encode(self, texts):
+        with self._lock:
+            vectors = self.model.encode(
+                list(texts), batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+            )
+        return vectors.tolist()
+
+    def embed_documents(self, texts):
+        return self._encode(texts)
+
+    def embed_query(self, text):
+        return self._encode([text])[0]
+
+
+class GatedEmbeddings(Embeddings):
+    """
+    원격 임베딩 API 호출이 모두 LLM 게이트웨이(한도/우선순위/재시도/circuit breaker)를 거치도록 감쌈.
+    질의 임베딩은 답글 생성 중 검색에 쓰이므로 interactive, 문서 임베딩(색인)은 background 우선순위입니다.
+    """
+
+    is_remote = True
+
+    def __init__(self, inner, gateway=None):
+        from src.llm_gateway import get_gateway
+
+        self.inner = inner
+        self.gateway = gateway or get_gateway()
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        return self.gateway.call(
+            lambda: self.inner.embed_documents(texts),
+            tokens=sum(len(t) for t in texts) // 2,
+            priority="background",
+            caller="embed"
+        )
+
+    def embed_query(self, text):
+        return self.gateway.call(
+            lambda: self.inner.embed_query(text),
+            tokens=len(text) // 2,
+            priority="interactive",
+            caller="embed_query"
+        )
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """질의 임베딩에만 LRU 캐시를 씌움 (문서 임베딩은 그대로 전달)"""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.is_remote = getattr(inner, "is_remote", True)
+        self._cached_query = lru_cache(maxsize=QUERY_CACHE_SIZE)(lambda text: tuple(inner.embed_query(text)))
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return list(self._cached_query(text))
+
+
+def backend_name():
+    return os.getenv("EMBEDDING_BACKEND", "google").lower()
+
+
+def embedding_id():
+    """현재 임베딩 모델 식별자 (컬렉션 버전 구분용)"""
+    if backend_name() == "local":
+        model = os.getenv("LOCAL_EMBEDDING_MODEL", LOCAL_MODEL)
+        suffix = "-int8" if os.getenv("EMBEDDING_INT8", "0") == "1" else ""
+        return f"local-{model}{suffix}"
+    return f"google-{GOOGLE_MODEL}"
+
+
+def collection_name(base):
+    """임베딩 모델별 컬렉션 이름 (모델을 바꾸면 새 컬렉션에 다시 색인됨)"""
+    slug = re.sub(r"[^a-zA-Z0-9]+", "-", embedding_id()).strip("-").lower()
+    return f"{base}__{slug}"[:200]
+
+
+@lru_cache(maxsize=4)
+def _load(embed_id):
+    if backend_name() == "local":
+        print(f"[INFO] Loading local embedding model: {embed_id}")
+        inner = LocalSentenceEmbeddings(
+            os.getenv("LOCAL_EMBEDDING_MODEL", LOCAL_MODEL),
+            quantize=os.getenv("EMBEDDING_INT8", "0") == "1"
+        )
+    else:
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        inner = GatedEmbeddings(GoogleGenerativeAIEmbeddings(model=GOOGLE_MODEL))
+    return CachedQueryEmbeddings(inner)
+
+
+def get_embeddings():
+    """프로세스 공용 임베딩 객체 (모델은 백엔드/모델별로 한 번만 로드)"""
+    return _load(embedding_id())
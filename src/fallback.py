@@ -0,0 +1,132 @@
+import re
+from src import metrics
+from src.data_manager import load_json_data, TEMPLATES_FILE
+from src.reuse import address_name
+
+# 답글 톤 -> templates.json metadata.tone
+TONE_KEYS = {"정중한": "polite", "친근한": "friendly", "유머러스한": "witty", "사장님 말투": "owner_custom"}
+
+# LLM 분석 카테고리 -> templates.json metadata.category
+CATEGORY_KEYS = {
+    ("taste", "positive"): "taste_good",
+    ("taste", "negative"): "taste_bad",
+    ("delivery", "negative"): "delivery_delay",
+}
+
+# 메뉴 설명에서 '꿀팁'으로 쓸 만한 문장의 단서
+TIP_MARKERS = ("데워", "조리", "전자레인지", "에어프라이어", "드시려면", "드세요", "주세요")
+
+# 정중한 톤으로 바꿀 때 쓰는 어미 치환
+FORMAL_ENDINGS = {
+    "드릴게요": "드리겠습니다",
+    "할게요": "하겠습니다",
+    "감사해요": "감사합니다",
+    "감사드려요": "감사드립니다",
+    "죄송해요": "죄송합니다",
+    "드려요": "드립니다",
+    "거예요": "것입니다",
+}
+EMOTICON_PATTERN = re.compile(r"\^\^|:\)|♡|ㅠ+|ㅜ+|ㅎ+|~")
+
+
+def _pick_template(candidates, sentiment, category, tone):
+    """감정은 반드시 일치, 톤 > 카테고리 순으로 가장 잘 맞는 템플릿"""
+    tone_key = TONE_KEYS.get(tone)
+    category_key = CATEGORY_KEYS.get((category, sentiment), category)
+
+    best, best_score = None, -1
+    for t in candidates:
+        meta = t.get("metadata", {})
+        if meta.get("sentiment") != sentiment:
+            continue
+        score = (2 if meta.get("tone") == tone_key else 0) + (1 if meta.get("category") == category_key else 0)
+        if "{고객}" in t["content"]:
+            score += 0.5
+        if score > best_score:
+            best, best_score = t["content"], score
+    return best
+
+
+def _menu_tip(menu_name):
+    if not menu_name or menu_name == "null":
+        return None
+    for m in load_json_data("menu_info.json"):
+        if m.get("menu_name") == menu_name:
+            sentences = re.split(r"(?<=[.!?])\s+", m.get("description", "").strip())
+            tips = [s for s in sentences if any(marker in s for marker in TIP_MARKERS)]
+            return " ".join(tips) or None
+    return None
+
+
+def _apply_tone(text, tone):
+    if tone == "정중한":
+        text = EMOTICON_PATTERN.sub("", text)
+        for soft, formal in FORMAL_ENDINGS.items():
+            text = text.replace(soft, formal)
+        return re.sub(r"\s{2,}", " ", text).strip()
+
+    text = text.strip()
+    if tone == "유머러스한" and not text.endswith("ㅎㅎ"):
+        return f"{text} ㅎㅎ"
+    if not EMOTICON_PATTERN.search(text[-3:]):
+        return f"{text} ^^"
+    return text
+
+
+def compose_reply(customer_name, sentiment, category, tone, menu_name=None, retrieved_templates=None):
+    """
+    LLM 없이 템플릿으로 답글을 조립합니다.
+    검색된 템플릿이 있으면 그중에서, 없으면 templates.json 전체에서 가장 잘 맞는 것을 고릅니다.
+    """
+    template = None
+    if retrieved_templates:
+        template = next((t for t in retrieved_templates if "{고객}" in t), retrieved_templates[0])
+    if not template:
+        template = _pick_template(load_json_data(TEMPLATES_FILE), sentiment, category, tone)
+    if not template:
+        template = ("{고객}님, 소중한 리뷰 남겨주셔서 감사합니다. 말씀해주신 부분 꼼꼼히 살펴보겠습니다."
+                    if sentiment == "negative" else
+                    "{고객}님, 맛있게 드셔주셔서 감사합니다. 다음에도 맛있게 준비하겠습니다.")
+
+    reply = template.replace("{고객}", address_name(customer_name))
+    reply = reply.replace("{메뉴명}", menu_name if menu_name and menu_name != "null" else "메뉴")
+
+    # 메뉴 꿀팁은 마지막 인사 바로 앞에 넣음
+    tip = _menu_tip(menu_name)
+    if tip and tip not in reply:
+        sentences = re.split(r"(?<=[.!?])\s+", reply.strip())
+        sentences.insert(max(len(sentences) - 1, 1), tip)
+        reply = " ".join(sentences)
+
+    return _apply_tone(reply, tone)
+
+
+def fallback_result(review, tone, state=None):
+    """
+    시간 초과 시 지금까지의 분석/검색 결과(state)로 워크플로우 결과와 같은 형태의 dict를 만듭니다.
+    감정을 아직 모르면 로컬 KoBERT로만 판단합니다.
+    """
+    state = dict(state or {})
+    sentiment = state.get("sentiment") or state.get("kobert_sentiment")
+    if not sentiment:
+        from src.models import analyze_review_sentiment
+        sentiment = analyze_review_sentiment(review["text"])["label"]
+
+    extracted = state.get("extracted_menu") or "null"
+    menu_name = review.get("menu_name") or (extracted if extracted != "null" else None)
+
+    metrics.incr("fallback.used")
+    print(f"[WARN] Deadline exceeded, using template fallback reply ({sentiment})")
+    return {
+        **state,
+        "final_reply": compose_reply(review.get("customer_name", ""), sentiment, state.get("category"), tone,
+                                     menu_name=menu_name, retrieved_templates=state.get("retrieved_templates")),
+        "sentiment": sentiment,
+        "category": state.get("category"),
+        "extracted_menu": extracted,
+        "reply_source": "fallback"
+    }
+
+
+def fallback_rate():
+    return metrics.ratio("fallback.used", "workflow.runs")
@@ -0,0 +1,157 @@
+import threading
+import time
+from filelock import FileLock, Timeout
+from src import metrics, tenancy
+from src.rag import ReplyMateRAG
+
+# 마지막 변경 알림 후 이만큼 조용하면 재구축 시작 (연속 저장은 한 번으로 합침)
+DEBOUNCE_SEC = 0.5
+# 알림이 계속 들어와도 첫 알림 후 이 시간이 지나면 재구축
+MAX_DELAY_SEC = 5.0
+# 다른 프로세스가 재구축 중이면 기다리는 최대 시간
+LOCK_TIMEOUT_SEC = 600
+# 가게별 데이터 폴더 아래 run/ (다른 프로세스와 재구축이 겹치지 않도록)
+WRITER_LOCK_NAME = "index_writer.lock"
+
+
+class IndexMaintainer:
+    """
+    지식 베이스(템플릿/메뉴) 재구축 전담 워커 (가게별 1개, 프로세스 안에서 공유).
+    - 화면에서는 notify()로 변경만 알리고, 받은 번호로 wait()하여 반영 완료를 기다립니다.
+    - 짧은 시간 안에 들어온 알림은 한 번의 재구축으로 합쳐지고, 재구축은 항상 한 번에 하나씩 실행됩니다.
+    - 파일 잠금으로 다른 프로세스(일괄 처리 CLI 등)의 재구축과도 겹치지 않습니다.
+    """
+
+    def __init__(self, store_id):
+        self.store_id = store_id
+        self._cond = threading.Condition()
+        self._requested = 0   # 마지막으로 받은 알림 번호
+        self._completed = 0   # 이 번호까지의 알림이 반영됨
+        self._first_at = None
+        self._last_at = None
+        self._running = False
+        self._progress = None
+        self._last_outcome = {"complete": True, "error": None, "version": None}
+        self._worker = threading.Thread(target=self._worker_loop, name=f"replymate-indexer-{store_id}", daemon=True)
+        self._worker.start()
+
+    # ------------------------------------------------------------------
+    # 알림 / 대기 (화면 쪽)
+    # ------------------------------------------------------------------
+    def notify(self, reason=""):
+        """템플릿/메뉴 파일이 바뀌었음을 알림. wait()에 넘길 번호를 반환"""
+        with self._cond:
+            self._requested += 1
+            now = time.monotonic()
+            self._first_at = self._first_at or now
+            self._last_at = now
+            metrics.incr("indexer.requests")
+            if reason:
+                print(f"[INFO] Index rebuild requested: {reason}")
+            self._cond.notify_all()
+            return self._requested
+
+    def wait(self, ticket, timeout=None, on_progress=None):
+        """
+        ticket 번호의 알림이 반영될 때까지 기다림. 마지막 재구축 결과 dict를 반환 (시간 초과 시 None).
+        on_progress(완료 수, 전체 수)는 호출한 스레드에서 실행됩니다.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        reported = None
+        with self._cond:
+            while self._completed < ticket:
+                if on_progress and self._progress and self._progress != reported:
+                    reported = self._progress
+                    self._cond.release()
+                    try:
+                        on_progress(*reported)
+                    finally:
+                        self._cond.acquire()
+                    continue
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                # 진행률을 전하기 위해 주기적으로 깨어남
+                self._cond.wait(timeout=min(remaining, 0.2) if remaining is not None else 0.2)
+            return dict(self._last_outcome)
+
+    def request_and_wait(self, reason="", timeout=None, on_progress=None):
+        return self.wait(self.notify(reason), timeout=timeout, on_progress=on_progress)
+
+    def status(self):
+        with self._cond:
+            return {
+                "pending": self._requested - self._completed,
+                "running": self._running,
+                "progress": self._progress,
+                "last": dict(self._last_outcome)
+            }
+
+    # ------------------------------------------------------------------
+    # 워커
+    # ------------------------------------------------------------------
+    def _set_progress(self, done, total):
+        with self._cond:
+            self._progress = (done, total)
+            self._cond.notify_all()
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while self._requested == self._completed:
+                    self._cond.wait()
+                # 디바운스: 알림이 잠잠해지거나 최대 지연에 도달할 때까지 기다림
+                while True:
+                    now = time.monotonic()
+                    quiet_until = self._last_at + DEBOUNCE_SEC
+                    hard_until = self._first_at + MAX_DELAY_SEC
+                    if now >= min(quiet_until, hard_until):
+                        break
+                    self._cond.wait(timeout=min(quiet_until, hard_until) - now)
+                covered = self._requested
+                coalesced = covered - self._completed
+                self._first_at = self._last_at = None
+                self._running = True
+                self._progress = None
+
+            with tenancy.use_store(self.store_id):
+                outcome = self._rebuild(coalesced)
+
+            with self._cond:
+                self._running = False
+                self._progress = None
+                self._last_outcome = outcome
+                self._completed = covered
+                self._cond.notify_all()
+
+    def _rebuild(self, coalesced):
+        metrics.incr("indexer.rebuilds")
+        print(f"[INFO] Rebuilding knowledge base of '{self.store_id}' ({coalesced} change notifications)")
+        started = time.perf_counter()
+        lock_path = tenancy.data_dir(self.store_id) / "run" / WRITER_LOCK_NAME
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with FileLock(str(lock_path), timeout=LOCK_TIMEOUT_SEC):
+                rag = ReplyMateRAG()
+                complete = rag.init_db(on_progress=self._set_progress)
+                outcome = {"complete": complete, "error": None, "version": rag.active_version()}
+        except Timeout:
+            outcome = {"complete": False, "error": "다른 프로세스가 지식 베이스를 재구축 중입니다.", "version": None}
+        except Exception as e:
+            print(f"[ERROR] Knowledge base rebuild failed: {e}")
+            outcome = {"complete": False, "error": str(e), "version": None}
+        metrics.observe("indexer.rebuild_ms", (time.perf_counter() - started) * 1000)
+        return outcome
+
+
+_instances = {}
+_instance_lock = threading.Lock()
+
+
+def get_indexer(store_id=None):
+    """현재 가게의 재구축 워커 (최초 호출 시 시작)"""
+    store_id = store_id or tenancy.current_store()
+    with _instance_lock:
+        if store_id not in _instances:
+            _instances[store_id] = IndexMaintainer(store_id)
+        return _instances[store_id]
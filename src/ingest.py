@@ -0,0 +1,330 @@
+"""
+플랫폼 리뷰 내보내기 파일 가져오기 (스트리밍)
+
+사용 예:
+    python -m src.ingest baemin_export.xlsx
+    python -m src.ingest coupang_reviews.csv --store tteokbokki-gangnam
+
+- 입력: CSV / JSONL / JSON 배열 / XLSX. 파일 전체를 메모리에 올리지 않고 한 행씩 읽습니다. (XLSX는 openpyxl read-only 모드)
+- 플랫폼마다 다른 컬럼명(닉네임, 주문메뉴, 리뷰내용 등)을 작성 중 목록 형식(customer_name, menu_name, text)으로 맞춥니다.
+- 작성 중 목록과 완료 기록에 이미 있는 리뷰는 내용 해시로 걸러내고, 새 리뷰만 작성 중 목록 맨 앞에 한 번에 추가합니다.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import re
+import sys
+import tempfile
+import time
+import unicodedata
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from dotenv import load_dotenv
+from src import metrics
+
+SUPPORTED_SUFFIXES = (".csv", ".jsonl", ".json", ".xlsx")
+# 인코딩 판별용 앞부분 크기 (UTF-8로 읽히지 않으면 국내 플랫폼 CSV에 흔한 CP949로 읽음)
+ENCODING_SAMPLE_BYTES = 64 * 1024
+# JSON 배열을 나눠 읽는 단위
+JSON_READ_CHUNK = 64 * 1024
+CONTENT_HASH_LEN = 16
+# 진행률 콜백 호출 간격 (행 수)
+PROGRESS_EVERY = 5000
+
+# 작성 중 목록 필드 -> 플랫폼별 컬럼명 (대소문자/공백/밑줄/괄호는 무시하고 비교)
+COLUMN_ALIASES = {
+    "id": ("id", "review_id", "리뷰id", "리뷰번호"),
+    "customer_name": ("customer_name", "customer", "nickname", "author", "name",
+                      "고객명", "고객", "닉네임", "작성자", "주문자"),
+    "menu_name": ("menu_name", "menu", "menus", "item", "items", "order_menu",
+                  "메뉴", "메뉴명", "주문메뉴", "상품명"),
+    "text": ("text", "review_text", "review", "content", "comment", "body",
+             "리뷰", "리뷰내용", "내용", "본문"),
+    "rating": ("rating", "star", "stars", "score", "별점", "평점"),
+    "created_at": ("created_at", "date", "review_date", "written_at", "timestamp",
+                   "작성일", "작성일시", "등록일", "날짜"),
+}
+
+
+def _column_key(name):
+    return re.sub(r"[\s_\-()]", "", str(name).lower())
+
+
+_FIELD_BY_COLUMN = {_column_key(alias): field for field, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+
+# ------------------------------------------------------------------
+# 컬럼 정규화 / 내용 해시
+# ------------------------------------------------------------------
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_text(v) for v in value if _text(v))
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _rating(value):
+    """숫자("4.5", 5) 또는 별 문자("★★★★☆") 평점. 읽을 수 없으면 None"""
+    text = _text(value)
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return float(text.count("★")) if "★" in text else None
+
+
+def normalize_row(row):
+    """파일 한 행(dict)을 작성 중 리뷰 카드로 변환. 리뷰 내용이 없으면 None"""
+    fields = {}
+    for column, value in row.items():
+        field = _FIELD_BY_COLUMN.get(_column_key(column))
+        if field and field not in fields and _text(value):
+            fields[field] = value
+
+    text = _text(fields.get("text"))
+    if not text:
+        return None
+    review = {
+        "customer_name": _text(fields.get("customer_name")),
+        "menu_name": _text(fields.get("menu_name")),
+        "text": text,
+        "reply": None,
+        "status": "draft"
+    }
+    rating = _rating(fields.get("rating"))
+    if rating is not None:
+        review["rating"] = rating
+    if fields.get("created_at"):
+        review["created_at"] = _text(fields["created_at"])
+    # ID가 없으면 내용 기반으로 고정 ID 생성 (일괄 처리 재실행 시 체크포인트와 매칭되도록)
+    review["id"] = _text(fields.get("id")) or str(
+        uuid.uuid5(uuid.NAMESPACE_URL, f"{review['customer_name']}|{review['menu_name']}|{text}")
+    )
+    return review
+
+
+def _normalize_text(value):
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", value or "")).strip()
+
+
+def content_hash(customer_name, menu_name, text):
+    """중복 판별용 리뷰 내용 해시 (공백/유니코드 표기 차이는 무시)"""
+    key = "\x1f".join(_normalize_text(v) for v in (customer_name, menu_name, text))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:CONTENT_HASH_LEN]
+
+
+def existing_hashes():
+    """작성 중 목록과 완료 기록에 있는 리뷰의 내용 해시 집합 (완료 기록은 월 파티션 하나씩 읽음)"""
+    from src.data_manager import iter_drafts, iter_saved_reviews
+
+    hashes = set()
+    for d in iter_drafts():
+        hashes.add(content_hash(d.get("customer_name"), d.get("menu_name"), d.get("text")))
+    for r in iter_saved_reviews():
+        hashes.add(content_hash(r.get("customer_name"), r.get("menu_name"), r.get("review_text")))
+    return hashes
+
+
+# ------------------------------------------------------------------
+# 파일 읽기 (한 행씩)
+# ------------------------------------------------------------------
+def _text_stream(raw):
+    sample = raw.read(ENCODING_SAMPLE_BYTES)
+    raw.seek(0)
+    encoding = "utf-8-sig"
+    try:
+        sample.decode(encoding)
+    except UnicodeDecodeError as e:
+        # 샘플 끝에서 잘린 멀티바이트 문자는 UTF-8로 봄
+        if e.start < len(sample) - 3:
+            encoding = "cp949"
+    return io.TextIOWrapper(raw, encoding=encoding, newline="")
+
+
+def _iter_json_lines(stream):
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON 형식 오류 ({line_no}번째 줄): {e.msg}") from None
+
+
+def iter_json_array(stream):
+    """최상위 JSON 배열의 원소를 앞에서부터 하나씩 읽음"""
+    decoder = json.JSONDecoder()
+    separator = re.compile(r"[\s,]*")
+    buffer = stream.read(JSON_READ_CHUNK).lstrip()[1:]  # 여는 '['
+    pos = 0
+    eof = False
+    while True:
+        pos = separator.match(buffer, pos).end()
+        if buffer.startswith("]", pos):
+            return
+        if pos < len(buffer):
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"JSON 형식 오류: {e.msg}") from None
+            else:
+                yield item
+                continue
+        elif eof:
+            raise ValueError("JSON 형식 오류: 배열이 닫히지 않았습니다.")
+        # 원소가 읽던 조각 끝에서 잘렸으면 다음 조각을 이어 붙임
+        chunk = stream.read(JSON_READ_CHUNK)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def _iter_json(stream):
+    """JSON 배열이면 원소를 하나씩, 아니면 JSON Lines로 읽음"""
+    head = stream.read(JSON_READ_CHUNK)
+    stream.seek(0)
+    if head.lstrip().startswith("["):
+        return iter_json_array(stream)
+    return _iter_json_lines(stream)
+
+
+def _iter_xlsx(source):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("xlsx 파일을 읽으려면 openpyxl 패키지가 필요합니다. (pip install openpyxl)") from None
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        headers = None
+        for values in workbook.active.iter_rows(values_only=True):
+            if headers is None:
+                # 제목 행 위의 빈 줄은 건너뜀
+                if any(_text(v) for v in values):
+                    headers = [_text(v) for v in values]
+                continue
+            yield dict(zip(headers, values))
+    finally:
+        workbook.close()
+
+
+def iter_rows(source, filename=None):
+    """
+    파일의 행(dict)을 하나씩 반환.
+    source는 경로 또는 바이너리 파일 객체(Streamlit 업로드 파일 등), 형식은 filename(없으면 source)의 확장자로 판단합니다.
+    """
+    name = filename or getattr(source, "name", None) or str(source)
+    suffix = Path(name).suffix.lower()
+    if suffix not in SUPPORTED_SUFFIXES:
+        raise ValueError(f"지원하지 않는 파일 형식입니다: {suffix or name} ({', '.join(SUPPORTED_SUFFIXES)})")
+    if suffix == ".xlsx":
+        yield from _iter_xlsx(source)
+        return
+
+    owned = isinstance(source, (str, Path))
+    raw = open(source, 'rb') if owned else source
+    try:
+        stream = _text_stream(raw)
+        if suffix == ".csv":
+            yield from csv.DictReader(stream)
+        elif suffix == ".jsonl":
+            yield from _iter_json_lines(stream)
+        else:
+            yield from _iter_json(stream)
+    finally:
+        if owned:
+            raw.close()
+
+
+def iter_reviews(source, filename=None):
+    """리뷰 내용이 있는 행만 작성 중 리뷰 카드로 변환해 하나씩 반환"""
+    for row in iter_rows(source, filename):
+        review = normalize_row(row) if isinstance(row, dict) else None
+        if review is not None:
+            yield review
+
+
+# ------------------------------------------------------------------
+# 가져오기
+# ------------------------------------------------------------------
+def import_reviews(source, filename=None, on_progress=None):
+    """
+    파일의 새 리뷰를 현재 가게의 작성 중 목록에 추가하고 {rows, imported, duplicates, skipped}를 반환.
+    읽은 리뷰는 임시 파일에 한 줄씩 모았다가 마지막에 한 번에 기록하므로, 메모리에는 내용 해시 집합만 남습니다.
+    on_progress(읽은 행 수)는 PROGRESS_EVERY행마다 호출됩니다.
+    """
+    from src.data_manager import prepend_drafts
+
+    started = time.perf_counter()
+    seen = existing_hashes()
+    stats = {"rows": 0, "imported": 0, "duplicates": 0, "skipped": 0}
+
+    with tempfile.TemporaryFile(mode="w+", encoding="utf-8") as spill:
+        for row in iter_rows(source, filename):
+            stats["rows"] += 1
+            if on_progress and stats["rows"] % PROGRESS_EVERY == 0:
+                on_progress(stats["rows"])
+
+            review = normalize_row(row) if isinstance(row, dict) else None
+            if review is None:
+                stats["skipped"] += 1
+                continue
+            digest = content_hash(review["customer_name"], review["menu_name"], review["text"])
+            if digest in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(digest)
+            spill.write(json.dumps(review, ensure_ascii=False) + "\n")
+            stats["imported"] += 1
+
+        if stats["imported"]:
+            spill.seek(0)
+            prepend_drafts(json.loads(line) for line in spill)
+
+    elapsed = time.perf_counter() - started
+    metrics.incr("ingest.rows", stats["rows"])
+    metrics.incr("ingest.imported", stats["imported"])
+    metrics.incr("ingest.duplicates", stats["duplicates"])
+    metrics.observe("ingest.ms", elapsed * 1000)
+    print(f"[INFO] Imported {stats['imported']}/{stats['rows']} rows "
+          f"({stats['duplicates']} duplicates, {stats['skipped']} without review text) "
+          f"in {elapsed:.1f}s ({stats['rows'] / elapsed if elapsed else 0:.0f} rows/s)")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI ReplyMate 리뷰 파일 가져오기 (작성 중 목록에 추가)")
+    parser.add_argument("input", help="리뷰 파일 (.csv / .jsonl / .json / .xlsx)")
+    parser.add_argument("--store", default=None, help="가게 ID (기본: default)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    from src import tenancy
+
+    store_id = tenancy.validate_store_id(args.store or tenancy.DEFAULT_STORE)
+    if not tenancy.data_dir(store_id).exists():
+        print(f"[CRITICAL] 가게 '{store_id}'가 없습니다.")
+        return 1
+    tenancy.set_store(store_id)
+
+    try:
+        stats = import_reviews(args.input, on_progress=lambda n: print(f"[INFO] {n} rows read..."))
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"[ERROR] Import failed: {e}")
+        return 1
+    print(f"[SUCCESS] {stats['imported']} new reviews added to draft_reviews.json")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
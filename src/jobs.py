@@ -0,0 +1,380 @@
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from src import metrics, scheduler, tenancy
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+JOBS_DIR = DATA_DIR / "jobs"
+
+# 프로세스 전체(모든 세션/가게)가 공유하는 워커 스레드 수
+MAX_WORKERS = int(os.getenv("BATCH_WORKERS", "2"))
+# 한 번의 LLM 호출로 답글을 생성할 리뷰 수 (1이면 한 건씩 생성)
+GROUP_SIZE = int(os.getenv("BATCH_GROUP_SIZE", "8"))
+# 완료된 작업 기록 보관 기간
+JOB_RETENTION_SEC = 7 * 24 * 3600
+
+# 리뷰 단위 상태 (SKIPPED: 예산을 다 써서 처리하지 않고 작성 중 목록에 남김)
+QUEUED, RUNNING, DONE, FAILED, SKIPPED = "queued", "running", "done", "failed", "skipped"
+
+
+class JobQueue:
+    """
+    일괄 답글 생성 작업 큐 (프로세스 단위 싱글톤).
+    - 작업 상태는 data/jobs/<job_id>.json에 리뷰 단위로 저장되어, 탭을 닫거나 재접속해도 유지됩니다.
+    - 워커는 가게들을 라운드로빈으로 번갈아 처리하여 한 가게가 풀을 독점하지 않게 하고,
+      가게 안에서는 우선순위(scheduler.priority)가 가장 높은 리뷰가 남은 작업부터 꺼냅니다.
+    - 작업마다 실행 예산(초 / LLM 호출 수)이 있으면, 다 쓴 뒤에는 새 리뷰를 꺼내지 않고 멈춥니다.
+      LLM 호출 예산은 게이트웨이가 호출마다 차감하므로, 처리 중인 묶음에서 예산을 넘는 호출도 보내지 않고
+      해당 리뷰는 작성 중 목록에 남깁니다.
+    - 완료된 결과는 즉시 draft_reviews.json에 반영됩니다.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._pending = {}  # job_id -> heap[(-우선순위, 입력 순서, review_id)]
+        self._store_turns = OrderedDict()  # 대기 중인 작업이 있는 가게 (라운드로빈 순서)
+        self._meters = {}  # job_id -> 작업의 LLM 호출 예산을 차감하는 CallMeter (워커 간 공유)
+        self._graph = None
+
+        JOBS_DIR.mkdir(parents=True, exist_ok=True)
+        self._restore()
+
+        self._workers = []
+        for i in range(max_workers):
+            t = threading.Thread(target=self._worker_loop, name=f"replymate-job-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    # ------------------------------------------------------------------
+    # 영속화
+    # ------------------------------------------------------------------
+    def _job_path(self, job_id):
+        return JOBS_DIR / f"{job_id}.json"
+
+    def _persist(self, job):
+        tmp_path = self._job_path(job["id"]).with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._job_path(job["id"]))
+
+    def _restore(self):
+        """프로세스 재시작 시 미완료 작업을 다시 큐에 넣음"""
+        now = time.time()
+        for path in sorted(JOBS_DIR.glob("*.json")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                continue
+
+            if job["status"] in (DONE, FAILED) and now - job.get("finished_at", now) > JOB_RETENTION_SEC:
+                path.unlink(missing_ok=True)
+                continue
+
+            self._jobs[job["id"]] = job
+            remaining = [rid for rid in job["order"] if job["items"][rid]["status"] in (QUEUED, RUNNING)]
+            if remaining:
+                # 시간 예산에서 프로세스가 내려가 있던 시간은 빼고, 재시작 전까지 실행한 시간만 이어서 셈
+                if job.get("started_at"):
+                    job["started_at"] = now - (job.get("progress_at", job["started_at"]) - job["started_at"])
+                for rid in remaining:
+                    job["items"][rid]["status"] = QUEUED
+                self._enqueue(job, remaining)
+                print(f"[INFO] Resumed job {job['id']} ({len(remaining)} remaining)")
+
+    # ------------------------------------------------------------------
+    # 우선순위 대기열 (호출 시 self._cond 보유)
+    # ------------------------------------------------------------------
+    def _enqueue(self, job, review_ids):
+        position = {rid: i for i, rid in enumerate(job["order"])}
+        heap = [(-job["items"][rid].get("priority", 0.0), position[rid], rid) for rid in review_ids]
+        heapq.heapify(heap)
+        self._pending[job["id"]] = heap
+        self._store_turns[job.get("store_id", tenancy.DEFAULT_STORE)] = None
+
+    def _prepass(self, job_id):
+        """KoBERT 감정을 먼저 분석해 우선순위를 다시 매김 (그동안은 별점/고정/대기 시간만으로 처리)"""
+        with self._cond:
+            job = self._jobs[job_id]
+            reviews = [item["review"] for item in job["items"].values() if item["status"] == QUEUED]
+
+        labels = scheduler.sentiment_prepass(reviews)
+        if not labels:
+            return
+
+        with self._cond:
+            for review_id, label in labels.items():
+                item = job["items"][review_id]
+                item["kobert"] = label
+                item["priority"] = scheduler.priority(item["review"], label)
+            if job_id in self._pending:
+                self._enqueue(job, [rid for _, _, rid in self._pending[job_id]])
+            self._persist(job)
+
+    # ------------------------------------------------------------------
+    # 공개 API
+    # ------------------------------------------------------------------
+    def submit(self, reviews, store_name, tone, reuse_mode="off", budget=None):
+        """
+        리뷰 카드 목록으로 작업 생성. job_id 반환.
+        budget: {"seconds": 초, "llm_calls": 호출 수} (None인 항목은 제한 없음, 기본값은 scheduler.default_budget())
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "store_id": tenancy.current_store(),
+            "store_name": store_name,
+            "tone": tone,
+            "reuse_mode": reuse_mode,
+            "status": QUEUED,
+            "created_at": time.time(),
+            "budget": budget or scheduler.default_budget(),
+            "llm_calls": 0,
+            "stopped": None,
+            "order": [r["id"] for r in reviews],
+            "items": {
+                r["id"]: {"status": QUEUED, "review": dict(r), "result": None, "error": None,
+                          "priority": scheduler.priority(r)}
+                for r in reviews
+            }
+        }
+        with self._cond:
+            self._jobs[job_id] = job
+            self._persist(job)
+            self._enqueue(job, job["order"])
+            self._cond.notify_all()
+
+        threading.Thread(target=self._prepass, args=(job_id,), name=f"replymate-prepass-{job_id}", daemon=True).start()
+        print(f"[INFO] Job {job_id} submitted ({len(reviews)} reviews)")
+        return job_id
+
+    def get(self, job_id):
+        """작업 상태 요약 (진행률 표시용, 블로킹 없음)"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if not job:
+                return None
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0, SKIPPED: 0}
+            for item in job["items"].values():
+                counts[item["status"]] += 1
+            return {
+                "id": job_id,
+                "status": job["status"],
+                "store_id": job.get("store_id", tenancy.DEFAULT_STORE),
+                "store_name": job["store_name"],
+                "total": len(job["order"]),
+                "counts": counts,
+                "stopped": job.get("stopped"),
+                "pending_ids": [
+                    rid for rid, item in job["items"].items() if item["status"] in (QUEUED, RUNNING)
+                ],
+                "results": {
+                    rid: item["result"] for rid, item in job["items"].items()
+                    if item["status"] == DONE
+                },
+                "errors": {
+                    rid: item["error"] for rid, item in job["items"].items()
+                    if item["status"] == FAILED
+                }
+            }
+
+    def active_jobs(self, store_name=None):
+        """진행 중인 작업 ID 목록 (재접속한 세션이 이어서 진행률을 보기 위함)"""
+        with self._cond:
+            return [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in (QUEUED, RUNNING)
+                and job.get("store_id", tenancy.DEFAULT_STORE) == tenancy.current_store()
+                and (store_name is None or job["store_name"] == store_name)
+            ]
+
+    def queue_depth(self):
+        with self._cond:
+            return sum(len(heap) for heap in self._pending.values())
+
+    # ------------------------------------------------------------------
+    # 워커
+    # ------------------------------------------------------------------
+    def _next_items(self, limit):
+        """
+        가게들을 번갈아 가며, 차례가 된 가게에서 우선순위가 가장 높은 리뷰가 남은 작업을 골라
+        우선순위 순으로 최대 limit건을 꺼냄 (호출 시 self._cond 보유)
+        """
+        while True:
+            while not self._pending:
+                self._cond.wait()
+
+            store_id = next(iter(self._store_turns))
+            candidates = [jid for jid in self._pending
+                          if self._jobs[jid].get("store_id", tenancy.DEFAULT_STORE) == store_id]
+            if not candidates:
+                del self._store_turns[store_id]
+                continue
+            # 꺼낸 가게는 맨 뒤로 보내 다른 가게에게 차례를 넘김
+            self._store_turns.move_to_end(store_id)
+
+            job_id = min(candidates, key=lambda jid: (self._pending[jid][0][0], self._jobs[jid]["created_at"]))
+            job = self._jobs[job_id]
+            # 시간 예산은 다른 가게 작업 뒤에서 기다린 시간을 빼고, 첫 리뷰를 꺼낸 시점부터 셈
+            reason = scheduler.budget_exhausted(job.get("budget"), job.get("started_at"), job.get("llm_calls", 0))
+            if reason:
+                self._stop(job, reason)
+                continue
+            break
+
+        heap = self._pending[job_id]
+        review_ids = [heapq.heappop(heap)[2] for _ in range(min(limit, len(heap)))]
+        if not heap:
+            del self._pending[job_id]
+
+        job["status"] = RUNNING
+        job.setdefault("started_at", time.time())
+        for review_id in review_ids:
+            job["items"][review_id]["status"] = RUNNING
+        self._persist(job)
+        return job, review_ids
+
+    def _stop(self, job, reason):
+        """예산을 다 쓴 작업의 남은 리뷰를 꺼내지 않고 정리 (처리 중인 리뷰는 마저 끝냄)"""
+        skipped = self._pending.pop(job["id"], [])
+        for _, _, review_id in skipped:
+            job["items"][review_id]["status"] = SKIPPED
+        job["stopped"] = reason
+        metrics.incr("batch.budget_stops")
+        print(f"[WARN] Job {job['id']} stopped: {reason} budget used up "
+              f"({len(skipped)} reviews left as drafts)")
+        self._finish_if_done(job)
+        self._persist(job)
+
+    def _job_meter(self, job):
+        """작업의 호출 예산 미터 (호출 시 self._cond 보유, 재시작 전까지 쓴 호출 수부터 이어서 셈)"""
+        from src.llm_gateway import CallMeter
+
+        meter = self._meters.get(job["id"])
+        if meter is None:
+            meter = self._meters[job["id"]] = CallMeter(limit=(job.get("budget") or {}).get("llm_calls"),
+                                                       calls=job.get("llm_calls", 0))
+        return meter
+
+    def _finish_if_done(self, job):
+        if all(i["status"] in (DONE, FAILED, SKIPPED) for i in job["items"].values()):
+            self._meters.pop(job["id"], None)
+            job["status"] = DONE
+            job["finished_at"] = time.time()
+            print(f"[SUCCESS] Job {job['id']} finished")
+
+    def _get_graph(self):
+        if self._graph is None:
+            from src.workflow import build_graph
+            self._graph = build_graph(generate=False)
+        return self._graph
+
+    def _worker_loop(self):
+        while True:
+            job, review_ids = None, []
+            try:
+                # 긍정/부정 그룹이 각각 GROUP_SIZE만큼 찰 수 있도록 두 배를 꺼냄
+                with self._cond:
+                    job, review_ids = self._next_items(max(1, GROUP_SIZE) * 2)
+
+                reviews = [job["items"][rid]["review"] for rid in review_ids]
+                # 작업 큐와 워커는 모든 가게가 공유하고, 처리는 작업을 넣은 가게의 데이터로 함
+                with tenancy.use_store(job.get("store_id", tenancy.DEFAULT_STORE)):
+                    self._run_items(job, reviews, review_ids)
+            except Exception as e:
+                # 워커 스레드는 모든 작업이 공유하므로 예외로 종료되지 않게 함
+                print(f"[ERROR] Job worker error: {e}")
+                if job is not None:
+                    self._fail_items(job, review_ids, e)
+
+    def _fail_items(self, job, review_ids, error):
+        """처리 도중 예외가 난 리뷰 중 아직 처리 중인 것을 실패로 기록"""
+        with self._cond:
+            for review_id in review_ids:
+                item = job["items"][review_id]
+                if item["status"] == RUNNING:
+                    item["status"] = FAILED
+                    item["error"] = str(error)
+            self._finish_if_done(job)
+            try:
+                self._persist(job)
+            except OSError as e:
+                print(f"[ERROR] Could not save job {job['id']}: {e}")
+
+    def _run_items(self, job, reviews, review_ids):
+        from src.workflow import run_reviews, apply_result
+        from src.data_manager import update_draft
+        from src.llm_gateway import CallBudgetExceeded, metered
+
+        # 사전 분석한 KoBERT 감정은 워크플로우에서 다시 계산하지 않음
+        kobert_labels = {rid: job["items"][rid]["kobert"] for rid in review_ids if job["items"][rid].get("kobert")}
+        with self._cond:
+            meter = self._job_meter(job)
+        with metered(meter):
+            try:
+                outcomes = run_reviews(self._get_graph(), reviews, job["store_name"], job["tone"],
+                                       group_size=GROUP_SIZE, reuse_mode=job.get("reuse_mode", "off"),
+                                       kobert_labels=kobert_labels)
+            except Exception as e:
+                outcomes = {rid: e for rid in review_ids}
+
+        updates = {}
+        for review in reviews:
+            result = outcomes.get(review["id"], RuntimeError("no result"))
+            if isinstance(result, CallBudgetExceeded):
+                # 작성 중 목록에 그대로 남겨 다음 작업에서 다시 처리
+                updates[review["id"]] = (None, SKIPPED, None)
+                continue
+            if isinstance(result, Exception):
+                print(f"[ERROR] Job {job['id']} review {review['id']} failed: {result}")
+                updates[review["id"]] = (None, FAILED, str(result))
+                continue
+
+            try:
+                card = dict(review)
+                apply_result(card, result)
+                fields = {k: card.get(k) for k in ("reply", "sentiment", "category", "status", "menu_name",
+                                                      "reply_source", "reuse_pending", "reuse_score")}
+
+                # 결과가 나오는 즉시 작성 중 목록에 저장
+                update_draft(review["id"], fields)
+                updates[review["id"]] = (fields, DONE, None)
+                scheduler.record_reply(review, fields.get("sentiment"))
+            except Exception as e:
+                print(f"[ERROR] Job {job['id']} review {review['id']} could not be saved: {e}")
+                # 작성 중 목록에 이미 저장된 리뷰는 완료로 둠
+                updates.setdefault(review["id"], (None, FAILED, str(e)))
+
+        with self._cond:
+            job["llm_calls"] = meter.calls
+            job["progress_at"] = time.time()
+            for review_id, (fields, status, error) in updates.items():
+                item = job["items"][review_id]
+                item["status"] = status
+                item["result"] = fields
+                item["error"] = error
+            if any(status == SKIPPED for _, status, _ in updates.values()) and not job.get("stopped"):
+                self._stop(job, "llm_calls")
+                return
+            self._finish_if_done(job)
+            self._persist(job)
+
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def get_job_queue():
+    """프로세스 공용 작업 큐 (최초 호출 시 워커 시작)"""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = JobQueue()
+        return _instance
@@ -0,0 +1,170 @@
+"""
+지식 베이스(템플릿/메뉴) 글자 n-gram BM25 인덱스
+
+한국어 메뉴명("치즈돈까스" 등)은 리뷰 본문을 임베딩하는 것보다 글자 n-gram으로 맞추는 편이
+정확하고 비용도 들지 않습니다. 인덱스는 벡터 컬렉션 내용으로 만들고, 컬렉션이 갱신되면 다시 만듭니다.
+"""
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from src import metrics
+
+NGRAM_SIZES = (2, 3)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# RRF 상수 (순위 합산 시 상위 몇 개에 과하게 쏠리지 않도록)
+RRF_K = 60
+# 메뉴명 n-gram이 리뷰에 이만큼 들어 있으면 임베딩 없이 확정
+MENU_NAME_COVERAGE = 0.8
+
+
+def _clean(text):
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return re.sub(r"[^0-9a-z가-힣]+", "", text)
+
+
+def ngrams(text):
+    text = _clean(text)
+    grams = []
+    for n in NGRAM_SIZES:
+        grams.extend(text[i:i + n] for i in range(len(text) - n + 1))
+    if not grams and text:
+        grams.append(text)
+    return grams
+
+
+def menu_key(name):
+    """괄호 안 수량 표기 등은 빼고 비교 ("바삭 왕새우튀김(3개)" -> "바삭왕새우튀김")"""
+    return re.sub(r"\(.*?\)", "", name or "")
+
+
+def matches(meta, where):
+    """Chroma where 문법($and/$or/$eq/$ne/$in)으로 메타데이터 한 건 검사"""
+    if not where:
+        return True
+    if "$and" in where:
+        return all(matches(meta, cond) for cond in where["$and"])
+    if "$or" in where:
+        return any(matches(meta, cond) for cond in where["$or"])
+    for key, cond in where.items():
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        value = meta.get(key)
+        for op, expected in cond.items():
+            if op == "$eq" and value != expected:
+                return False
+            if op == "$ne" and value == expected:
+                return False
+            if op == "$in" and value not in expected:
+                return False
+    return True
+
+
+class LexicalIndex:
+    def __init__(self, documents, metadatas):
+        self.documents = list(documents)
+        self.metadatas = [m or {} for m in metadatas]
+        self.postings = defaultdict(dict)  # gram -> {문서 번호: tf}
+        self.lengths = []
+        for i, doc in enumerate(self.documents):
+            counts = Counter(ngrams(doc))
+            self.lengths.append(sum(counts.values()))
+            for gram, tf in counts.items():
+                self.postings[gram][i] = tf
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def candidates(self, where):
+        return [i for i, meta in enumerate(self.metadatas) if matches(meta, where)]
+
+    def search(self, query, k=5, where=None):
+        """(문서 번호, BM25 점수) 목록, 점수 내림차순. 겹치는 n-gram이 없으면 빈 목록"""
+        n = len(self.documents)
+        scores = defaultdict(float)
+        for gram in set(ngrams(query)):
+            posting = self.postings.get(gram)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for i, tf in posting.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / (self.avg_length or 1))
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        ranked = sorted(
+            ((i, s) for i, s in scores.items() if matches(self.metadatas[i], where)),
+            key=lambda item: item[1], reverse=True
+        )
+        return ranked[:k]
+
+    def confident_menus(self, query, k=1):
+        """리뷰에 메뉴명이 거의 그대로 나오면 그 메뉴 문서들 (애매하면 빈 목록)"""
+        query_grams = set(ngrams(query))
+        scored = []
+        for i, meta in enumerate(self.metadatas):
+            if meta.get("type") != "menu":
+                continue
+            name_grams = set(ngrams(menu_key(meta.get("name"))))
+            if not name_grams:
+                continue
+            coverage = len(name_grams & query_grams) / len(name_grams)
+            if coverage >= MENU_NAME_COVERAGE:
+                scored.append((coverage, len(name_grams), i))
+        if not scored:
+            return []
+        # 더 길게(구체적으로) 일치한 메뉴명 우선
+        scored.sort(reverse=True)
+        if len(scored) > k and scored[k - 1][:2] == scored[k][:2]:
+            return []
+        return [self.documents[i] for _, _, i in scored[:k]]
+
+
+def reciprocal_rank_fusion(*rankings, k=None):
+    """여러 순위 목록(문서 내용 리스트)을 RRF 점수로 합침"""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            fused[doc] += 1 / (RRF_K + rank + 1)
+    ordered = sorted(fused, key=fused.get, reverse=True)
+    return ordered[:k] if k else ordered
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(name, collection):
+    """컬렉션별 프로세스 공용 인덱스 (처음 쓸 때 컬렉션 내용으로 생성)"""
+    with _indexes_lock:
+        index = _indexes.get(name)
+        if index is None:
+            data = collection.get(include=["documents", "metadatas"])
+            index = LexicalIndex(data["documents"], data["metadatas"])
+            _indexes[name] = index
+        return index
+
+
+def invalidate(name):
+    with _indexes_lock:
+        _indexes.pop(name, None)
+
+
+def evict_store(store_id):
+    """가게별 키((store_id, 컬렉션))로 만든 인덱스를 모두 내림"""
+    with _indexes_lock:
+        for key in [k for k in _indexes if isinstance(k, tuple) and k[0] == store_id]:
+            _indexes.pop(key, None)
+
+
+def record_query(lexical_only):
+    metrics.incr("retrieval.queries")
+    if lexical_only:
+        metrics.incr("retrieval.lexical_only")
+
+
+def lexical_only_rate():
+    """임베딩 호출 없이 답한 검색 비율"""
+    return metrics.ratio("retrieval.lexical_only", "retrieval.queries")
@@ -0,0 +1,347 @@
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from src import metrics, tenancy
+
+# 호출자 우선순위 (숫자가 작을수록 먼저 처리)
+PRIORITY = {"interactive": 0, "batch": 1, "background": 2}
+
+# 응답 토큰 추정치 (요청 토큰 예산 계산용)
+OUTPUT_TOKEN_ALLOWANCE = 512
+
+# 재시도 대상 오류 (할당량 초과 / 일시적 장애)
+RETRYABLE_MARKERS = (
+    "429", "resourceexhausted", "resource_exhausted", "quota", "rate limit",
+    "503", "unavailable", "deadline", "timeout"
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """연속 실패로 차단기가 열려 있어 호출을 즉시 거절함"""
+
+
+class CallBudgetExceeded(RuntimeError):
+    """작업의 LLM 호출 예산을 다 써서 호출을 보내지 않음"""
+
+
+class TokenBucket:
+    """분당 한도(per_minute)를 초 단위로 나누어 채우는 토큰 버킷"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """amount만큼 쓰려면 기다려야 하는 시간(초). 0이면 바로 사용 가능"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class CallMeter:
+    """
+    한 실행 흐름에서 나간 LLM 호출 수 / 예상 토큰 수 (작업별 비용 예산, 재시도 포함).
+    limit이 있으면 호출마다 보내기 전에 차감하고, 다 쓴 뒤의 호출은 CallBudgetExceeded로 거절합니다.
+    """
+
+    def __init__(self, limit=None, calls=0):
+        self._lock = threading.Lock()
+        self.limit = limit
+        self.calls = calls
+        self.tokens = 0
+
+    def charge(self, tokens):
+        with self._lock:
+            if self.limit and self.calls >= self.limit:
+                raise CallBudgetExceeded(f"LLM call budget used up ({self.calls}/{self.limit} calls)")
+            self.calls += 1
+            self.tokens += tokens
+
+
+_meter = contextvars.ContextVar("replymate_llm_meter", default=None)
+
+
+@contextmanager
+def metered(meter=None):
+    """with 블록 안(submit()으로 넘긴 스레드 포함)에서 나간 호출을 meter(기본: 새 CallMeter)로 집계"""
+    meter = meter or CallMeter()
+    token = _meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _meter.reset(token)
+
+
+def estimate_tokens(prompt):
+    """프롬프트(문자열 또는 메시지 리스트)의 대략적인 토큰 수"""
+    if isinstance(prompt, str):
+        text = prompt
+    else:
+        text = " ".join(str(getattr(m, "content", m)) for m in prompt)
+    # 한국어는 대략 1~2글자당 1토큰
+    return len(text) // 2 + OUTPUT_TOKEN_ALLOWANCE
+
+
+def is_retryable(exc):
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(marker in text for marker in RETRYABLE_MARKERS)
+
+
+class LLMGateway:
+    """
+    프로세스 전체가 공유하는 Gemini 호출 관문.
+    - 분당 요청 수(RPM) / 토큰 수(TPM) 토큰 버킷
+    - 동시 호출 수 제한 + 호출자 우선순위 (interactive > batch > background)
+    - 가게별 분당 요청 수 한도 (STORE_RPM, 한 가게의 일괄 처리가 다른 가게 몫까지 쓰지 않도록)
+    - 지터가 들어간 지수 백오프 재시도
+    - 연속 실패 시 일정 시간 호출을 차단하는 circuit breaker
+      (쿨다운이 지나면 시험 호출 1건만 보내고, 성공하면 닫고 실패하면 다시 차단)
+    """
+
+    def __init__(self, rpm, tpm, max_concurrency, max_retries,
+                 base_delay=1.0, max_delay=30.0, breaker_threshold=5, breaker_cooldown=30.0,
+                 store_rpm=0):
+        self._cond = threading.Condition()
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._max_concurrency = max_concurrency
+        self._in_flight = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._store_rpm = store_rpm
+        self._store_buckets = {}
+
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._breaker_threshold = breaker_threshold
+        self._breaker_cooldown = breaker_cooldown
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+
+    # ------------------------------------------------------------------
+    # 슬롯 획득 / 반환
+    # ------------------------------------------------------------------
+    def _update_gauges(self):
+        metrics.set_gauge("llm.queue_depth", len(self._waiters))
+        metrics.set_gauge("llm.in_flight", self._in_flight)
+
+    def _acquire(self, tokens, priority):
+        entry = (PRIORITY.get(priority, PRIORITY["batch"]), next(self._seq))
+        started = time.monotonic()
+        throttled = False
+
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            self._update_gauges()
+            try:
+                while True:
+                    # 우선순위가 가장 높은 대기자만 버킷/동시성 검사를 통과할 수 있음
+                    if self._waiters[0] == entry and self._in_flight < self._max_concurrency:
+                        wait = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                        if wait <= 0:
+                            self._requests.consume(1)
+                            self._tokens.consume(tokens)
+                            self._in_flight += 1
+                            break
+                        throttled = True
+                        self._cond.wait(timeout=wait)
+                    else:
+                        self._cond.wait(timeout=1.0)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._update_gauges()
+                self._cond.notify_all()
+
+        if throttled:
+            metrics.incr("llm.throttled")
+        metrics.observe("llm.queue_wait_ms", (time.monotonic() - started) * 1000)
+
+    def _acquire_store_quota(self):
+        """현재 가게의 분당 한도까지 기다림 (전역 대기열에 들어가기 전에 적용)"""
+        if self._store_rpm <= 0:
+            return
+        store_id = tenancy.current_store()
+        throttled = False
+        with self._cond:
+            bucket = self._store_buckets.get(store_id)
+            if bucket is None:
+                bucket = self._store_buckets[store_id] = TokenBucket(self._store_rpm)
+            while True:
+                wait = bucket.wait_time(1)
+                if wait <= 0:
+                    bucket.consume(1)
+                    break
+                throttled = True
+                self._cond.wait(timeout=wait)
+        if throttled:
+            metrics.incr("llm.store_throttled")
+
+    def has_spare_capacity(self):
+        """
+        대기 중인 호출이 없고 동시 호출 슬롯/분당 요청 한도에 여유가 있으며 차단기가 닫혀 있으면 True.
+        결과를 버릴 수도 있는 선택적 호출(추측 생성)을 보낼지 정할 때 사용합니다.
+        """
+        with self._cond:
+            return (not self._waiters
+                    and self._in_flight < self._max_concurrency
+                    and self._requests.wait_time(1) <= 0
+                    and self._failures < self._breaker_threshold)
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._update_gauges()
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # Circuit breaker
+    # ------------------------------------------------------------------
+    def _check_circuit(self):
+        """
+        차단 중이면 CircuitOpenError. 쿨다운이 끝난 half-open 상태에서는 시험 호출 1건만 통과시키고
+        True를 반환합니다 (시험 호출이 끝날 때까지 나머지 호출은 계속 거절).
+        """
+        with self._cond:
+            if self._failures < self._breaker_threshold:
+                return False
+            remaining = self._open_until - time.monotonic()
+            if remaining <= 0 and not self._probing:
+                self._probing = True
+                metrics.incr("llm.circuit_probes")
+                return True
+        metrics.incr("llm.circuit_rejected")
+        if remaining > 0:
+            raise CircuitOpenError(f"LLM circuit open ({remaining:.1f}s remaining)")
+        raise CircuitOpenError("LLM circuit half-open (trial call in progress)")
+
+    def _end_probe(self):
+        with self._cond:
+            self._probing = False
+
+    def _record_failure(self):
+        with self._cond:
+            self._failures += 1
+            # 임계치 이후에는 (쿨다운 뒤 시험 호출 포함) 실패할 때마다 다시 차단
+            if self._failures >= self._breaker_threshold:
+                self._open_until = time.monotonic() + self._breaker_cooldown
+                metrics.incr("llm.circuit_opened")
+                print(f"[WARN] LLM circuit opened for {self._breaker_cooldown:.0f}s "
+                      f"({self._failures} consecutive failures)")
+
+    def _record_success(self):
+        with self._cond:
+            self._failures = 0
+
+    # ------------------------------------------------------------------
+    # 호출
+    # ------------------------------------------------------------------
+    def call(self, fn, tokens=OUTPUT_TOKEN_ALLOWANCE, priority="interactive", caller="llm"):
+        """fn()을 한도/우선순위/재시도 규칙에 따라 실행"""
+        metrics.incr(f"llm.calls.{caller}")
+
+        for attempt in range(self.max_retries + 1):
+            probe = self._check_circuit()
+            try:
+                # 예산은 대기열에 들어가기 전에 호출 단위로 차감 (다 썼으면 한도를 쓰지 않고 바로 거절)
+                meter = _meter.get()
+                if meter is not None:
+                    try:
+                        meter.charge(tokens)
+                    except CallBudgetExceeded:
+                        metrics.incr("llm.budget_rejected")
+                        raise
+                self._acquire_store_quota()
+                self._acquire(tokens, priority)
+
+                error = None
+                started = time.monotonic()
+                try:
+                    result = fn()
+                except Exception as e:
+                    error = e
+                finally:
+                    self._release()
+                    metrics.observe("llm.latency_ms", (time.monotonic() - started) * 1000)
+
+                if error is None:
+                    self._record_success()
+                    return result
+
+                if not is_retryable(error):
+                    metrics.incr("llm.errors")
+                    raise error
+
+                self._record_failure()
+            finally:
+                # 시험 호출이 끝나면 (성공: 닫힘 / 실패: 다시 차단 / 그 밖: 다음 호출이 다시 시험) 자리를 비움
+                if probe:
+                    self._end_probe()
+
+            if attempt == self.max_retries:
+                metrics.incr("llm.errors")
+                raise error
+
+            delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+            delay = random.uniform(delay / 2, delay)
+            metrics.incr("llm.retries")
+            print(f"[WARN] LLM call ({caller}) throttled/unavailable, retry {attempt + 1} in {delay:.1f}s: {error}")
+            time.sleep(delay)
+
+
+class GatedLLM:
+    """LangChain 채팅 모델을 감싸 모든 invoke가 게이트웨이를 거치도록 함"""
+
+    def __init__(self, llm, gateway):
+        self.llm = llm
+        self.gateway = gateway
+
+    def invoke(self, prompt, priority="interactive", caller="llm", **kwargs):
+        return self.gateway.call(
+            lambda: self.llm.invoke(prompt, **kwargs),
+            tokens=estimate_tokens(prompt),
+            priority=priority,
+            caller=caller
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """프로세스 공용 게이트웨이 (환경 변수로 한도 설정)"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway(
+                rpm=int(os.getenv("GEMINI_RPM", "60")),
+                tpm=int(os.getenv("GEMINI_TPM", "250000")),
+                max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+                max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "5")),
+                store_rpm=tenancy.STORE_RPM
+            )
+        return _gateway
@@ -0,0 +1,56 @@
+import threading
+
+# 프로세스 전체에서 공유하는 간단한 계측 레지스트리 (사이드바 개발자 도구에서 조회)
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_observations = {}
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, value):
+    """지연 시간 등 분포형 값 기록 (count / 평균 / 최대)"""
+    with _lock:
+        obs = _observations.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+        obs["count"] += 1
+        obs["sum"] += value
+        obs["max"] = max(obs["max"], value)
+
+
+def ratio(numerator, denominator):
+    """두 카운터의 비율 (분모가 0이면 None)"""
+    with _lock:
+        total = _counters.get(denominator, 0)
+        return _counters.get(numerator, 0) / total if total else None
+
+
+def snapshot():
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "observations": {
+                name: {
+                    "count": o["count"],
+                    "avg": round(o["sum"] / o["count"], 2) if o["count"] else 0,
+                    "max": round(o["max"], 2)
+                }
+                for name, o in _observations.items()
+            }
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _observations.clear()
@@ -1,15 +1,22 @@
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
 from langchain_google_genai import ChatGoogleGenerativeAI
 from transformers import pipeline
 from dotenv import load_dotenv
+from src.llm_gateway import GatedLLM, get_gateway
+from src import sentiment_service, sentiment_cache, metrics, tenancy
 
 load_dotenv()
 
 # 전역 변수
 sentiment_analyzer = None
 
+# 사장님 답글 자동 분류 (템플릿 메타데이터)
+REPLY_CATEGORIES = ["taste_good", "taste_bad", "delivery_delay", "wrong_item", "quantity", "service"]
+DEFAULT_REPLY_META = {"sentiment": "positive", "category": "service"}
+
 
 @st.cache_resource
 def get_llm(model_name="gemini-2.5-flash"):
@@ -28,12 +35,20 @@ def get_llm(model_name="gemini-2.5-flash"):
         st.error("API Key를 찾을 수 없습니다. .env 또는 secrets.toml을 확인하세요.")
         st.stop()
 
+    # 재시도/백오프는 게이트웨이가 담당하므로 클라이언트 자체 재시도는 끔 (1회 시도)
     llm = ChatGoogleGenerativeAI(
         model=model_name,
         temperature=0.7,
-        google_api_key=api_key
+        google_api_key=api_key,
+        max_retries=1,
+        # 응답이 멈춘 호출이 스레드를 계속 붙잡지 않도록 요청 자체에도 시간 제한
+        timeout=float(os.getenv("GEMINI_TIMEOUT_SEC", "60"))
     )
-    return llm
+    # 모든 invoke가 프로세스 공용 게이트웨이(한도/우선순위/재시도/차단기)를 거치도록 감쌈
+    return GatedLLM(llm, get_gateway())
+
+
+SENTIMENT_MODEL = "matthewburke/korean_sentiment"
 
 
 @st.cache_resource
@@ -41,25 +56,68 @@ def get_sentiment_analyzer():
     print("[INFO] Loading sentiment model... (This should happen only once)")
     sentiment_analyzer = pipeline(
         "sentiment-analysis",
-        model="matthewburke/korean_sentiment"
+        model=SENTIMENT_MODEL
     )
     return sentiment_analyzer
 
 
-def analyze_review_sentiment(text):
-    """KoBERT 감정 분석"""
-    analyzer = get_sentiment_analyzer()
-    result = analyzer(text, truncation=True)[0]
+LABEL_MAP = {"LABEL_0": "negative", "LABEL_1": "positive"}
 
-    label_map = {"LABEL_0": "negative", "LABEL_1": "positive"}
-    mapped_label = label_map.get(result['label'], result['label'])
 
+def _map_sentiment(result):
     return {
-        "label": mapped_label,
+        "label": LABEL_MAP.get(result['label'], result['label']),
         "score": round(result['score'], 4)
     }
 
 
+def _infer(texts, batch_size, use_service):
+    if use_service:
+        results = sentiment_service.analyze(texts)
+        if results:
+            return results
+
+    analyzer = get_sentiment_analyzer()
+    results = analyzer(list(texts), truncation=True, batch_size=batch_size)
+    return [_map_sentiment(r) for r in results]
+
+
+def analyze_review_sentiments(texts, batch_size=16, use_service=None):
+    """
+    KoBERT 감정 분석 (여러 건을 한 번에 배치 추론)
+    - 같은 텍스트(정규화 기준)는 캐시된 결과를 사용하고, 처음 보는 텍스트만 추론합니다.
+    - SENTIMENT_SERVICE=1이면 공용 추론 프로세스에서 묶어서 처리합니다.
+    """
+    if not texts:
+        return []
+    if use_service is None:
+        use_service = sentiment_service.is_enabled()
+
+    # 모델이나 추론 백엔드가 바뀌면 캐시도 새로 시작
+    cache = sentiment_cache.get_cache(f"{SENTIMENT_MODEL}|{'service' if use_service else 'local'}")
+    if cache is None:
+        return _infer(texts, batch_size, use_service)
+
+    keys = [sentiment_cache.text_key(t) for t in texts]
+    found = cache.get_many(keys)
+
+    missing = list(dict.fromkeys(k for k in keys if k not in found))
+    if missing:
+        first_text = {}
+        for key, text in zip(keys, texts):
+            first_text.setdefault(key, text)
+        results = _infer([first_text[k] for k in missing], batch_size, use_service)
+        cache.put_many(list(zip(missing, results)))
+        found.update(zip(missing, results))
+
+    return [dict(found[k]) for k in keys]
+
+
+def analyze_review_sentiment(text, use_service=None):
+    """KoBERT 감정 분석"""
+    return analyze_review_sentiments([text], use_service=use_service)[0]
+
+
 def auto_classify_reply(reply_text):
     """[Req 4] 사장님 입력 텍스트 분석하여 메타데이터 자동 추출"""
     llm = get_llm()
@@ -77,9 +135,82 @@ def auto_classify_reply(reply_text):
     """
 
     try:
-        res = llm.invoke(prompt)
+        res = llm.invoke(prompt, caller="auto_classify")
         content = res.content.replace("```json", "").replace("```", "").strip()
         return json.loads(content)
     except Exception as e:
         print(f"[ERROR] Auto-classification failed: {e}")
-        return {"sentiment": "positive", "category": "service"}
\ No newline at end of file
+        return dict(DEFAULT_REPLY_META)
+
+
+def _valid_meta(meta):
+    return (isinstance(meta, dict) and meta.get("sentiment") in ("positive", "negative")
+            and meta.get("category") in REPLY_CATEGORIES)
+
+
+def _classify_chunk(replies):
+    """답글 여러 개를 한 번의 호출로 분류. 번호 -> 메타데이터 (형식이 맞는 것만)"""
+    llm = get_llm()
+    numbered = "\n".join(f'{i}. "{text}"' for i, text in enumerate(replies, start=1))
+    prompt = f"""
+    Analyze each of the following restaurant owner's replies and extract metadata in JSON.
+
+    Input Replies:
+    {numbered}
+
+    Requirements (for EACH reply):
+    1. sentiment: Infer the sentiment of the *original customer review* this reply is addressing (positive or negative).
+    2. category: Choose one [{", ".join(REPLY_CATEGORIES)}].
+
+    Output JSON format only, keyed by the reply number:
+    {{"1": {{"sentiment": "...", "category": "..."}}, "2": {{"sentiment": "...", "category": "..."}}}}
+    """
+
+    res = llm.invoke(prompt, priority="batch", caller="auto_classify_batch")
+    content = res.content.replace("```json", "").replace("```", "").strip()
+    data = json.loads(content)
+    return {
+        int(key) - 1: {"sentiment": meta["sentiment"], "category": meta["category"]}
+        for key, meta in data.items()
+        if str(key).isdigit() and 0 < int(key) <= len(replies) and _valid_meta(meta)
+    }
+
+
+def auto_classify_replies(replies, chunk_size=50, max_workers=4, max_attempts=3, on_progress=None):
+    """
+    여러 답글을 묶어서 분류합니다. (청크 단위 동시 호출)
+    감정/카테고리가 허용 값이 아닌 행만 다시 요청하고, 끝까지 실패한 행은 기본값을 사용합니다.
+    on_progress(완료 수, 전체 수)는 호출한 스레드에서 실행됩니다.
+    """
+    results = [None] * len(replies)
+    pending = [i for i, text in enumerate(replies) if text and str(text).strip()]
+    done = len(replies) - len(pending)
+
+    for attempt in range(max_attempts):
+        if not pending:
+            break
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {tenancy.submit(pool, _classify_chunk, [replies[i] for i in chunk]): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    classified = future.result()
+                except Exception as e:
+                    print(f"[WARN] Bulk classification chunk failed (attempt {attempt + 1}): {e}")
+                    classified = {}
+                for offset, meta in classified.items():
+                    results[chunk[offset]] = meta
+                done += len(classified)
+                if on_progress:
+                    on_progress(done, len(replies))
+
+        pending = [i for i in pending if results[i] is None]
+        if pending:
+            metrics.incr("classify.retried_rows", len(pending))
+
+    if pending:
+        print(f"[WARN] {len(pending)} replies could not be classified, using defaults")
+    if on_progress:
+        on_progress(len(replies), len(replies))
+    return [meta or dict(DEFAULT_REPLY_META) for meta in results]
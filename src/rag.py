@@ -1,95 +1,407 @@
+import hashlib
 import json
+import os
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import chromadb
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 from dotenv import load_dotenv
+from src.embeddings import get_embeddings, collection_name
+from src import vector_store as numpy_store
+from src import lexical
+from src import metrics, tenancy
 
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+# 기본 가게 위치 (다른 가게는 tenancy.path()로 stores/<store_id>/ 아래)
 DATA_DIR = BASE_DIR / "data"
 DB_DIR = BASE_DIR / "chroma_db"
+KNOWLEDGE_COLLECTION = "reply_data"
+APPROVED_COLLECTION = "approved_replies"
+STYLE_COLLECTION = "owner_style"
+
+# 말투 예시 인덱스 크기 상한 (넘으면 감정/카테고리/톤 묶음별 최신 순으로 골고루 남김)
+STYLE_MAX_EXAMPLES = int(os.getenv("STYLE_MAX_EXAMPLES", "2000"))
+# 상한을 이만큼 넘었을 때 정리 (저장할 때마다 정리하지 않도록)
+STYLE_PRUNE_SLACK = 0.1
+
+# 임베딩 청크 크기 제한 (요청당 문서 수 / 글자 수) 및 동시 요청 수
+EMBED_CHUNK_DOCS = 100
+EMBED_CHUNK_CHARS = 20000
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+
+# 버전 컬렉션: 포인터 파일, 남겨둘 버전 수(활성 포함, 교체 직후에도 이전 버전을 읽던 검색이 끝나도록)
+POINTER_FILE = "active_versions.json"
+KEEP_VERSIONS = 2
+VERSION_HASH_LEN = 10
+COPY_BATCH = 1000
+
+# 하이브리드 검색 시 RRF로 합치기 전에 각 방식에서 가져올 후보 배수
+HYBRID_POOL = 3
+
+# 지식 베이스 저장소: chroma(기본) / numpy(프로세스 내 행렬 검색, 소규모 가게 데이터용)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma").lower()
+
+
+def content_id(doc):
+    """문서 내용+메타데이터 해시 (같은 문서는 항상 같은 ID)"""
+    payload = json.dumps([doc.page_content, doc.metadata], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def document_version(doc_ids):
+    """문서 ID 집합으로 정한 버전 ID (내용이 같으면 항상 같은 버전)"""
+    return "v" + hashlib.sha1("\n".join(sorted(doc_ids)).encode("utf-8")).hexdigest()[:VERSION_HASH_LEN]
+
+
+def _chunk_ids(ids, docs):
+    """문서 수와 글자 수 제한을 넘지 않도록 ID 목록을 나눔"""
+    chunks, current, size = [], [], 0
+    for doc_id in ids:
+        length = len(docs[doc_id].page_content)
+        if current and (len(current) >= EMBED_CHUNK_DOCS or size + length > EMBED_CHUNK_CHARS):
+            chunks.append(current)
+            current, size = [], 0
+        current.append(doc_id)
+        size += length
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# 임베딩 모델이 바뀌어 새 컬렉션이 비어 있을 때 자동 색인은 프로세스당 한 번만
+_auto_indexed = set()
+_auto_index_lock = threading.Lock()
+
+_style_checked = set()
+_style_lock = threading.Lock()
+
+_pointer_cache = {}
+_pointer_lock = threading.Lock()
+
+# 가게(persist 경로)별 Chroma 클라이언트. chromadb는 경로마다 시스템(HNSW 인덱스 포함) 하나를 프로세스 전역에
+# 두고 클라이언트 참조 수로 관리하므로, 클라이언트를 하나만 만들어 공유해야 close() 한 번으로 내릴 수 있음
+_chroma_clients = {}
+_chroma_lock = threading.Lock()
+
+
+def _chroma_client(persist_dir):
+    with _chroma_lock:
+        client = _chroma_clients.get(persist_dir)
+        if client is None:
+            client = _chroma_clients[persist_dir] = chromadb.PersistentClient(path=persist_dir)
+        return client
+
+
+def _release_chroma(persist_dir):
+    """가게의 Chroma 클라이언트를 닫아 메모리의 시스템을 내림 (이미 연 Chroma 객체는 더 이상 쓸 수 없음)"""
+    with _chroma_lock:
+        client = _chroma_clients.pop(persist_dir, None)
+        if client is None:
+            return
+        close = getattr(client, "close", None)
+        if close is None:
+            print(f"[WARN] chromadb {chromadb.__version__} has no Client.close(); '{persist_dir}' stays in memory")
+            return
+        close()
+
+
+@tenancy.register_evictor
+def _evict_store(store_id):
+    """유휴 가게의 검색 캐시/행렬 인덱스와 Chroma 시스템을 내림"""
+    lexical.evict_store(store_id)
+    numpy_store.evict_root(tenancy.path("vector_db", store_id))
+    roots = (str(tenancy.path("chroma_db", store_id)), str(tenancy.path("vector_db", store_id)))
+    with _pointer_lock:
+        for path in list(_pointer_cache):
+            if str(path).startswith(roots):
+                _pointer_cache.pop(path, None)
+    _release_chroma(str(tenancy.path("chroma_db", store_id)))
+
+
+def active_version():
+    """현재 활성 지식 베이스 버전 ID (캐시 키용, 아직 버전이 없으면 None)"""
+    return ReplyMateRAG().active_version()
 
 
 class ReplyMateRAG:
     def __init__(self):
-        self.persist_dir = str(DB_DIR)
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+        # 인스턴스는 생성 시점의 가게에 묶임
+        self.store_id = tenancy.current_store()
+        self.data_dir = tenancy.data_dir(self.store_id)
+        self.persist_dir = str(tenancy.path("chroma_db", self.store_id))
+        self.vector_dir = tenancy.path("vector_db", self.store_id)
+        # 임베딩 백엔드는 EMBEDDING_BACKEND(google/local)로 선택, 컬렉션은 임베딩 모델별로 분리
+        self.embeddings = get_embeddings()
+        self.collection_name = collection_name(KNOWLEDGE_COLLECTION)
+        self.approved_collection_name = collection_name(APPROVED_COLLECTION)
+        self.style_collection_name = collection_name(STYLE_COLLECTION)
         self.vector_store = None
+        self.active_name = None
+        self.approved_store = None
+        self.style_store = None
 
     def _load_json(self, filename):
-        file_path = DATA_DIR / filename
+        file_path = self.data_dir / filename
         if not file_path.exists():
             print(f"[WARN] File not found: {file_path}")
             return []
         with open(file_path, 'r', encoding='utf-8') as f:
             return json.load(f)
 
-    def init_db(self, template_file="templates.json", menu_file="menu_info.json"):
-
-        # 1. 문서 데이터 준비
+    def template_documents(self, template_file="templates.json"):
         docs = []
-
-        # 템플릿 로드
         templates = self._load_json(template_file)
         for t in templates:
             meta = t.get("metadata", {})
             docs.append(Document(page_content=t["content"], metadata=meta))
+        return docs
 
-        # 메뉴 로드
+    def menu_documents(self, menu_file="menu_info.json"):
+        docs = []
         menus = self._load_json(menu_file)
         for m in menus:
             content = f"메뉴명: {m['menu_name']} / 특징: {m['description']}"
             meta = {"type": "menu", "name": m['menu_name']}
             docs.append(Document(page_content=content, metadata=meta))
+        return docs
 
-        # 2. DB 업데이트 (삭제 후 재생성 대신 갱신)
-        if DB_DIR.exists():
-            print("[INFO] Updating existing DB...")
-            # 기존 DB 로드
-            self.vector_store = Chroma(
-                persist_directory=self.persist_dir,
-                embedding_function=self.embeddings,
-                collection_name="reply_data"
+    def _build_documents(self, template_file, menu_file):
+        return self.template_documents(template_file) + self.menu_documents(menu_file)
+
+    def _embed_chunk(self, texts):
+        """임베딩 1회 요청 (원격 API는 embeddings.GatedEmbeddings가 프로세스 공용 게이트웨이를 거쳐 호출)"""
+        return self.embeddings.embed_documents(texts)
+
+    def init_db(self, template_file="templates.json", menu_file="menu_info.json", on_progress=None):
+        """
+        템플릿/메뉴 문서로 새 버전 컬렉션을 만들고, 완성되면 활성 버전 포인터를 바꿉니다.
+        - 재구축 중에도 검색은 기존 활성 버전을 그대로 사용 (빈 결과/반쯤 만들어진 인덱스가 보이지 않음)
+        - 버전 ID는 문서 집합의 해시라서, 내용이 같으면 아무 작업도 하지 않음
+        - 활성 버전에 이미 있는 문서는 임베딩을 복사하고, 새 문서만 크기 제한 청크로 나누어 동시에 임베딩
+        - 중간에 실패하면 포인터는 그대로 두고, 다음 실행 때 만들던 버전에서 이어서 진행
+        - on_progress(완료 수, 전체 수)는 호출한 스레드에서 실행됩니다.
+        - 화면/CLI에서는 직접 부르지 말고 src.indexer를 거칩니다. (재구축은 항상 한 번에 하나)
+        반환값: 모든 문서가 활성 버전에 반영되었는지 여부
+        """
+        # 1. 문서 데이터 준비 (내용 해시 ID, 중복 제거)
+        docs = {}
+        for doc in self._build_documents(template_file, menu_file):
+            docs.setdefault(content_id(doc), doc)
+
+        version = document_version(docs)
+        target_name = f"{self.collection_name}__{version}"
+        active_name = self._active_collection_name()
+        if target_name == active_name:
+            print(f"[SUCCESS] Knowledge base ({VECTOR_STORE}) up to date ({len(docs)} documents, {version})")
+            self.vector_store, self.active_name = self._open_vector_store(active_name), active_name
+            return True
+
+        # 2. 새 버전 컬렉션 채우기 (이전 실행에서 넣은 문서는 건너뜀)
+        staged = self._open_vector_store(target_name)
+        collection = self._collection(staged)
+        existing = set(collection.get(include=[])["ids"])
+        missing = [doc_id for doc_id in docs if doc_id not in existing]
+        copied = self._copy_embeddings(active_name, collection, missing)
+        new_ids = [doc_id for doc_id in missing if doc_id not in copied]
+
+        total = len(new_ids)
+        done, failed = 0, 0
+        started = time.perf_counter()
+        if new_ids:
+            chunks = _chunk_ids(new_ids, docs)
+            print(f"[INFO] Building {version}: embedding {total} new documents in {len(chunks)} chunks "
+                  f"({len(copied)} copied from the active version)")
+
+            # 로컬 모델은 한 스레드에서 큰 배치로 처리하는 편이 빠름
+            with ThreadPoolExecutor(max_workers=EMBED_WORKERS if self.embeddings.is_remote else 1) as pool:
+                futures = {
+                    tenancy.submit(pool, self._embed_chunk, [docs[i].page_content for i in chunk]): chunk
+                    for chunk in chunks
+                }
+                for future in as_completed(futures):
+                    chunk = futures[future]
+                    try:
+                        vectors = future.result()
+                        collection.upsert(
+                            ids=chunk,
+                            embeddings=vectors,
+                            documents=[docs[i].page_content for i in chunk],
+                            metadatas=[docs[i].metadata or None for i in chunk]
+                        )
+                        done += len(chunk)
+                    except Exception as e:
+                        # 실패한 청크는 새 버전에 없으므로 다음 init_db 때 다시 임베딩됨
+                        failed += len(chunk)
+                        print(f"[ERROR] Embedding chunk failed ({len(chunk)} docs): {e}")
+
+                    if on_progress:
+                        on_progress(done + failed, total)
+
+        self._persist(staged)
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed > 0 else 0
+        if failed:
+            print(f"[WARN] Indexed {done}/{total} documents ({rate:.1f} docs/s); {failed} failed. "
+                  f"Still serving {active_name}; {version} resumes on the next rebuild")
+            return False
+
+        # 3. 완성된 버전으로 포인터 교체 후 오래된 버전 정리
+        self._activate(version, target_name)
+        self.vector_store, self.active_name = staged, target_name
+        print(f"[SUCCESS] Knowledge base ({VECTOR_STORE}) switched to {version} "
+              f"({len(docs)} docs, {done} embedded, {rate:.1f} docs/s)")
+        self._collect_garbage()
+        return True
+
+    def _copy_embeddings(self, source_name, collection, ids):
+        """활성 버전에 이미 있는 문서의 임베딩을 새 버전으로 복사. 복사한 ID 집합"""
+        if not ids or not source_name:
+            return set()
+        source = self._collection(self._open_vector_store(source_name))
+        copied = set()
+        for i in range(0, len(ids), COPY_BATCH):
+            found = source.get(ids=ids[i:i + COPY_BATCH], include=["embeddings", "documents", "metadatas"])
+            if not found["ids"]:
+                continue
+            collection.upsert(
+                ids=found["ids"],
+                embeddings=found["embeddings"],
+                documents=found["documents"],
+                metadatas=[m or None for m in found["metadatas"]]
             )
+            copied.update(found["ids"])
+        return copied
 
-            # [핵심] 기존 데이터 삭제 (IDs 조회 후 삭제)
-            # 폴더를 지우는 게 아니라, SQL처럼 데이터만 지움 -> 파일 잠금 안 걸림
-            try:
-                existing_ids = self.vector_store.get()['ids']
-                if existing_ids:
-                    self.vector_store.delete(ids=existing_ids)
-                    print(f"[INFO] Deleted {len(existing_ids)} old documents.")
-
-                # 새 데이터 추가
-                if docs:
-                    self.vector_store.add_documents(docs)
-                    print(f"[INFO] Added {len(docs)} new documents.")
-            except Exception as e:
-                print(f"[ERROR] DB update failed: {e}")
+    # ------------------------------------------------------------------
+    # 버전 포인터 (활성 버전 / 이전 버전 기록)
+    # ------------------------------------------------------------------
+    def _pointer_file(self):
+        return (self.vector_dir if VECTOR_STORE == "numpy" else Path(self.persist_dir)) / POINTER_FILE
 
-        else:
-            print("[INFO] Creating new DB...")
-            # DB가 아예 없으면 새로 생성
-            if docs:
-                self.vector_store = Chroma.from_documents(
-                    documents=docs,
-                    embedding=self.embeddings,
-                    persist_directory=self.persist_dir,
-                    collection_name="reply_data"
-                )
+    def _read_pointers(self):
+        path = self._pointer_file()
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        cached = _pointer_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            pointers = json.load(f)
+        _pointer_cache[path] = (mtime, pointers)
+        return pointers
 
-        print(f"[SUCCESS] ChromaDB updated at: {self.persist_dir}")
+    def _active_collection_name(self):
+        """활성 버전 컬렉션 이름 (버전이 없으면 예전 방식의 단일 컬렉션)"""
+        entry = self._read_pointers().get(self.collection_name)
+        return entry["collection"] if entry else self.collection_name
 
-    def load_db(self):
-        self.vector_store = Chroma(
-            persist_directory=self.persist_dir,
+    def active_version(self):
+        entry = self._read_pointers().get(self.collection_name)
+        return entry["version"] if entry else None
+
+    def _activate(self, version, name):
+        with _pointer_lock:
+            pointers = dict(self._read_pointers())
+            previous = pointers.get(self.collection_name)
+            # 버전이 처음 생길 때는 예전 방식의 단일 컬렉션이 직전 버전
+            history = [previous["collection"]] + previous.get("history", []) if previous else [self.collection_name]
+            pointers[self.collection_name] = {
+                "version": version,
+                "collection": name,
+                "activated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "history": [h for h in history if h != name]
+            }
+            path = self._pointer_file()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(pointers, f, ensure_ascii=False, indent=2)
+            # 원자적 교체: 읽는 쪽은 항상 이전 또는 새 포인터 중 하나만 봄
+            os.replace(tmp_path, path)
+
+    def _collect_garbage(self):
+        """활성 버전과 직전 KEEP_VERSIONS-1개만 남기고 이 컬렉션의 다른 버전은 삭제"""
+        entry = self._read_pointers().get(self.collection_name)
+        if not entry:
+            return
+        keep = {entry["collection"], *entry.get("history", [])[:KEEP_VERSIONS - 1]}
+        for name in self._list_collections():
+            if name not in keep and (name == self.collection_name or name.startswith(f"{self.collection_name}__v")):
+                try:
+                    self._drop_collection(name)
+                    print(f"[INFO] Dropped old knowledge base version: {name}")
+                except Exception as e:
+                    print(f"[WARN] Failed to drop {name}: {e}")
+
+        with _pointer_lock:
+            pointers = dict(self._read_pointers())
+            current = pointers.get(self.collection_name)
+            if current:
+                pointers[self.collection_name] = {**current, "history": current.get("history", [])[:KEEP_VERSIONS - 1]}
+                tmp_path = self._pointer_file().with_suffix(".tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(pointers, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self._pointer_file())
+
+    # ------------------------------------------------------------------
+    # 저장소 (Chroma / NumPy)
+    # ------------------------------------------------------------------
+    def _open_vector_store(self, name):
+        if VECTOR_STORE == "numpy":
+            return numpy_store.open_store(name, self.embeddings, root=self.vector_dir)
+        return Chroma(
+            client=_chroma_client(self.persist_dir),
             embedding_function=self.embeddings,
-            collection_name="reply_data"
+            collection_name=name
         )
 
+    def _list_collections(self):
+        if VECTOR_STORE == "numpy":
+            return numpy_store.list_stores(root=self.vector_dir)
+        client = self._open_vector_store(self._active_collection_name())._client
+        return [c if isinstance(c, str) else c.name for c in client.list_collections()]
+
+    def _drop_collection(self, name):
+        if VECTOR_STORE == "numpy":
+            numpy_store.drop_store(name, root=self.vector_dir)
+        else:
+            self._open_vector_store(name)._client.delete_collection(name)
+
+    def _collection(self, store=None):
+        """get/upsert/delete/count를 제공하는 컬렉션 (NumPy 저장소는 저장소 자체)"""
+        store = store or self.vector_store
+        if isinstance(store, numpy_store.NumpyVectorStore):
+            return store
+        return store._collection
+
+    def _persist(self, store):
+        # Chroma는 쓰는 즉시 기록됨
+        if isinstance(store, numpy_store.NumpyVectorStore):
+            store.persist()
+
+    def load_db(self):
+        self.active_name = self._active_collection_name()
+        self.vector_store = self._open_vector_store(self.active_name)
+
+        # 임베딩 모델을 바꾸면 활성 버전이 없으므로 원본 데이터로 다시 색인
+        with _auto_index_lock:
+            if (self.store_id, self.collection_name) in _auto_indexed:
+                return
+            _auto_indexed.add((self.store_id, self.collection_name))
+            if self._collection().count() == 0 and (self.data_dir / "templates.json").exists():
+                from src.indexer import get_indexer
+                get_indexer().request_and_wait(f"empty knowledge base '{self.collection_name}'")
+                self.active_name = self._active_collection_name()
+                self.vector_store = self._open_vector_store(self.active_name)
+
     def search_templates(self, sentiment: str, category: str = None, tone: str = None, k=2):
         if not self.vector_store:
             self.load_db()
@@ -109,6 +421,14 @@ class ReplyMateRAG:
 
         print(f"[INFO] Search Filter: {filter_cond}")
 
+        # 필터를 통과한 템플릿이 k개 이하면 순위를 매길 필요가 없으므로 임베딩 생략
+        index = lexical.get_index((self.store_id, self.active_name), self._collection())
+        candidates = index.candidates(filter_cond)
+        if len(candidates) <= k:
+            lexical.record_query(True)
+            return [index.documents[i] for i in candidates]
+        lexical.record_query(False)
+
         # 데이터가 없을 경우 에러 방지
         try:
             results = self.vector_store.similarity_search(
@@ -144,18 +464,203 @@ class ReplyMateRAG:
 
             return []
 
+        # 1. 리뷰에 메뉴명이 그대로 나오면 임베딩 없이 확정
+        index = lexical.get_index((self.store_id, self.active_name), self._collection())
+        confident = index.confident_menus(query, k=k)
+        lexical.record_query(bool(confident))
+        if confident:
+            print(f"[INFO] 메뉴 글자 일치: {confident}")
+            return confident
+
+        # 2. 글자 n-gram BM25 순위와 벡터 순위를 RRF로 합침
+        lexical_hits = [index.documents[i] for i, _ in index.search(query, k=k * HYBRID_POOL, where={"type": "menu"})]
         try:
             results = self.vector_store.similarity_search(
                 query=query,
-                k=k,
+                k=k * HYBRID_POOL,
                 filter={"type": "menu"}
             )
-            return [doc.page_content for doc in results]
+            vector_hits = [doc.page_content for doc in results]
         except Exception as e:
             print(f"[WARN] Similarity search failed: {e}")
+            vector_hits = []
+        return lexical.reciprocal_rank_fusion(lexical_hits, vector_hits, k=k)
+
+    # ------------------------------------------------------------------
+    # 사장님이 승인(저장 완료)한 리뷰-답글 쌍 인덱스
+    # ------------------------------------------------------------------
+    def _get_approved_store(self):
+        if not self.approved_store:
+            self.approved_store = Chroma(
+                client=_chroma_client(self.persist_dir),
+                embedding_function=self.embeddings,
+                collection_name=self.approved_collection_name,
+                collection_metadata={"hnsw:space": "cosine"}
+            )
+        return self.approved_store
+
+    def add_approved_reply(self, review):
+        """저장된 리뷰(saved_reviews 형식)를 인덱스에 추가/갱신 (ID 기준 upsert)"""
+        return self.add_approved_replies([review])
+
+    def add_approved_replies(self, reviews):
+        """
+        저장된 리뷰들을 인덱스에 추가/갱신하고 추가한 건수를 반환 (ID 기준 upsert).
+        리뷰 본문 임베딩은 한 번에 요청하고, 그 벡터로 재사용 인덱스와 말투 예시 인덱스를 함께 갱신합니다.
+        """
+        by_id = {r["id"]: r for r in reviews if r.get("id") and r.get("review_text") and r.get("reply_text")}
+        if not by_id:
+            return 0
+        ids = list(by_id)
+        metas = [{
+            "reply": r["reply_text"],
+            "tone": r.get("tone") or "",
+            "sentiment": r.get("sentiment") or "unknown",
+            "category": r.get("category") or "unknown",
+            "menu": r.get("menu_name") or "",
+            "customer_name": r.get("customer_name") or "",
+            "timestamp": str(r.get("timestamp") or "")
+        } for r in by_id.values()]
+        texts = [r["review_text"] for r in by_id.values()]
+        vectors = self._embed_chunk(texts)
+        self._get_approved_store()._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metas)
+        self._add_style_examples(ids, vectors, metas)
+        return len(ids)
+
+    def missing_approved_ids(self, ids):
+        """주어진 리뷰 ID 중 재사용 인덱스에 아직 없는 것 (순서 유지)"""
+        ids = list(ids)
+        if not ids:
+            return []
+        found = set(self._get_approved_store()._collection.get(ids=ids, include=[])["ids"])
+        return [i for i in ids if i not in found]
+
+    # ------------------------------------------------------------------
+    # 말투 예시 인덱스 (승인 답글이 쌓일수록 늘어나는 사장님 말투 샘플)
+    # 문서는 답글, 벡터는 리뷰 본문 임베딩 -> 지금 리뷰와 비슷한 리뷰에 단 답글을 찾음
+    # ------------------------------------------------------------------
+    def _get_style_store(self):
+        if not self.style_store:
+            self.style_store = Chroma(
+                client=_chroma_client(self.persist_dir),
+                embedding_function=self.embeddings,
+                collection_name=self.style_collection_name,
+                collection_metadata={"hnsw:space": "cosine"}
+            )
+            with _style_lock:
+                if (self.store_id, self.style_collection_name) not in _style_checked:
+                    _style_checked.add((self.store_id, self.style_collection_name))
+                    self._backfill_style_examples()
+        return self.style_store
+
+    def _add_style_examples(self, ids, vectors, metadatas):
+        collection = self._get_style_store()._collection
+        collection.upsert(
+            ids=ids, embeddings=vectors, documents=[m["reply"] for m in metadatas],
+            metadatas=[{k: v for k, v in m.items() if k != "reply"} for m in metadatas]
+        )
+        count = collection.count()
+        metrics.set_gauge("style.examples", count)
+        if count > STYLE_MAX_EXAMPLES * (1 + STYLE_PRUNE_SLACK):
+            self.prune_style_examples()
+
+    def _backfill_style_examples(self):
+        """말투 예시 인덱스가 비어 있으면 재사용 인덱스에서 임베딩째 복사 (다시 임베딩하지 않음)"""
+        style = self.style_store._collection
+        if style.count() > 0:
+            return
+        approved = self._get_approved_store()._collection
+        total = approved.count()
+        for offset in range(0, total, COPY_BATCH):
+            found = approved.get(offset=offset, limit=COPY_BATCH, include=["embeddings", "metadatas"])
+            if found["ids"]:
+                style.upsert(
+                    ids=found["ids"], embeddings=found["embeddings"],
+                    documents=[m.get("reply", "") for m in found["metadatas"]],
+                    metadatas=[{k: v for k, v in m.items() if k != "reply"} for m in found["metadatas"]]
+                )
+        if total:
+            print(f"[INFO] Backfilled owner style examples from {total} approved replies")
+            if total > STYLE_MAX_EXAMPLES:
+                self.prune_style_examples()
+
+    def prune_style_examples(self, max_examples=None):
+        """
+        상한을 넘으면 (감정, 카테고리, 톤) 묶음을 돌아가며 최신 답글부터 남기고 나머지는 삭제합니다.
+        같은 답글 문장은 가장 최근 것 하나만 남깁니다.
+        """
+        max_examples = max_examples or STYLE_MAX_EXAMPLES
+        collection = self._get_style_store()._collection
+        data = collection.get(include=["documents", "metadatas"])
+
+        buckets, seen_replies = {}, set()
+        rows = sorted(zip(data["ids"], data["documents"], data["metadatas"]),
+                      key=lambda row: (row[2] or {}).get("timestamp", ""), reverse=True)
+        duplicates = []
+        for doc_id, reply, meta in rows:
+            meta = meta or {}
+            if reply in seen_replies:
+                duplicates.append(doc_id)
+                continue
+            seen_replies.add(reply)
+            key = (meta.get("sentiment"), meta.get("category"), meta.get("tone"))
+            buckets.setdefault(key, []).append(doc_id)
+
+        keep, queues = [], [bucket for bucket in buckets.values()]
+        depth = 0
+        while len(keep) < max_examples and any(depth < len(q) for q in queues):
+            for q in queues:
+                if depth < len(q) and len(keep) < max_examples:
+                    keep.append(q[depth])
+            depth += 1
+
+        drop = list(set(data["ids"]) - set(keep))
+        for i in range(0, len(drop), COPY_BATCH):
+            collection.delete(ids=drop[i:i + COPY_BATCH])
+        if drop:
+            print(f"[INFO] Pruned {len(drop)} owner style examples ({len(duplicates)} duplicates), kept {len(keep)}")
+        metrics.set_gauge("style.examples", len(keep))
+
+    def search_style_examples(self, review_text: str, sentiment: str, tone: str = None, k=2):
+        """지금 리뷰와 비슷한 리뷰에 사장님이 승인한 답글 (감정/톤 일치)"""
+        conditions = [{"sentiment": {"$eq": sentiment}}]
+        if tone:
+            conditions.append({"tone": {"$eq": tone}})
+        started = time.perf_counter()
+        try:
+            store = self._get_style_store()
+            if store._collection.count() == 0:
+                return []
+            results = store.similarity_search(
+                query=review_text, k=k, filter={"$and": conditions} if len(conditions) > 1 else conditions[0]
+            )
+        except Exception as e:
+            print(f"[WARN] Style example search failed: {e}")
             return []
+        metrics.observe("style.search_ms", (time.perf_counter() - started) * 1000)
+        return [doc.page_content for doc in results]
+
+    def count_approved_replies(self):
+        return self._get_approved_store()._collection.count()
+
+    def search_approved_reply(self, review_text: str, tone: str = None):
+        """가장 비슷한 승인 답글 1건과 유사도(0~1). 없으면 (None, 0.0)"""
+        try:
+            results = self._get_approved_store().similarity_search_with_relevance_scores(
+                query=review_text,
+                k=1,
+                filter={"tone": {"$eq": tone}} if tone else None
+            )
+        except Exception as e:
+            print(f"[WARN] Approved reply search failed: {e}")
+            return None, 0.0
+
+        if not results:
+            return None, 0.0
+        doc, score = results[0]
+        return doc, score
 
 
 if __name__ == "__main__":
-    rag = ReplyMateRAG()
-    rag.init_db()
\ No newline at end of file
+    from src.indexer import get_indexer
+    get_indexer().request_and_wait("command line")
\ No newline at end of file
@@ -0,0 +1,223 @@
+import os
+import re
+import threading
+import time
+from src import archive, metrics, tenancy
+from src.embeddings import collection_name
+from src.rag import APPROVED_COLLECTION, ReplyMateRAG
+
+# 이 유사도(0~1, cosine) 이상이면 기존 승인 답글을 재사용
+REUSE_THRESHOLD = float(os.getenv("REUSE_THRESHOLD", "0.93"))
+
+# 재사용 모드: off(사용 안 함) / confirm(사장님 확인 후 적용) / auto(바로 적용)
+REUSE_MODES = {"사용 안 함": "off", "확인 후 적용": "confirm", "자동 적용": "auto"}
+
+# 색인 워커가 한 번의 임베딩 요청으로 묶는 리뷰 수
+INDEX_BATCH = 64
+# 기존 기록 채우기(backfill)가 실패하면 이 시간 뒤에 다시 시도
+BACKFILL_RETRY_SEC = 60
+
+_rags = {}  # store_id -> ReplyMateRAG
+_rag_lock = threading.Lock()
+
+
+def _get_rag():
+    store_id = tenancy.current_store()
+    with _rag_lock:
+        rag = _rags.get(store_id)
+        # 임베딩 백엔드가 바뀌면 새 모델의 컬렉션을 쓰는 인스턴스로 교체
+        if rag is None or rag.approved_collection_name != collection_name(APPROVED_COLLECTION):
+            rag = _rags[store_id] = ReplyMateRAG()
+        return rag
+
+
+@tenancy.register_evictor
+def _evict_store(store_id):
+    with _rag_lock:
+        _rags.pop(store_id, None)
+
+
+class ApprovedReplyIndexer:
+    """
+    승인 답글 재사용 인덱스 색인 전담 워커 (가게별 1개, 프로세스 안에서 공유).
+    - 저장 완료된 리뷰는 submit()으로 넘기면 화면을 막지 않고 백그라운드에서 묶어서 임베딩합니다.
+    - 처음 시작할 때와 임베딩 모델이 바뀌어 새 컬렉션을 쓰게 될 때, 완료 기록 중 인덱스에 없는 리뷰만 골라
+      묶음 단위로 채웁니다. 완료 여부는 컬렉션에 실제로 들어 있는 ID로 판단하므로, 중간에 멈추거나
+      종료 전에 색인하지 못한 리뷰도 다음 실행에서 이어서 채워집니다.
+    """
+
+    def __init__(self, store_id):
+        self.store_id = store_id
+        self._cond = threading.Condition()
+        self._pending = {}    # review id -> review (같은 리뷰를 다시 저장하면 최신 것만)
+        self._busy = False
+        self._synced = set()  # 기존 기록을 모두 채운 컬렉션 이름
+        self._retry_at = 0.0
+        self._worker = threading.Thread(target=self._worker_loop, name=f"replymate-reuse-{store_id}", daemon=True)
+        self._worker.start()
+
+    def submit(self, review):
+        if not review.get("id"):
+            return
+        with self._cond:
+            self._pending[review["id"]] = review
+            self._cond.notify_all()
+
+    def ensure_synced(self):
+        """현재 임베딩 모델의 컬렉션을 아직 채우지 않았으면 (모델 변경 등) 워커를 깨움"""
+        with self._cond:
+            if self._needs_backfill():
+                self._cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """대기 중인 색인과 기존 기록 채우기가 끝날 때까지 기다림. 끝났으면 True"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while self._pending or self._busy or self._needs_backfill():
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(timeout=remaining)
+            return True
+
+    def _needs_backfill(self):
+        return collection_name(APPROVED_COLLECTION) not in self._synced and time.monotonic() >= self._retry_at
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._needs_backfill():
+                    retry_in = self._retry_at - time.monotonic()
+                    self._cond.wait(timeout=retry_in if retry_in > 0 else None)
+                backfill = self._needs_backfill()
+                batch = [self._pending.pop(rid) for rid in list(self._pending)[:INDEX_BATCH]]
+                self._busy = True
+
+            try:
+                with tenancy.use_store(self.store_id):
+                    if backfill:
+                        self._backfill()
+                    if batch:
+                        self._index(batch)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _index(self, reviews):
+        try:
+            _get_rag().add_approved_replies(reviews)
+            metrics.incr("reuse.indexed", len(reviews))
+        except Exception as e:
+            # 색인하지 못한 리뷰는 다음 실행의 기존 기록 채우기에서 다시 색인됨
+            print(f"[WARN] Approved reply indexing failed ({len(reviews)} reviews): {e}")
+
+    def _backfill(self):
+        """완료 기록 중 현재 컬렉션에 없는 리뷰만 묶음 단위로 임베딩"""
+        name = collection_name(APPROVED_COLLECTION)
+        rag = _get_rag()
+        added = 0
+        try:
+            chunk = []
+            for review in archive.iter_reviews():
+                if review.get("id") and review.get("review_text") and review.get("reply_text"):
+                    chunk.append(review)
+                if len(chunk) >= INDEX_BATCH:
+                    added += self._add_missing(rag, chunk)
+                    chunk = []
+            added += self._add_missing(rag, chunk)
+        except Exception as e:
+            print(f"[WARN] Approved reply backfill failed, retrying in {BACKFILL_RETRY_SEC}s: {e}")
+            with self._cond:
+                self._retry_at = time.monotonic() + BACKFILL_RETRY_SEC
+            return
+
+        with self._cond:
+            self._synced.add(name)
+        if added:
+            print(f"[INFO] Backfilled approved reply index of '{self.store_id}' ({added} reviews)")
+
+    @staticmethod
+    def _add_missing(rag, reviews):
+        missing = set(rag.missing_approved_ids([r["id"] for r in reviews]))
+        return rag.add_approved_replies([r for r in reviews if r["id"] in missing]) if missing else 0
+
+
+_indexers = {}
+_indexer_lock = threading.Lock()
+
+
+def get_reuse_indexer(store_id=None):
+    """현재 가게의 승인 답글 색인 워커 (최초 호출 시 시작하고 기존 기록 채우기를 시작)"""
+    store_id = store_id or tenancy.current_store()
+    with _indexer_lock:
+        if store_id not in _indexers:
+            _indexers[store_id] = ApprovedReplyIndexer(store_id)
+        return _indexers[store_id]
+
+
+def index_approved_reply(review):
+    """저장 완료된 리뷰를 재사용 인덱스 색인 대기열에 넣음 (임베딩은 백그라운드 워커가 처리)"""
+    get_reuse_indexer().submit(review)
+
+
+# ------------------------------------------------------------------
+# 로컬 치환 (LLM 없이 고객명/메뉴명만 바꿔 끼움)
+# ------------------------------------------------------------------
+def address_name(customer_name):
+    """답글에서 부를 호칭 (어색한 긴 닉네임은 '고객'으로)"""
+    name = (customer_name or "").strip()
+    if not name:
+        return "고객"
+    if re.fullmatch(r"[A-Za-z0-9_.]+", name) or (len(name) <= 5 and " " not in name):
+        return name
+    return "고객"
+
+
+def adapt_reply(reply, old_name, new_name, old_menu, new_menu):
+    adapted = reply
+    old_call = address_name(old_name)
+    new_call = address_name(new_name)
+    if old_call != "고객" and old_call != new_call:
+        adapted = adapted.replace(f"{old_call}님", f"{new_call}님")
+
+    if old_menu and new_menu and old_menu != new_menu and old_menu != "null":
+        adapted = adapted.replace(old_menu, new_menu)
+    return adapted
+
+
+def find_reusable_reply(review, tone):
+    """
+    비슷한 리뷰에 사장님이 승인했던 답글을 찾아 고객명/메뉴명만 바꿔 반환합니다.
+    유사도가 임계치 미만이면 None. (워크플로우 결과와 같은 형태의 dict)
+    """
+    if not review.get("text"):
+        return None
+
+    # 인덱스가 아직 채워지는 중이면 찾지 못할 수 있음 (그 경우 평소처럼 새로 생성)
+    get_reuse_indexer().ensure_synced()
+    metrics.incr("reuse.lookups")
+
+    doc, score = _get_rag().search_approved_reply(review["text"], tone=tone)
+    if doc is None or score < REUSE_THRESHOLD:
+        return None
+
+    metrics.incr("reuse.hits")
+    meta = doc.metadata
+    new_menu = review.get("menu_name") or ""
+    print(f"[INFO] Reusing approved reply (similarity {score:.3f})")
+
+    # 답글 문장만 가져오고, 감정/카테고리/메뉴 같은 사실은 재사용한 이웃 리뷰가 아니라 이 리뷰의 값만 사용
+    return {
+        "final_reply": adapt_reply(meta["reply"], meta.get("customer_name"), review.get("customer_name"),
+                                   meta.get("menu"), new_menu),
+        "sentiment": review.get("sentiment") or "unknown",
+        "category": review.get("category"),
+        "extracted_menu": "null",
+        "reply_source": "reuse",
+        "reuse_score": round(score, 3)
+    }
+
+
+def hit_rate():
+    return metrics.ratio("reuse.hits", "reuse.lookups")
@@ -0,0 +1,122 @@
+"""
+일괄 생성 우선순위 / 실행 예산
+
+시간이나 호출 한도가 먼저 바닥나더라도 화가 난 고객이 칭찬 리뷰보다 먼저 답글을 받도록,
+리뷰마다 점수를 매겨 높은 순서대로 처리합니다.
+- 점수: 고정(pinned) > 부정 감정(KoBERT 사전 분석) > 낮은 별점 > 오래 기다린 리뷰
+- 예산(초 / LLM 호출 수)을 다 쓰면 새 리뷰를 꺼내지 않고 멈춥니다. 남은 리뷰는 작성 중 목록에 대기 상태로 남습니다.
+"""
+import os
+import time
+import pandas as pd
+from src import archive, metrics
+
+PIN_WEIGHT = 100.0
+NEGATIVE_WEIGHT = 20.0
+# 별점이 5점보다 1점 낮을 때마다
+RATING_WEIGHT = 4.0
+# 하루 기다릴 때마다 (AGE_CAP_DAYS일까지만 반영)
+AGE_WEIGHT_PER_DAY = 1.0
+AGE_CAP_DAYS = 7
+
+# 일괄 생성 1회의 기본 예산 (0이면 제한 없음)
+TIME_BUDGET_SEC = float(os.getenv("BATCH_TIME_BUDGET_SEC", "0"))
+CALL_BUDGET = int(os.getenv("BATCH_CALL_BUDGET", "0"))
+
+
+# ------------------------------------------------------------------
+# 우선순위
+# ------------------------------------------------------------------
+def arrived_at(review):
+    """리뷰가 들어온 시각 (created_at, 없으면 timestamp). 없거나 읽을 수 없으면 None"""
+    # tz가 붙은 값은 로컬 시간으로 (pd.Timestamp.now()와 같은 시간대)
+    return archive.local_timestamp(review.get("created_at") or review.get("timestamp"))
+
+
+def _age_days(review, now):
+    created = arrived_at(review)
+    if created is None:
+        return 0.0
+    return max(0.0, (now - created).total_seconds() / 86400)
+
+
+def priority(review, sentiment=None, now=None):
+    """리뷰 처리 우선순위 점수 (클수록 먼저). sentiment는 KoBERT 사전 분석 결과"""
+    now = now or pd.Timestamp.now()
+    score = 0.0
+    if review.get("pinned"):
+        score += PIN_WEIGHT
+    if (sentiment or review.get("sentiment")) == "negative":
+        score += NEGATIVE_WEIGHT
+    rating = review.get("rating")
+    if isinstance(rating, (int, float)):
+        score += RATING_WEIGHT * (5 - min(5.0, max(1.0, rating)))
+    score += AGE_WEIGHT_PER_DAY * min(AGE_CAP_DAYS, _age_days(review, now))
+    return round(score, 3)
+
+
+def prioritize(reviews, labels=None):
+    """점수 높은 순으로 정렬 (같은 점수는 원래 순서 유지)"""
+    now = pd.Timestamp.now()
+    labels = labels or {}
+    return sorted(reviews, key=lambda r: -priority(r, labels.get(r["id"]), now))
+
+
+def sentiment_prepass(reviews):
+    """
+    감정이 아직 없는 리뷰만 KoBERT로 먼저 분석 (결과 캐시/추론 서비스 사용). review id -> 감정.
+    결과는 워크플로우에도 넘겨 같은 리뷰를 다시 분석하지 않습니다. 실패하면 빈 dict.
+    """
+    targets = [r for r in reviews if r.get("text") and not r.get("sentiment")]
+    if not targets:
+        return {}
+    started = time.perf_counter()
+    try:
+        from src.models import analyze_review_sentiments
+        results = analyze_review_sentiments([r["text"] for r in targets])
+    except Exception as e:
+        print(f"[WARN] Sentiment pre-pass failed, ordering without it: {e}")
+        return {}
+    metrics.incr("scheduler.prepass_reviews", len(targets))
+    metrics.observe("scheduler.prepass_ms", (time.perf_counter() - started) * 1000)
+    return {r["id"]: result["label"] for r, result in zip(targets, results)}
+
+
+# ------------------------------------------------------------------
+# 실행 예산
+# ------------------------------------------------------------------
+def default_budget():
+    return {"seconds": TIME_BUDGET_SEC or None, "llm_calls": CALL_BUDGET or None}
+
+
+def budget_exhausted(budget, started_at, llm_calls):
+    """
+    다 쓴 예산 이름("time" / "llm_calls"), 남아 있으면 None.
+    started_at은 첫 리뷰를 처리하기 시작한 시각(time.time() 기준), 아직 시작 전이면 None (시간 예산은 줄지 않음)
+    """
+    budget = budget or {}
+    if budget.get("seconds") and started_at is not None and time.time() - started_at >= budget["seconds"]:
+        return "time"
+    if budget.get("llm_calls") and llm_calls >= budget["llm_calls"]:
+        return "llm_calls"
+    return None
+
+
+# ------------------------------------------------------------------
+# 답글까지 걸린 시간
+# ------------------------------------------------------------------
+def record_reply(review, sentiment):
+    """리뷰가 들어온 시각부터 답글 완성까지 걸린 시간 기록 (부정 리뷰는 따로). 들어온 시각을 모르면 기록하지 않음"""
+    created = arrived_at(review)
+    if created is None:
+        return
+    waited_ms = max(0.0, (pd.Timestamp.now() - created).total_seconds() * 1000)
+    metrics.observe("batch.time_to_reply_ms", waited_ms)
+    if sentiment == "negative":
+        metrics.observe("batch.negative_time_to_reply_ms", waited_ms)
+
+
+def negative_time_to_reply():
+    """부정 리뷰 평균 답글 대기 시간(초). 기록이 없으면 None"""
+    obs = metrics.snapshot()["observations"].get("batch.negative_time_to_reply_ms")
+    return obs["avg"] / 1000 if obs else None
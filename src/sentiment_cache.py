@@ -0,0 +1,154 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from src import metrics
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CACHE_DIR = BASE_DIR / "data" / "cache"
+CACHE_DB = CACHE_DIR / "sentiment.sqlite"
+
+# 디스크 정리는 이 횟수의 쓰기마다 한 번씩
+TRIM_EVERY = 200
+
+
+def normalize(text):
+    """같은 리뷰로 볼 수 있도록 유니코드/공백/대소문자 정규화"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def text_key(text):
+    return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    """
+    KoBERT 결과 LRU 캐시 (정규화 텍스트 해시 -> {label, score}).
+    persist=True이면 data/cache/sentiment.sqlite에도 기록해 재시작 후에도 유지합니다.
+    namespace(모델/백엔드)가 바뀌면 기존 기록은 모두 버립니다.
+    """
+
+    def __init__(self, max_entries, namespace, persist=False):
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes = 0
+        if persist:
+            self._open_db()
+
+    # ------------------------------------------------------------------
+    # 디스크 테이블
+    # ------------------------------------------------------------------
+    def _open_db(self):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(CACHE_DB), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sentiment (key TEXT PRIMARY KEY, label TEXT, score REAL)")
+
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'namespace'").fetchone()
+        if row is None or row[0] != self.namespace:
+            if row is not None:
+                print(f"[INFO] Sentiment cache invalidated (model/backend changed: {row[0]} -> {self.namespace})")
+            self._db.execute("DELETE FROM sentiment")
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('namespace', ?)", (self.namespace,))
+        else:
+            # 최근 기록부터 메모리에 올림
+            rows = self._db.execute(
+                "SELECT key, label, score FROM sentiment ORDER BY rowid DESC LIMIT ?", (self.max_entries,)
+            ).fetchall()
+            for key, label, score in reversed(rows):
+                self._entries[key] = {"label": label, "score": score}
+        self._db.commit()
+
+    def _write(self, items):
+        if self._db is None or not items:
+            return
+        self._db.executemany(
+            "INSERT OR REPLACE INTO sentiment (key, label, score) VALUES (?, ?, ?)",
+            [(key, r["label"], r["score"]) for key, r in items]
+        )
+        self._writes += len(items)
+        if self._writes >= TRIM_EVERY:
+            self._writes = 0
+            self._db.execute(
+                "DELETE FROM sentiment WHERE rowid NOT IN "
+                "(SELECT rowid FROM sentiment ORDER BY rowid DESC LIMIT ?)", (self.max_entries,)
+            )
+        self._db.commit()
+
+    # ------------------------------------------------------------------
+    # 조회 / 저장
+    # ------------------------------------------------------------------
+    def get_many(self, keys):
+        """key -> 결과 (없는 키는 빠짐)"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = dict(self._entries[key])
+        metrics.incr("sentiment_cache.lookups", len(keys))
+        metrics.incr("sentiment_cache.hits", len(found))
+        metrics.incr("sentiment_cache.misses", len(keys) - len(found))
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            for key, result in items:
+                self._entries[key] = {"label": result["label"], "score": result["score"]}
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            try:
+                self._write(items)
+            except sqlite3.Error as e:
+                print(f"[WARN] Sentiment cache write failed: {e}")
+            metrics.set_gauge("sentiment_cache.size", len(self._entries))
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM sentiment")
+                self._db.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(namespace):
+    """
+    프로세스 공용 캐시. namespace(모델|백엔드)가 바뀌면 새로 만듦.
+    SENTIMENT_CACHE_SIZE=0이면 캐시를 쓰지 않음 (None)
+    """
+    global _cache
+    max_entries = int(os.getenv("SENTIMENT_CACHE_SIZE", "10000"))
+    if max_entries <= 0:
+        return None
+
+    with _cache_lock:
+        if _cache is None or _cache.namespace != namespace:
+            if _cache is not None:
+                _cache.close()
+            _cache = SentimentCache(
+                max_entries, namespace, persist=os.getenv("SENTIMENT_CACHE_PERSIST", "0") == "1"
+            )
+        return _cache
+
+
+def hit_rate():
+    return metrics.ratio("sentiment_cache.hits", "sentiment_cache.lookups")
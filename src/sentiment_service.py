@@ -0,0 +1,301 @@
+"""
+KoBERT 감정 분석 전용 추론 프로세스 (세션 간 마이크로 배치)
+
+모든 세션/작업 스레드의 요청을 한 프로세스로 모아, 최대 대기 시간(MAX_WAIT_MS) 동안
+최대 MAX_BATCH건까지 묶어서 한 번에 추론합니다. 추론 프로세스의 스레드 수는 고정합니다.
+
+    SENTIMENT_SERVICE=1 로 켜면 analyze_review_sentiment(s)가 이 프로세스를 거칩니다.
+    연결 인증 키는 SENTIMENT_AUTHKEY 환경 변수로 지정하거나, 없으면 시작할 때마다 새로 만들어
+    주소 파일(소유자만 읽기 가능)에 함께 기록합니다.
+    python -m src.sentiment_service --bench 50   # 동시 호출 50개 기준 처리량 비교
+"""
+import argparse
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import AuthenticationError, get_context
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RUN_DIR = BASE_DIR / "data" / "run"
+ADDRESS_FILE = RUN_DIR / "sentiment.addr"
+
+MAX_BATCH = int(os.getenv("SENTIMENT_MAX_BATCH", "32"))
+MAX_WAIT_MS = float(os.getenv("SENTIMENT_MAX_WAIT_MS", "10"))
+NUM_THREADS = int(os.getenv("SENTIMENT_THREADS", "2"))
+REQUEST_TIMEOUT_SEC = 30
+# 추론 프로세스가 모델을 불러와 연결을 받을 때까지 기다리는 최대 시간
+STARTUP_WAIT_SEC = 120
+
+
+def _env_authkey():
+    key = os.getenv("SENTIMENT_AUTHKEY")
+    return key.encode("utf-8") if key else None
+
+
+def _new_authkey():
+    """이번 실행에 쓸 인증 키 (환경 변수가 없으면 실행마다 새로 생성)"""
+    return _env_authkey() or os.urandom(32)
+
+
+def _publish_address(address, authkey):
+    """주소와 인증 키를 소유자만 읽을 수 있는 파일로 교체 저장 (환경 변수로 받은 키는 기록하지 않음)"""
+    data = {"address": address}
+    if _env_authkey() is None:
+        data["authkey"] = authkey.hex()
+    tmp_path = ADDRESS_FILE.with_suffix(".tmp")
+    tmp_path.unlink(missing_ok=True)
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, ADDRESS_FILE)
+
+
+def _read_address():
+    """(주소, 인증 키). 파일이 없거나 읽을 수 없으면 OSError"""
+    try:
+        data = json.loads(ADDRESS_FILE.read_text(encoding="utf-8"))
+        authkey = _env_authkey() or bytes.fromhex(data["authkey"])
+        return data["address"], authkey
+    except (ValueError, KeyError, TypeError) as e:
+        raise OSError(f"invalid sentiment service address file: {e}") from None
+
+
+# ------------------------------------------------------------------
+# 서버 (별도 프로세스)
+# ------------------------------------------------------------------
+def _listener_address():
+    if sys.platform == "win32":
+        return rf"\\.\pipe\replymate-sentiment-{os.getpid()}"
+    return str(RUN_DIR / f"sentiment-{os.getpid()}.sock")
+
+
+def _serve(authkey, num_threads, max_batch, max_wait_ms):
+    # torch를 불러오기 전에 스레드 수를 고정해야 함
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    os.environ["MKL_NUM_THREADS"] = str(num_threads)
+    import torch
+    from transformers import pipeline
+    from src.models import SENTIMENT_MODEL, _map_sentiment
+
+    torch.set_num_threads(num_threads)
+    analyzer = pipeline("sentiment-analysis", model=SENTIMENT_MODEL)
+
+    requests = queue.Queue()  # (conn, send_lock, req_id, texts)
+
+    def batcher():
+        while True:
+            batch = [requests.get()]
+            size = len(batch[0][3])
+            window_end = time.monotonic() + max_wait_ms / 1000
+            # 첫 요청 이후 잠깐 기다리며 다른 세션의 요청을 함께 묶음
+            while size < max_batch:
+                timeout = window_end - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[3])
+
+            texts = [t for item in batch for t in item[3]]
+            try:
+                results = [_map_sentiment(r) for r in analyzer(texts, truncation=True, batch_size=len(texts))]
+                error = None
+            except Exception as e:
+                results, error = [], str(e)
+
+            offset = 0
+            for conn, send_lock, req_id, item_texts in batch:
+                payload = results[offset:offset + len(item_texts)]
+                offset += len(item_texts)
+                try:
+                    with send_lock:
+                        conn.send((req_id, payload, error))
+                except (OSError, EOFError):
+                    pass
+
+    def handle(conn):
+        send_lock = threading.Lock()
+        try:
+            while True:
+                req_id, texts = conn.recv()
+                requests.put((conn, send_lock, req_id, texts))
+        except (EOFError, OSError):
+            conn.close()
+
+    RUN_DIR.mkdir(parents=True, exist_ok=True)
+    address = _listener_address()
+    if sys.platform != "win32" and os.path.exists(address):
+        os.unlink(address)
+    listener = Listener(address, authkey=authkey)
+    _publish_address(address, authkey)
+    print(f"[INFO] Sentiment service listening on {address} (threads={num_threads}, "
+          f"max_batch={max_batch}, max_wait={max_wait_ms}ms)")
+
+    threading.Thread(target=batcher, daemon=True).start()
+    while True:
+        conn = listener.accept()
+        threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+# ------------------------------------------------------------------
+# 클라이언트 (앱/배치 프로세스 쪽)
+# ------------------------------------------------------------------
+class SentimentClient:
+    """연결 하나를 여러 스레드가 공유. 응답은 요청 ID로 짝지어 돌려줌"""
+
+    def __init__(self, address, authkey):
+        self._conn = Client(address, authkey=authkey)
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count()
+        self.closed = False
+        threading.Thread(target=self._read_loop, name="replymate-sentiment-client", daemon=True).start()
+
+    def _read_loop(self):
+        try:
+            while True:
+                req_id, results, error = self._conn.recv()
+                with self._pending_lock:
+                    future = self._pending.pop(req_id, None)
+                if future is None:
+                    continue
+                if error:
+                    future.set_exception(RuntimeError(error))
+                else:
+                    future.set_result(results)
+        except (EOFError, OSError) as e:
+            self.closed = True
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(ConnectionError(f"sentiment service disconnected: {e}"))
+
+    def close(self):
+        self.closed = True
+        self._conn.close()
+
+    def analyze(self, texts, timeout=REQUEST_TIMEOUT_SEC):
+        future = Future()
+        req_id = next(self._ids)
+        with self._pending_lock:
+            self._pending[req_id] = future
+        with self._send_lock:
+            self._conn.send((req_id, list(texts)))
+        return future.result(timeout=timeout)
+
+
+_client = None
+_process = None
+_client_lock = threading.Lock()
+
+
+def is_enabled():
+    return os.getenv("SENTIMENT_SERVICE", "0") == "1"
+
+
+def _connect(wait_sec=0.0, process=None):
+    """주소 파일로 연결. wait_sec 동안 다시 시도하되, 기다리던 추론 프로세스가 종료되면 바로 포기"""
+    deadline = time.monotonic() + wait_sec
+    while True:
+        try:
+            return SentimentClient(*_read_address())
+        except (OSError, EOFError, AuthenticationError):
+            if time.monotonic() >= deadline or (process is not None and not process.is_alive()):
+                return None
+            time.sleep(0.2)
+
+
+def get_client(start=True):
+    """
+    실행 중인 추론 프로세스에 연결 (없으면 시작). 실패하면 None.
+    프로세스 시작까지만 잠금 안에서 하고, 모델 로딩을 기다리는 동안에는 잠금을 풀어 두어
+    이미 연결된 클라이언트를 쓰려는 다른 스레드를 막지 않습니다.
+    """
+    global _client, _process
+    with _client_lock:
+        if _client is not None and not _client.closed:
+            return _client
+
+        _client = _connect()
+        if _client is not None or not start:
+            return _client
+
+        if _process is None or not _process.is_alive():
+            ADDRESS_FILE.unlink(missing_ok=True)
+            _process = get_context("spawn").Process(
+                target=_serve, args=(_new_authkey(), NUM_THREADS, MAX_BATCH, MAX_WAIT_MS),
+                name="replymate-sentiment", daemon=True
+            )
+            _process.start()
+        process = _process
+
+    # 모델 로딩 시간까지 기다림 (잠금 밖)
+    client = _connect(wait_sec=STARTUP_WAIT_SEC, process=process)
+    with _client_lock:
+        if _client is None or _client.closed:
+            _client = client
+        elif client is not None:
+            # 다른 스레드가 먼저 연결했으면 그 연결을 공유
+            client.close()
+        return _client
+
+
+def analyze(texts):
+    """추론 프로세스로 감정 분석. 사용할 수 없으면 None (호출 측에서 직접 추론)"""
+    client = get_client()
+    if client is None:
+        return None
+    try:
+        return client.analyze(texts)
+    except Exception as e:
+        print(f"[WARN] Sentiment service call failed, running in-process: {e}")
+        return None
+
+
+# ------------------------------------------------------------------
+# 벤치마크
+# ------------------------------------------------------------------
+def _bench(fn, texts, callers):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        list(pool.map(fn, texts))
+    elapsed = time.perf_counter() - started
+    return len(texts) / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KoBERT 추론 프로세스 처리량 비교")
+    parser.add_argument("--bench", type=int, default=50, help="동시 호출 스레드 수")
+    parser.add_argument("--requests", type=int, default=500, help="총 요청 수")
+    args = parser.parse_args(argv)
+
+    from src.models import analyze_review_sentiment, get_sentiment_analyzer
+    samples = ["맛있어요 또 시킬게요", "배달이 너무 늦었어요", "양이 적어요", "사장님 친절하세요 최고"]
+    texts = [samples[i % len(samples)] + f" {i}" for i in range(args.requests)]
+
+    get_sentiment_analyzer()
+    local = _bench(lambda t: analyze_review_sentiment(t, use_service=False), texts, args.bench)
+    print(f"[BENCH] in-process: {local:.1f} reviews/s ({args.bench} callers)")
+
+    if get_client() is None:
+        print("[ERROR] Sentiment service failed to start")
+        return 1
+    served = _bench(lambda t: analyze([t]), texts, args.bench)
+    print(f"[BENCH] service (max_batch={MAX_BATCH}, max_wait={MAX_WAIT_MS}ms, threads={NUM_THREADS}): "
+          f"{served:.1f} reviews/s ({served / local:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+import os
+import time
+from pathlib import Path
+import pandas as pd
+from src.archive import local_timestamp, partition_key, partitions_since
+from src import tenancy
+
+try:
+    # 분석용 컬럼형 스냅샷은 pyarrow가 있을 때만 사용 (없으면 JSON 경로로 동작)
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+    ipc = None
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+SNAPSHOT_DIR_NAME = "analytics"
+READY_FILE = "READY"
+BASE_PREFIX = "reviews-"
+DELTA_PREFIX = "delta-"
+
+# saved_reviews 아카이브와 같은 월 파티션 단위로 파일을 나눕니다.
+#   reviews-YYYY-MM.arrow          : 파티션 base
+#   delta-YYYY-MM-<ns>.arrow       : 저장 1건마다 추가되는 delta
+# 파티션별 delta 개수가 이 값을 넘으면 base로 병합(compaction)
+COMPACT_THRESHOLD = int(os.getenv("SNAPSHOT_COMPACT_THRESHOLD", "50"))
+# 읽는 도중 compaction이 delta를 지웠을 때 파티션을 다시 읽는 횟수
+READ_RETRIES = 3
+
+STRING_COLUMNS = ["id", "customer_name", "review_text", "reply_text", "tone"]
+CATEGORY_COLUMNS = ["menu_name", "sentiment", "category"]
+
+
+def _snapshot_dir():
+    return tenancy.data_dir() / SNAPSHOT_DIR_NAME
+
+
+def is_available():
+    return pa is not None
+
+
+def _schema():
+    fields = [(col, pa.string()) for col in STRING_COLUMNS]
+    fields += [(col, pa.dictionary(pa.int32(), pa.string())) for col in CATEGORY_COLUMNS]
+    fields.append(("timestamp", pa.timestamp("us")))
+    return pa.schema(fields)
+
+
+def _timestamp(review):
+    """timestamp 컬럼 값 (없으면 None, 읽을 수 없으면 경고 후 None - 저장은 계속 진행)"""
+    value = review.get("timestamp")
+    if not value:
+        return None
+    # tz가 붙은 값은 로컬 시간으로 (대시보드 기간 필터와 같은 시간대)
+    ts = local_timestamp(value)
+    if ts is None:
+        print(f"[WARN] Invalid timestamp for review {review.get('id')}: {value!r}")
+        return None
+    return ts.to_pydatetime()
+
+
+def _to_table(reviews):
+    """saved_reviews 레코드(dict 리스트) -> 타입이 고정된 Arrow 테이블"""
+    columns = {col: [] for col in STRING_COLUMNS + CATEGORY_COLUMNS + ["timestamp"]}
+    for r in reviews:
+        for col in STRING_COLUMNS:
+            value = r.get(col)
+            columns[col].append(str(value) if value is not None else None)
+        for col in CATEGORY_COLUMNS:
+            columns[col].append(r.get(col) or ("" if col == "menu_name" else "unknown"))
+
+        columns["timestamp"].append(_timestamp(r))
+
+    schema = _schema()
+    arrays = [pa.array(columns[field.name], type=field.type) for field in schema]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _write_atomic(path, table):
+    tmp_path = path.with_suffix(".tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def _read_mapped(path):
+    """Arrow IPC 파일을 memory-map으로 열어 복사 없이 테이블로 읽음"""
+    source = pa.memory_map(str(path), "r")
+    return ipc.open_file(source).read_all()
+
+
+def _base_path(key):
+    return _snapshot_dir() / f"{BASE_PREFIX}{key}.arrow"
+
+
+def _delta_files(key):
+    if not _snapshot_dir().exists():
+        return []
+    return sorted(_snapshot_dir().glob(f"{DELTA_PREFIX}{key}-*.arrow"))
+
+
+def exists():
+    return is_available() and (_snapshot_dir() / READY_FILE).exists()
+
+
+def rebuild_partition(key, reviews):
+    """파티션 하나를 원본 레코드로 다시 생성"""
+    _snapshot_dir().mkdir(parents=True, exist_ok=True)
+    if reviews:
+        _write_atomic(_base_path(key), _to_table(reviews))
+    else:
+        _base_path(key).unlink(missing_ok=True)
+    for path in _delta_files(key):
+        path.unlink(missing_ok=True)
+
+
+def rebuild_snapshot(reviews):
+    """원본 전체로 스냅샷을 새로 생성 (최초 마이그레이션/복구용)"""
+    if not is_available():
+        return False
+
+    clear_snapshot()
+    _snapshot_dir().mkdir(parents=True, exist_ok=True)
+    partitions = {}
+    for review in reviews:
+        partitions.setdefault(partition_key(review), []).append(review)
+    for key, records in partitions.items():
+        rebuild_partition(key, records)
+
+    (_snapshot_dir() / READY_FILE).touch()
+    print(f"[INFO] Rebuilt analytics snapshot ({len(reviews)} rows, {len(partitions)} partitions)")
+    return True
+
+
+def append_review(review):
+    """저장 시 호출: 1행짜리 delta 파일을 추가하고, 많이 쌓이면 해당 파티션만 compaction"""
+    if not exists():
+        return False
+
+    key = partition_key(review)
+    delta_path = _snapshot_dir() / f"{DELTA_PREFIX}{key}-{time.time_ns()}.arrow"
+    _write_atomic(delta_path, _to_table([review]))
+
+    if len(_delta_files(key)) >= COMPACT_THRESHOLD:
+        compact(key)
+    return True
+
+
+def _load_tables(key, delta_files):
+    # delta 목록을 먼저 만든 뒤 base를 읽어야, compaction이 지운 delta는 항상 새 base에 들어 있음
+    tables = []
+    if _base_path(key).exists():
+        tables.append(_read_mapped(_base_path(key)))
+    tables += [_read_mapped(path) for path in delta_files]
+    return tables
+
+
+def _dedupe(df):
+    # 같은 ID는 나중에 기록된 행(최신 수정본)만 유지
+    if df.empty:
+        return df
+    has_id = df["id"].notna()
+    latest = df[has_id].drop_duplicates(subset="id", keep="last")
+    return pd.concat([latest, df[~has_id]]).sort_index()
+
+
+def _load_partition(key):
+    """
+    파티션 base + delta 테이블 (잠금 없이 읽음).
+    delta 목록을 만든 뒤 다른 세션의 compaction이 그 delta를 지웠다면, 지워진 내용은 이미 새 base에
+    병합되어 있으므로 목록을 다시 만들어 처음부터 읽습니다.
+    """
+    for attempt in range(READ_RETRIES):
+        try:
+            return _load_tables(key, _delta_files(key))
+        except FileNotFoundError:
+            if attempt == READ_RETRIES - 1:
+                raise
+
+
+def compact(key):
+    """파티션의 base + delta들을 하나의 base 파일로 병합"""
+    delta_files = _delta_files(key)
+    if not delta_files:
+        return
+
+    table = pa.concat_tables(_load_tables(key, delta_files)).unify_dictionaries()
+    df = _dedupe(table.to_pandas())
+    merged = pa.Table.from_pandas(df, schema=table.schema, preserve_index=False)
+    _write_atomic(_base_path(key), merged)
+
+    # 새 base를 먼저 교체(게시)한 뒤 delta를 삭제 -> 잠금 없이 읽는 쪽은 지워진 delta를 만나면
+    # 목록을 다시 만들어 새 base를 읽음 (_load_partition 참고)
+    # 병합 도중 새로 생긴 delta는 남겨두고, 읽은 파일만 삭제
+    for path in delta_files:
+        path.unlink(missing_ok=True)
+    print(f"[INFO] Compacted analytics snapshot {key} ({len(delta_files)} deltas -> {len(df)} rows)")
+
+
+def load_snapshot(since=None):
+    """
+    스냅샷을 DataFrame으로 로드합니다.
+    timestamp는 datetime64, sentiment/category/menu_name은 category dtype입니다.
+    since가 주어지면 해당 시점 이후 데이터가 있는 파티션 파일만 엽니다.
+    스냅샷이 없으면 None을 반환합니다.
+    """
+    if not exists():
+        return None
+
+    tables = []
+    for key in partitions_since(since):
+        tables += _load_partition(key)
+
+    if not tables:
+        return _to_table([]).to_pandas()
+
+    df = _dedupe(pa.concat_tables(tables).unify_dictionaries().to_pandas()).reset_index(drop=True)
+    if since is not None:
+        df = df[df["timestamp"] >= since].reset_index(drop=True)
+    return df
+
+
+def clear_snapshot():
+    if not _snapshot_dir().exists():
+        return
+    for path in _snapshot_dir().glob("*.arrow"):
+        path.unlink(missing_ok=True)
+    (_snapshot_dir() / READY_FILE).unlink(missing_ok=True)
@@ -0,0 +1,163 @@
+"""
+가게(테넌트) 구분
+
+한 프로세스가 여러 가게를 서비스합니다. KoBERT 모델, LLM 게이트웨이, 작업/재구축 워커는 모든 가게가 공유하고,
+데이터 파일(data/), 벡터 DB(chroma_db/, vector_db/)와 가게별 인메모리 인덱스만 가게마다 따로 둡니다.
+
+- 기본 가게(default)는 기존 위치(data/, chroma_db/, vector_db/)를 그대로 씁니다.
+- 다른 가게는 stores/<store_id>/ 아래에 같은 구조로 저장됩니다.
+- 현재 가게는 contextvar로 전달됩니다. 스레드 풀에 일을 넘길 때는 submit()으로 넘겨야 가게가 유지됩니다.
+"""
+import contextvars
+import json
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+STORES_DIR = BASE_DIR / "stores"
+DEFAULT_STORE = "default"
+
+# 인메모리 인덱스를 유지할 최근 사용 가게 수 (넘으면 가장 오래 쓰지 않은 가게부터 내림)
+MAX_ACTIVE_STORES = int(os.getenv("MAX_ACTIVE_STORES", "8"))
+# 가게별 분당 LLM 호출 한도 (0이면 제한 없음, 프로세스 전체 한도는 게이트웨이가 따로 적용)
+STORE_RPM = int(os.getenv("STORE_RPM", "0"))
+
+STORE_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,39}$")
+
+_current = contextvars.ContextVar("replymate_store", default=DEFAULT_STORE)
+
+_recent = OrderedDict()  # store_id -> None (최근 사용 순)
+_recent_lock = threading.Lock()
+_evictors = []
+
+
+def current_store():
+    return _current.get()
+
+
+def validate_store_id(store_id):
+    if store_id != DEFAULT_STORE and not STORE_ID_PATTERN.match(store_id or ""):
+        raise ValueError(f"Invalid store id: {store_id!r} (영문 소문자/숫자/-/_ 40자 이내)")
+    return store_id
+
+
+def set_store(store_id):
+    """현재 실행 흐름(Streamlit 스크립트 실행 등)의 가게를 지정"""
+    _current.set(validate_store_id(store_id))
+    touch(store_id)
+
+
+@contextmanager
+def use_store(store_id):
+    token = _current.set(validate_store_id(store_id))
+    touch(store_id)
+    try:
+        yield store_id
+    finally:
+        _current.reset(token)
+
+
+def submit(pool, fn, *args, **kwargs):
+    """현재 가게(contextvar)를 유지한 채 스레드 풀에 작업 제출"""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+# ------------------------------------------------------------------
+# 경로
+# ------------------------------------------------------------------
+def path(name, store_id=None):
+    """가게별 저장 위치 (name: data / chroma_db / vector_db)"""
+    store_id = store_id or current_store()
+    if store_id == DEFAULT_STORE:
+        return BASE_DIR / name
+    return STORES_DIR / store_id / name
+
+
+def data_dir(store_id=None):
+    return path("data", store_id)
+
+
+def list_stores():
+    stores = [DEFAULT_STORE]
+    if STORES_DIR.exists():
+        stores += sorted(p.name for p in STORES_DIR.iterdir() if p.is_dir() and STORE_ID_PATTERN.match(p.name))
+    return stores
+
+
+def create_store(store_id, store_name=None):
+    """새 가게 폴더 생성 (기본 가게의 기본 템플릿을 복사, 메뉴는 비어 있음)"""
+    validate_store_id(store_id)
+    target = data_dir(store_id)
+    if target.exists():
+        return False
+    target.mkdir(parents=True)
+
+    base_templates = BASE_DIR / "data" / "templates.json"
+    templates = []
+    if base_templates.exists():
+        with open(base_templates, 'r', encoding='utf-8') as f:
+            templates = [t for t in json.load(f) if t.get("metadata", {}).get("tone") != "owner_custom"]
+    for filename, content in (("templates.json", templates), ("menu_info.json", []),
+                              ("store_info.json", {"store_name": store_name or store_id})):
+        with open(target / filename, 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False, indent=4)
+    print(f"[INFO] Created store '{store_id}' at {target.parent}")
+    return True
+
+
+def delete_store(store_id):
+    if store_id == DEFAULT_STORE:
+        raise ValueError("기본 가게는 삭제할 수 없습니다.")
+    evict(store_id)
+    shutil.rmtree(STORES_DIR / validate_store_id(store_id), ignore_errors=True)
+
+
+def store_for_api_key(api_key):
+    """STORE_API_KEYS="키1:가게1,키2:가게2" 설정으로 API 키에 해당하는 가게. 없으면 None"""
+    for pair in os.getenv("STORE_API_KEYS", "").split(","):
+        key, _, store_id = pair.strip().partition(":")
+        if key and store_id and key == api_key:
+            return validate_store_id(store_id.strip())
+    return None
+
+
+# ------------------------------------------------------------------
+# 유휴 가게 인메모리 인덱스 내리기 (LRU)
+# ------------------------------------------------------------------
+def register_evictor(fn):
+    """가게를 내릴 때 호출할 정리 함수 fn(store_id) 등록 (각 모듈의 가게별 캐시)"""
+    _evictors.append(fn)
+    return fn
+
+
+def evict(store_id):
+    for fn in list(_evictors):
+        try:
+            fn(store_id)
+        except Exception as e:
+            print(f"[WARN] Evicting store '{store_id}' failed in {getattr(fn, '__qualname__', fn)}: {e}")
+    with _recent_lock:
+        _recent.pop(store_id, None)
+
+
+def touch(store_id):
+    with _recent_lock:
+        _recent[store_id] = None
+        _recent.move_to_end(store_id)
+        idle = []
+        while len(_recent) > MAX_ACTIVE_STORES:
+            oldest, _ = _recent.popitem(last=False)
+            idle.append(oldest)
+    for oldest in idle:
+        print(f"[INFO] Evicting idle store '{oldest}' from memory")
+        evict(oldest)
+
+
+def active_stores():
+    with _recent_lock:
+        return list(_recent)
@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
-from src.workflow import build_graph
-from src.data_manager import save_completed_review, save_drafts
+from src.workflow import build_graph, run_review, apply_result
+from src.data_manager import save_completed_review, update_draft
 
 
 def get_status_badge_html(status):
@@ -24,7 +24,25 @@ def update_and_save(review_id, field, new_value):
         if r['id'] == review_id:
             r[field] = new_value
             break
-    save_drafts(st.session_state.active_reviews)
+    # 바뀐 카드의 필드만 저장 (세션 목록 전체로 덮어쓰면 워커가 방금 쓴 다른 카드 결과가 사라짐)
+    update_draft(review_id, {field: new_value})
+
+
+def save_card(review):
+    """카드 1건의 현재 내용을 작성 중 목록에 저장"""
+    update_draft(review["id"], dict(review))
+
+
+def render_pin_button(review, key_prefix):
+    """대기 중인 리뷰를 일괄 생성 때 가장 먼저 처리하도록 고정/해제"""
+    if review["status"] != "draft":
+        return
+    pinned = review.get("pinned", False)
+    if st.button("", icon=":material/push_pin:", key=f"{key_prefix}_{review['id']}",
+                 type="primary" if pinned else "tertiary",
+                 help="고정 해제" if pinned else "일괄 생성 때 먼저 처리"):
+        update_and_save(review["id"], "pinned", not pinned)
+        st.rerun()
 
 
 # ------------------------------------------------------------------------------
@@ -92,32 +110,46 @@ def _render_reply_area(review, selected_tone, store_name):
                      key=f"btn_create_{review['id']}"):
             if review["text"]:
                 with st.spinner("생성 중..."):
-                    save_drafts(st.session_state.active_reviews)
-
-                    app = build_graph()
-                    result = app.invoke({
-                        "review_text": review["text"],
-                        "customer_name": review.get("customer_name", ""),
-                        "manual_menu": review.get("menu_name", ""),
-                        "store_name": store_name,
-                        "tone": selected_tone,
-                        "user_feedback": None
-                    })
-                    review["reply"] = result["final_reply"]
-                    review["sentiment"] = result["sentiment"]
-                    review["status"] = "generated"
+                    app = build_graph(speculative=st.session_state.get("speculative", False))
+                    result = run_review(app, review, store_name, selected_tone,
+                                        reuse_mode=st.session_state.get("reuse_mode", "off"))
+                    apply_result(review, result)
 
-                    extracted = result.get("extracted_menu")
-                    if not review["menu_name"] and extracted and extracted != "null":
-                        review["menu_name"] = extracted
-                        update_and_save(review['id'], "menu_name", extracted)
-
-                    save_drafts(st.session_state.active_reviews)
+                    save_card(review)
                     st.rerun()
             else:
                 st.warning("리뷰 내용을 입력해주세요.")
 
     else:
+        reuse_pending = review.get("reuse_pending", False)
+        if reuse_pending:
+            st.warning(f"비슷한 리뷰에 저장했던 답글을 가져왔습니다. (유사도 {review.get('reuse_score') or 0:.0%})",
+                       icon=":material/content_copy:")
+            r1, r2 = st.columns([1, 1])
+            with r1:
+                if st.button("이대로 사용", icon=":material/done:", use_container_width=True,
+                             key=f"btn_reuse_ok_{review['id']}"):
+                    update_and_save(review['id'], "reuse_pending", False)
+                    st.rerun()
+            with r2:
+                if st.button("AI로 새로 쓰기", icon=":material/bolt:", use_container_width=True,
+                             key=f"btn_reuse_new_{review['id']}"):
+                    with st.spinner("생성 중..."):
+                        app = build_graph(speculative=st.session_state.get("speculative", False))
+                        result = run_review(app, review, store_name, selected_tone)
+                        apply_result(review, result)
+
+                        widget_key = f"modal_reply_text_{review['id']}"
+                        if widget_key in st.session_state:
+                            del st.session_state[widget_key]
+
+                        save_card(review)
+                        st.rerun()
+
+        if review.get("reply_source") == "fallback":
+            st.info("AI 응답이 늦어 기본 템플릿으로 답글을 채웠습니다. '다시 쓰기'로 AI 답글을 새로 만들 수 있습니다.",
+                    icon=":material/schedule:")
+
         reply_text = st.text_area(
             "답글 에디터",
             value=review["reply"],
@@ -136,28 +168,23 @@ def _render_reply_area(review, selected_tone, store_name):
         with c1:
             if st.button("다시 쓰기", icon=":material/refresh:", use_container_width=True, key=f"btn_retry_{review['id']}"):
                 with st.spinner("수정 중..."):
-                    save_drafts(st.session_state.active_reviews)
-                    app = build_graph()
-                    result = app.invoke({
-                        "review_text": review["text"],
-                        "customer_name": review.get("customer_name", ""),
-                        "manual_menu": review.get("menu_name", ""),
-                        "store_name": store_name,
-                        "tone": selected_tone,
-                        "user_feedback": "다른 표현으로 다시 써줘"
-                    })
+                    app = build_graph(speculative=st.session_state.get("speculative", False))
+                    result = run_review(app, review, store_name, selected_tone,
+                                        user_feedback="다른 표현으로 다시 써줘")
                     review["reply"] = result["final_reply"]
+                    review["reply_source"] = result.get("reply_source", "llm")
+                    review["reuse_pending"] = False
 
                     widget_key = f"modal_reply_text_{review['id']}"
                     if widget_key in st.session_state:
                         del st.session_state[widget_key]
 
-                    save_drafts(st.session_state.active_reviews)
+                    save_card(review)
                     st.rerun()
 
         with c2:
             if st.button("저장 완료", icon=":material/check:", type="primary", use_container_width=True,
-                         key=f"btn_finish_{review['id']}"):
+                         key=f"btn_finish_{review['id']}", disabled=reuse_pending):
                 save_data = {
                     "id": review["id"],
                     "customer_name": review.get("customer_name", ""),
@@ -166,11 +193,12 @@ def _render_reply_area(review, selected_tone, store_name):
                     "reply_text": review["reply"],
                     "tone": selected_tone,
                     "sentiment": review.get("sentiment", "unknown"),
+                    "category": review.get("category") or "unknown",
                     "timestamp": str(pd.Timestamp.now())
                 }
                 save_completed_review(save_data)
                 review["status"] = "saved"
-                save_drafts(st.session_state.active_reviews)
+                update_draft(review["id"], {"status": "saved"})
 
                 del st.session_state['edit_target_id']
                 st.toast("저장되었습니다.")
@@ -225,6 +253,7 @@ def render_list_view(reviews, selected_tone, store_name, ids_to_remove):
             with c1:
                 badge_html = get_status_badge_html(review["status"])
                 st.markdown(badge_html, unsafe_allow_html=True)
+                render_pin_button(review, "pin_l")
 
             with c2:
                 name = review.get("customer_name", "").strip()
@@ -276,6 +305,7 @@ def render_grid_view(reviews, selected_tone, store_name, ids_to_remove):
                     with c_badge:
                         badge_html = get_status_badge_html(review["status"])
                         st.markdown(badge_html, unsafe_allow_html=True)
+                        render_pin_button(review, "pin_g")
 
                     with c_del:
                         if st.button("", icon=":material/delete:", key=f"del_g_{review['id']}", help="삭제"):
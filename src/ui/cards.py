@@ -1,9 +1,93 @@
 import streamlit as st
 import uuid
 import pandas as pd
-from src.data_manager import save_drafts, load_drafts, load_json_data
+from src.data_manager import add_draft, delete_drafts, load_drafts, load_recent_saved_reviews
 from src.ui.card_views import render_list_view, render_grid_view, open_reply_modal
-from src.workflow import build_graph
+from src.jobs import get_job_queue
+from src.ingest import import_reviews
+from src import scheduler
+
+# 리뷰 목록에 처음 불러올 완료 기록 기간 (월 파티션 수)
+HISTORY_MONTHS_STEP = 3
+
+
+def _load_saved_history(months):
+    """최근 months개월 완료 기록을 카드 형식으로 변환 (최신순)"""
+    saved_history, has_more = load_recent_saved_reviews(months)
+    converted_history = []
+    for item in saved_history:
+        converted_history.append({
+            "id": item.get("id", str(uuid.uuid4())),
+            "customer_name": item.get("customer_name", ""),
+            "menu_name": item.get("menu_name", ""),
+            "text": item.get("review_text", ""),
+            "reply": item.get("reply_text", ""),
+            "sentiment": item.get("sentiment"),
+            "category": item.get("category"),
+            "status": "saved"
+        })
+    return converted_history[::-1], has_more
+
+
+@st.fragment(run_every=2)
+def _render_batch_progress():
+    """백그라운드 작업 진행률 (2초마다 이 영역만 다시 그림, 화면을 막지 않음)"""
+    job_queue = get_job_queue()
+    finished_any = False
+
+    for job_id in list(st.session_state.batch_job_ids):
+        job = job_queue.get(job_id)
+        if job is None:
+            st.session_state.batch_job_ids.remove(job_id)
+            continue
+
+        # 완료된 결과를 현재 세션 목록에 반영 (파일에는 워커가 이미 저장함)
+        for target in st.session_state.active_reviews:
+            fields = job["results"].get(target["id"])
+            if fields and target.get("status") == "draft":
+                target.update(fields)
+
+        done = job["counts"]["done"] + job["counts"]["failed"] + job["counts"]["skipped"]
+        st.progress(done / job["total"] if job["total"] else 1.0,
+                    text=f"[{done}/{job['total']}] AI가 백그라운드에서 답글을 작성 중입니다... (탭을 닫아도 계속 진행됩니다)")
+
+        if job["status"] == "done":
+            st.session_state.batch_job_ids.remove(job_id)
+            finished_any = True
+            if job["stopped"]:
+                st.toast(f"{'시간' if job['stopped'] == 'time' else 'AI 호출'} 예산을 모두 사용해 "
+                         f"{job['counts']['skipped']}건은 대기 상태로 남겼습니다.", icon=":material/timer_off:")
+            elif job["errors"]:
+                st.toast(f"{len(job['errors'])}건은 생성에 실패했습니다. 다시 시도해주세요.", icon=":material/error:")
+            else:
+                st.toast("모든 답글 생성이 완료되었습니다! 내용을 확인하고 저장해주세요.", icon=":material/check:")
+
+    if finished_any:
+        st.rerun()
+
+
+def _render_import():
+    """배달 플랫폼에서 내보낸 리뷰 파일을 작성 중 목록으로 가져오기"""
+    with st.expander("리뷰 파일 가져오기", expanded=False, icon=":material/upload_file:"):
+        uploaded = st.file_uploader(
+            "리뷰 파일 (CSV / JSON / JSONL / XLSX)",
+            type=["csv", "json", "jsonl", "xlsx"],
+            help="닉네임, 주문메뉴, 리뷰내용 등 플랫폼별 컬럼명을 자동으로 맞추고, 이미 있는 리뷰는 건너뜁니다.",
+            key="import_file"
+        )
+        if uploaded and st.button("가져오기", icon=":material/download:", key="import_btn"):
+            progress = st.empty()
+            try:
+                stats = import_reviews(uploaded, filename=uploaded.name,
+                                       on_progress=lambda n: progress.caption(f"{n:,}행 읽는 중..."))
+            except (ValueError, RuntimeError) as e:
+                st.error(f"가져오기 실패: {e}")
+                return
+            # 작성 중 목록을 파일에서 다시 불러옴
+            del st.session_state["active_reviews"]
+            st.toast(f"{stats['imported']:,}건을 추가했습니다. (중복 {stats['duplicates']:,}건 제외)",
+                     icon=":material/upload_file:")
+            st.rerun()
 
 
 def render_review_cards_tab(selected_tone, store_name):
@@ -16,20 +100,9 @@ def render_review_cards_tab(selected_tone, store_name):
                 if "customer_name" not in d: d["customer_name"] = ""
                 if "menu_name" not in d: d["menu_name"] = ""
         active_drafts = [d for d in drafts if d.get("status") != "saved"] if drafts else []
-        saved_history = load_json_data("saved_reviews.json")
-        converted_history = []
-        if saved_history:
-            for item in saved_history:
-                converted_history.append({
-                    "id": item.get("id", str(uuid.uuid4())),
-                    "customer_name": item.get("customer_name", ""),
-                    "menu_name": item.get("menu_name", ""),
-                    "text": item.get("review_text", ""),
-                    "reply": item.get("reply_text", ""),
-                    "sentiment": item.get("sentiment"),
-                    "status": "saved"
-                })
-        st.session_state.active_reviews = active_drafts + converted_history[::-1]
+        st.session_state.history_months = HISTORY_MONTHS_STEP
+        history, st.session_state.history_has_more = _load_saved_history(st.session_state.history_months)
+        st.session_state.active_reviews = active_drafts + history
 
     # [다른 탭 간섭 방지]
     other_tab_keys = ["dashboard_filter", "dash_sent", "dash_period", "menu_editor", "simple_training_form"]
@@ -78,10 +151,12 @@ def render_review_cards_tab(selected_tone, store_name):
                 "menu_name": "",
                 "text": "",
                 "reply": None,
-                "status": "draft"
+                "status": "draft",
+                # 일괄 생성 우선순위의 대기 시간 계산용
+                "created_at": str(pd.Timestamp.now())
             }
             st.session_state.active_reviews.insert(0, new_review)
-            save_drafts(st.session_state.active_reviews)
+            add_draft(new_review)
 
             st.session_state["edit_target_id"] = new_review["id"]
             # 추가 버튼은 보통 PC/모바일 공통이므로 기본값 desktop 사용하되,
@@ -89,70 +164,55 @@ def render_review_cards_tab(selected_tone, store_name):
             st.session_state['target_view_mode'] = 'desktop' if view_mode == "리스트" else "mobile"
             st.rerun()
 
+    _render_import()
+
     # --------------------------------------------------------------------------
     # ⚡ [NEW] 일괄 생성 기능 (Batch Generation) - 필터 UI 위쪽 배치
     # --------------------------------------------------------------------------
+    job_queue = get_job_queue()
+
+    # 재접속으로 세션이 새로 만들어졌다면 이 가게의 진행 중인 작업에 다시 연결
+    if "batch_job_ids" not in st.session_state:
+        st.session_state.batch_job_ids = job_queue.active_jobs(store_name)
+
+    in_flight_ids = set()
+    for job_id in st.session_state.batch_job_ids:
+        job = job_queue.get(job_id)
+        if job:
+            in_flight_ids.update(job["pending_ids"])
+
     reviews = st.session_state.active_reviews
-    pending_reviews = [r for r in reviews if r.get("status") == "draft"]
+    pending_reviews = [r for r in reviews if r.get("status") == "draft" and r["id"] not in in_flight_ids]
     pending_count = len(pending_reviews)
 
+    if st.session_state.batch_job_ids:
+        _render_batch_progress()
+
     if pending_count > 0:
         st.markdown("<div style='margin-bottom: 5px;'></div>", unsafe_allow_html=True)
-        col_batch, col_dummy = st.columns([2, 3])
+        col_batch, col_budget, col_dummy = st.columns([2, 0.6, 2.4], vertical_alignment="center")
+        with col_budget:
+            # 예산을 다 쓰면 멈춤 (부정/낮은 별점/오래된/고정 리뷰부터 처리하므로 급한 리뷰가 먼저 끝남)
+            with st.popover("", icon=":material/timer:", help="실행 예산"):
+                defaults = scheduler.default_budget()
+                budget_min = st.number_input("시간 예산 (분, 0: 제한 없음)", min_value=0, step=5,
+                                             value=int((defaults["seconds"] or 0) // 60), key="batch_budget_min")
+                budget_calls = st.number_input("AI 호출 예산 (회, 0: 제한 없음)", min_value=0, step=10,
+                                               value=defaults["llm_calls"] or 0, key="batch_budget_calls")
         with col_batch:
             btn_label = f"대기 중인 {pending_count}건 일괄 생성하기"
             if st.button(btn_label, type="primary", use_container_width=True, icon=":material/auto_awesome:",
                          key="batch_gen_btn"):
-
-                # 진행률 바 생성
-                progress_text = "AI가 답글을 작성 중입니다... (잠시만 기다려주세요)"
-                my_bar = st.progress(0, text=progress_text)
-
-                # LangGraph 앱 빌드 (한 번만 빌드해서 재사용)
-                app = build_graph()
-
-                # 반복문으로 순차 처리
-                for i, review in enumerate(pending_reviews):
-                    try:
-                        # 1. 워크플로우 실행
-                        result = app.invoke({
-                            "review_text": review["text"],
-                            "customer_name": review.get("customer_name", ""),
-                            "manual_menu": review.get("menu_name", ""),
-                            "store_name": store_name,
-                            "tone": selected_tone,
-                            "user_feedback": None
-                        })
-
-                        # 2. 결과 반영 (원본 리스트 업데이트)
-                        # ID로 원본 리스트의 해당 항목 찾아서 업데이트
-                        for target in st.session_state.active_reviews:
-                            if target['id'] == review['id']:
-                                target["reply"] = result["final_reply"]
-                                target["sentiment"] = result["sentiment"]
-                                target["status"] = "generated"  # 상태 변경
-
-                                # 메뉴명이 자동 추출되었다면 업데이트
-                                extracted = result.get("extracted_menu")
-                                if not target["menu_name"] and extracted and extracted != "null":
-                                    target["menu_name"] = extracted
-                                break
-
-                        # 3. 중간 저장 (안전장치)
-                        save_drafts(st.session_state.active_reviews)
-
-                        # 4. 진행률 업데이트
-                        percent_complete = int(((i + 1) / pending_count) * 100)
-                        customer_display = review.get('customer_name') or '고객'
-                        my_bar.progress(percent_complete,
-                                        text=f"[{i + 1}/{pending_count}] {customer_display}님 답글 완료! ✨")
-
-                    except Exception as e:
-                        st.error(f"오류 발생 ({review.get('customer_name', '알 수 없음')}): {e}")
-
-                my_bar.empty()  # 완료 후 진행바 제거
-                st.success("모든 답글 생성이 완료되었습니다! 내용을 확인하고 저장해주세요.")
-                st.rerun()  # 화면 갱신
+                # 작업 큐에 넘기고 바로 반환 (처리는 백그라운드 워커가 담당)
+                # 카드 편집 내용은 편집할 때마다 카드 단위로 저장되어 있으므로 목록 전체를 다시 쓰지 않음
+                job_id = job_queue.submit(pending_reviews, store_name, selected_tone,
+                                          reuse_mode=st.session_state.get("reuse_mode", "off"),
+                                          budget={"seconds": budget_min * 60 or None,
+                                                  "llm_calls": budget_calls or None})
+                st.session_state.batch_job_ids.append(job_id)
+                st.toast(f"{pending_count}건 생성 작업을 시작했습니다. 탭을 닫아도 계속 진행됩니다.",
+                         icon=":material/auto_awesome:")
+                st.rerun()
 
     # 3. 필터 UI (기존 동일)
     with st.expander("필터 및 검색 옵션", expanded=False, icon=":material/filter_list:"):
@@ -201,10 +261,22 @@ def render_review_cards_tab(selected_tone, store_name):
         else:
             render_grid_view(filtered_reviews, selected_tone, store_name, ids_to_remove)
 
+    # 오래된 완료 기록은 필요할 때만 추가로 불러옴 (이전 월 파티션)
+    if st.session_state.get("history_has_more"):
+        if st.button("이전 완료 기록 더 보기", icon=":material/history:", key="load_more_history"):
+            st.session_state.history_months += HISTORY_MONTHS_STEP
+            history, st.session_state.history_has_more = _load_saved_history(st.session_state.history_months)
+            history_ids = {h["id"] for h in history}
+            st.session_state.active_reviews = [
+                r for r in st.session_state.active_reviews
+                if r["status"] != "saved" or r["id"] not in history_ids
+            ] + history
+            st.rerun()
+
     if ids_to_remove:
         st.session_state.active_reviews = [
             r for r in st.session_state.active_reviews
             if r['id'] not in ids_to_remove
         ]
-        save_drafts(st.session_state.active_reviews)
+        delete_drafts(ids_to_remove)
         st.rerun()
\ No newline at end of file
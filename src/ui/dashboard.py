@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
 from wordcloud import WordCloud
-from src.data_manager import generate_analytics_data, get_korean_font_path
+from src.data_manager import (
+    generate_analytics_data, get_korean_font_path, period_start, query_daily_series, summarize_frame,
+    count_saved_reviews
+)
+
+SENTIMENT_FILTER_MAP = {"전체": None, "긍정": "positive", "부정": "negative"}
 
 
 def render_dashboard_tab():
@@ -45,9 +50,7 @@ def render_dashboard_tab():
         </style>
     """, unsafe_allow_html=True)
 
-    df, _ = generate_analytics_data()
-
-    if not df.empty:
+    if count_saved_reviews() > 0:
         with st.container(border=True):
             f_col1, f_col2 = st.columns(2)
 
@@ -63,54 +66,64 @@ def render_dashboard_tab():
             with f_col2:
                 filter_period = st.radio(
                     "기간 설정",
-                    ["1일", "7일", "1개월", "전체"],
+                    ["오늘", "7일", "1개월", "전체"],
                     horizontal=True,
                     label_visibility="collapsed",
                     key="dash_period",
                     index=3
                 )
 
-        # 데이터 필터링 로직 (기존 유지)
-        filtered_df = df.copy()
+            if filter_period != "전체":
+                st.caption("기간은 오늘을 포함한 날짜 단위(0시 기준)로 집계합니다.")
 
-        if 'timestamp' in filtered_df.columns:
-            filtered_df['timestamp'] = pd.to_datetime(filtered_df['timestamp'])
-            now = pd.Timestamp.now()
+        # 데이터 로드: 선택한 기간에 해당하는 월 파티션만 읽음 (기간은 날짜 단위 경계)
+        # 시작 시각은 한 번만 계산해 목록/지표/추이 차트가 같은 경계를 쓰도록 함
+        # 워드클라우드는 필터 적용 후 아래에서 따로 생성하므로 여기서는 데이터만 로드
+        start_date = period_start(filter_period)
+        df, _ = generate_analytics_data(build_wordcloud=False, since=start_date)
 
-            if filter_period == "1일":
-                start_date = now - pd.Timedelta(days=1)
-                filtered_df = filtered_df[filtered_df['timestamp'] >= start_date]
-            elif filter_period == "7일":
-                start_date = now - pd.Timedelta(days=7)
-                filtered_df = filtered_df[filtered_df['timestamp'] >= start_date]
-            elif filter_period == "1개월":
-                start_date = now - pd.Timedelta(days=30)
-                filtered_df = filtered_df[filtered_df['timestamp'] >= start_date]
+        # timestamp는 이미 datetime64, sentiment는 category 타입 -> 컬럼 단위 벡터 비교
+        target_sentiment = SENTIMENT_FILTER_MAP[filter_sentiment]
+        mask = pd.Series(True, index=df.index)
 
-        if 'sentiment' not in filtered_df.columns:
-            filtered_df['sentiment'] = 'unknown'
+        if target_sentiment and not df.empty:
+            mask &= df['sentiment'] == target_sentiment
 
-        if filter_sentiment == "긍정":
-            filtered_df = filtered_df[filtered_df['sentiment'] == 'positive']
-        elif filter_sentiment == "부정":
-            filtered_df = filtered_df[filtered_df['sentiment'] == 'negative']
+        filtered_df = df[mask]
 
         st.divider()
 
-        if filtered_df.empty:
+        # 상단 지표는 아래 목록/워드클라우드와 같은 DataFrame에서 계산 (두 화면이 서로 다른 값을 보이지 않도록)
+        metrics = summarize_frame(filtered_df)
+
+        if metrics["count"] == 0:
             st.warning("선택하신 기간/조건에 해당하는 데이터가 없습니다.")
             return
 
         c1, c2, c3 = st.columns(3)
-        c1.metric("리뷰 수", f"{len(filtered_df)}건")
+        c1.metric("리뷰 수", f"{metrics['count']}건")
 
-        pos_ratio = (len(filtered_df[filtered_df['sentiment'] == 'positive']) / len(filtered_df) * 100) if len(
-            filtered_df) > 0 else 0
+        pos_ratio = metrics["positive"] / metrics["count"] * 100
         c2.metric("기간 내 긍정 비율", f"{pos_ratio:.1f}%")
 
-        latest_date = filtered_df['timestamp'].max().strftime('%m-%d %H:%M') if not filtered_df.empty else "-"
+        latest_date = metrics["latest"].strftime('%m-%d %H:%M') if metrics["latest"] is not None else "-"
         c3.metric("최근 활동", latest_date)
 
+        # [NEW] 일별 리뷰 수 / 부정 비율 추이 (집계 테이블 기반)
+        st.markdown("**:material/timeline: 일별 추이**")
+        with st.container(border=True):
+            daily = query_daily_series(start_date, target_sentiment)
+            if daily.empty:
+                st.info("추이 데이터 부족")
+            else:
+                t_col1, t_col2 = st.columns(2)
+                with t_col1:
+                    st.caption("일별 리뷰 수")
+                    st.bar_chart(daily["리뷰 수"], height=220)
+                with t_col2:
+                    st.caption("일별 부정 비율(%)")
+                    st.line_chart(daily["부정 비율(%)"], height=220, color="#FF4B4B")
+
         st.markdown("---")
 
         col_wc, col_table = st.columns([1, 1])
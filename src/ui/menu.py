@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 import io
 from src.data_manager import load_json_data, save_json_data
-from src.rag import ReplyMateRAG
+from src.indexer import get_indexer
 
 
 def render_menu_tab():
@@ -106,10 +106,17 @@ def render_menu_tab():
                         updated_data = edited_df.to_dict(orient="records")
                         save_json_data("menu_info.json", updated_data)
 
-                        # RAG 업데이트
-                        rag = ReplyMateRAG()
-                        rag.init_db()
-                    st.success("메뉴 정보가 저장되었습니다!")
+                        # RAG 업데이트 (새로 바뀐 문서만 임베딩, 진행률 표시)
+                        progress = st.progress(0.0, text="임베딩 준비 중...")
+                        outcome = get_indexer().request_and_wait(
+                            "menu_info.json saved",
+                            on_progress=lambda done, total: progress.progress(
+                                done / total, text=f"임베딩 중... ({done}/{total})"))
+                        progress.empty()
+                    if outcome["complete"]:
+                        st.success("메뉴 정보가 저장되었습니다!")
+                    else:
+                        st.warning("메뉴 정보는 저장했지만 AI 학습이 일부 실패했습니다. 다시 저장하면 이어서 학습합니다.")
                 else:
                     st.warning("저장할 데이터가 없습니다.")
 
@@ -3,15 +3,76 @@ import time
 from src.ui.styles import apply_custom_style
 from src.data_manager import reset_app_data, save_store_name, load_store_name
 from src.rag import ReplyMateRAG
+from src.indexer import get_indexer
+from src import metrics, tenancy
+from src.reuse import REUSE_MODES, hit_rate
+from src.workflow import misspeculation_rate
+from src.fallback import fallback_rate
+from src.lexical import lexical_only_rate
+from src.scheduler import negative_time_to_reply
+
+
+def _select_store():
+    """
+    이번 실행에서 사용할 가게를 정하고 현재 가게로 지정.
+    URL에 ?api_key=... 가 있으면 STORE_API_KEYS에 등록된 가게로 고정됩니다.
+    """
+    api_key = st.query_params.get("api_key")
+    locked = tenancy.store_for_api_key(api_key) if api_key else None
+    if api_key and locked is None:
+        st.error("등록되지 않은 API 키입니다.")
+        st.stop()
+
+    if "store_id" not in st.session_state:
+        st.session_state.store_id = locked or tenancy.DEFAULT_STORE
+    if locked:
+        st.session_state.store_id = locked
+    tenancy.set_store(st.session_state.store_id)
+    return locked is not None
+
+
+def _switch_store(store_id):
+    """가게를 바꾸면 이전 가게의 화면 상태(리뷰 목록, 가게 이름 등)는 모두 비움"""
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    st.session_state.store_id = store_id
+    st.rerun()
 
 
 def render_sidebar():
     apply_custom_style()
+    locked = _select_store()
 
     with st.sidebar:
         st.header("AI ReplyMate")
         st.markdown("---")
 
+        # ---------------------------------------------------------
+        # 가게 선택 (가게마다 데이터와 지식 베이스가 따로 저장됨)
+        # ---------------------------------------------------------
+        if locked:
+            st.caption(f"가게 ID: {st.session_state.store_id}")
+        else:
+            stores = tenancy.list_stores()
+            if st.session_state.store_id not in stores:
+                stores.append(st.session_state.store_id)
+            selected_store = st.selectbox("가게 선택", stores, index=stores.index(st.session_state.store_id))
+            if selected_store != st.session_state.store_id:
+                _switch_store(selected_store)
+
+            with st.popover("새 가게 추가", icon=":material/add_business:"):
+                new_store_id = st.text_input("가게 ID", placeholder="예: tteokbokki-gangnam",
+                                             help="영문 소문자, 숫자, -, _ 만 사용할 수 있습니다.")
+                new_store_name = st.text_input("가게 이름", key="new_store_name")
+                if st.button("추가", width='stretch'):
+                    try:
+                        if tenancy.create_store(new_store_id.strip(), new_store_name.strip() or None):
+                            _switch_store(new_store_id.strip())
+                        else:
+                            st.warning("이미 있는 가게 ID입니다.")
+                    except ValueError as e:
+                        st.error(str(e))
+
         # ---------------------------------------------------------
         # [NEW] 가게 이름 설정 (전역 설정)
         # ---------------------------------------------------------
@@ -43,17 +104,58 @@ def render_sidebar():
         )
         st.info(f"현재 모드: **{tone}**")
 
+        # 비슷한 리뷰에 예전에 승인한 답글이 있으면 LLM 호출 없이 재사용
+        reuse_label = st.selectbox(
+            "유사 리뷰 답글 재사용",
+            list(REUSE_MODES.keys()),
+            index=0,
+            help="예전에 저장한 답글과 거의 같은 리뷰라면 고객명/메뉴명만 바꿔 다시 사용합니다. "
+                 "처음 켜면 저장된 답글 전체를 한 번 색인합니다."
+        )
+        st.session_state.reuse_mode = REUSE_MODES[reuse_label]
+        rate = hit_rate()
+        if rate is not None:
+            st.caption(f"재사용 적중률: {rate * 100:.0f}%")
+
+        # LLM 분석을 기다리지 않고 KoBERT 감정으로 답글을 미리 생성 (분석과 다르면 다시 생성)
+        st.session_state.speculative = st.toggle(
+            "빠른 생성 (추측 생성)",
+            value=st.session_state.get("speculative", False),
+            help="대부분의 리뷰에서 응답이 빨라지지만, 감정 판단이 바뀌면 답글을 한 번 더 생성합니다."
+        )
+        miss_rate = misspeculation_rate()
+        if st.session_state.speculative and miss_rate is not None:
+            st.caption(f"추측 실패율: {miss_rate * 100:.0f}%")
+
+        fb_rate = fallback_rate()
+        if fb_rate:
+            st.caption(f"시간 초과로 템플릿 답글 대체: {fb_rate * 100:.0f}%")
+
+        lex_rate = lexical_only_rate()
+        if lex_rate is not None:
+            st.caption(f"임베딩 없이 처리한 검색: {lex_rate * 100:.0f}%")
+
+        negative_wait = negative_time_to_reply()
+        if negative_wait is not None:
+            wait = f"{negative_wait / 3600:.1f}시간" if negative_wait >= 3600 else f"{negative_wait / 60:.0f}분"
+            st.caption(f"부정 리뷰 답글까지 평균 {wait} (리뷰 등록 시점부터, 일괄 생성)")
+
         st.markdown("<br>" * 3, unsafe_allow_html=True)
 
         with st.expander("🔧 개발자 도구", expanded=False):
+            # LLM 게이트웨이 대기열/스로틀링 등 프로세스 공용 계측값
+            st.caption("실행 지표")
+            st.json(metrics.snapshot(), expanded=False)
+            st.caption(f"지식 베이스 버전: {ReplyMateRAG().active_version() or '-'}")
+
             st.caption("모든 데이터 초기화")
             if st.button("시스템 전체 초기화", icon=":material/warning:", type="primary", width='stretch'):
                 with st.spinner("초기화 중..."):
                     reset_app_data()
-                    rag = ReplyMateRAG()
-                    rag.init_db()
+                    get_indexer().request_and_wait("app data reset")
                     for key in list(st.session_state.keys()):
-                        del st.session_state[key]
+                        if key != "store_id":
+                            del st.session_state[key]
                     time.sleep(1)
                 st.success("완료!")
                 time.sleep(0.5)
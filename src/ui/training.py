@@ -1,9 +1,32 @@
 import streamlit as st
 import pandas as pd
 import io
-from src.models import auto_classify_reply
+from src.models import auto_classify_reply, auto_classify_replies, REPLY_CATEGORIES
 from src.data_manager import load_json_data, save_json_data
-from src.rag import ReplyMateRAG
+from src.indexer import get_indexer
+
+
+def _fill_missing_labels(df):
+    """감정/카테고리가 비었거나 허용 값이 아닌 행만 AI로 일괄 분류 (진행률 표시)"""
+    df = df.copy()
+    for col in ("sentiment", "category"):
+        if col not in df.columns:
+            df[col] = None
+
+    invalid = df[~df["sentiment"].isin(["positive", "negative"]) | ~df["category"].isin(REPLY_CATEGORIES)]
+    if invalid.empty:
+        return df
+
+    progress = st.progress(0.0, text=f"말투 {len(invalid)}개 자동 분류 중...")
+    metas = auto_classify_replies(
+        invalid["content"].astype(str).tolist(),
+        on_progress=lambda done, total: progress.progress(done / total, text=f"자동 분류 중... ({done}/{total})")
+    )
+    progress.empty()
+
+    df.loc[invalid.index, "sentiment"] = [m["sentiment"] for m in metas]
+    df.loc[invalid.index, "category"] = [m["category"] for m in metas]
+    return df
 
 
 def render_training_tab():
@@ -40,9 +63,8 @@ def render_training_tab():
                         templates.append(new_entry)
                         save_json_data("templates.json", templates)
 
-                        # RAG DB 업데이트
-                        rag = ReplyMateRAG()
-                        rag.init_db()
+                        # RAG DB 업데이트 (재구축 워커에 알리고 반영될 때까지 대기)
+                        get_indexer().request_and_wait("tone example added")
 
                         st.success(f"학습 완료! ({meta['sentiment']})")
                         st.rerun()
@@ -87,24 +109,42 @@ def render_training_tab():
 
             new_uploaded_df = None
             if uploaded_file is not None:
-                try:
-                    # 파일 읽기
-                    if uploaded_file.name.endswith('.csv'):
-                        new_uploaded_df = pd.read_csv(uploaded_file)
-                    else:
-                        new_uploaded_df = pd.read_excel(uploaded_file)
-
-                    # 컬럼 확인 (유효성 검사)
-                    required_cols = {'content', 'sentiment', 'category'}
-                    if not required_cols.issubset(new_uploaded_df.columns):
-                        st.error(f"파일 형식이 올바르지 않습니다. 필수 컬럼: {required_cols}")
-                        new_uploaded_df = None
-                    else:
-                        st.toast(f"{len(new_uploaded_df)}개의 말투 데이터를 불러왔습니다. 아래 표에서 확인 후 '수정사항 저장'을 눌러주세요.",
-                                 icon=":material/check:")
-
-                except Exception as e:
-                    st.error(f"파일을 읽는 중 오류가 발생했습니다: {e}")
+                # 같은 파일은 한 번만 읽고 분류 (rerun마다 다시 분류하지 않도록)
+                upload_key = f"tone_upload_{uploaded_file.file_id}"
+                if upload_key not in st.session_state:
+                    try:
+                        # 파일 읽기
+                        if uploaded_file.name.endswith('.csv'):
+                            loaded_df = pd.read_csv(uploaded_file)
+                        else:
+                            loaded_df = pd.read_excel(uploaded_file)
+
+                        # 컬럼 확인 (유효성 검사) - 감정/카테고리가 없으면 AI가 자동 분류
+                        if 'content' not in loaded_df.columns:
+                            st.error("파일 형식이 올바르지 않습니다. 필수 컬럼: content (sentiment, category는 선택)")
+                            st.session_state[upload_key] = None
+                        else:
+                            loaded_df = loaded_df.dropna(subset=["content"]).reset_index(drop=True)
+                            st.session_state[upload_key] = _fill_missing_labels(loaded_df)[
+                                ["content", "sentiment", "category"]]
+                            st.toast(f"{len(loaded_df)}개의 말투 데이터를 불러왔습니다. 아래 표에서 확인 후 '수정사항 저장'을 눌러주세요.",
+                                     icon=":material/check:")
+
+                    except Exception as e:
+                        st.error(f"파일을 읽는 중 오류가 발생했습니다: {e}")
+
+                new_uploaded_df = st.session_state.get(upload_key)
+
+        # 3) 여러 답글 붙여넣기 (한 줄에 하나씩, 감정/카테고리는 AI가 자동 분류)
+        pasted = st.text_area("여러 답글 붙여넣기 (한 줄에 하나씩)", height=150, key="tone_paste_text")
+        if st.button("자동 분류해서 추가", icon=":material/auto_awesome:", key="tone_paste_btn"):
+            lines = [line.strip() for line in pasted.splitlines() if line.strip()]
+            if lines:
+                st.session_state.tone_pasted_df = _fill_missing_labels(pd.DataFrame({"content": lines}))
+                st.toast(f"{len(lines)}개를 분류했습니다. 아래 표에서 확인 후 '수정사항 저장'을 눌러주세요.",
+                         icon=":material/check:")
+            else:
+                st.warning("내용 입력 필요")
 
     # --------------------------------------------------------------------------
     # 3. 학습 내역 관리 (에디터)
@@ -131,6 +171,8 @@ def render_training_tab():
     # [NEW] 업로드된 데이터가 있다면 병합해서 미리보기에 추가
     if new_uploaded_df is not None:
         df = pd.concat([df, new_uploaded_df], ignore_index=True)
+    if st.session_state.get("tone_pasted_df") is not None:
+        df = pd.concat([df, st.session_state.tone_pasted_df], ignore_index=True)
 
     if not df.empty:
         # 데이터 에디터 표시
@@ -148,7 +190,7 @@ def render_training_tab():
                 ),
                 "category": st.column_config.SelectboxColumn(
                     "카테고리",
-                    options=["taste_good", "taste_bad", "delivery_delay", "wrong_item", "quantity", "service"],
+                    options=REPLY_CATEGORIES,
                     width="medium",
                     required=True
                 )
@@ -184,9 +226,15 @@ def render_training_tab():
                     # 4. 파일 저장
                     save_json_data("templates.json", final_data)
 
-                    # 5. DB 재구축 (필수)
-                    rag = ReplyMateRAG()
-                    rag.init_db()
+                    # 5. DB 재구축 (필수) - 새로 바뀐 문서만 임베딩, 진행률 표시
+                    progress = st.progress(0.0, text="임베딩 준비 중...")
+                    get_indexer().request_and_wait(
+                        "tone examples saved",
+                        on_progress=lambda done, total: progress.progress(
+                            done / total, text=f"임베딩 중... ({done}/{total})"))
+                    progress.empty()
+
+                    st.session_state.pop("tone_pasted_df", None)
 
                 st.success("학습 내역이 저장되었습니다!")
                 st.rerun()
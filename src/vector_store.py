@@ -0,0 +1,424 @@
+"""
+프로세스 내 NumPy 벡터 저장소 (가게별 소규모 템플릿/메뉴 지식 베이스용)
+
+정규화된 float32 행렬 하나와 메타데이터 배열을 들고, 필터 + 코사인 top-k를 행렬곱 한 번으로 계산합니다.
+디스크에는 memory-map으로 여는 vectors.npy와 ids/문서/메타데이터 사이드카(meta.json)로 저장합니다.
+
+    VECTOR_STORE=numpy 로 켜면 ReplyMateRAG의 지식 베이스가 Chroma 대신 이 저장소를 씁니다.
+    python -m src.vector_store --bench             # 100 / 10k / 100k 문서 기준 Chroma와 비교
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+import numpy as np
+from filelock import FileLock
+from langchain_core.documents import Document
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+VECTOR_DIR = BASE_DIR / "vector_db"
+
+VECTORS_FILE = "vectors.npy"
+META_FILE = "meta.json"
+
+
+def _normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class _Snapshot(NamedTuple):
+    """한 시점의 저장소 내용. 만든 뒤에는 고치지 않음 (columns는 필터용 열 캐시)"""
+    matrix: np.ndarray
+    ids: tuple
+    documents: tuple
+    metadatas: tuple
+    index: dict
+    columns: dict
+
+
+def _snapshot(matrix, ids, documents, metadatas):
+    ids = tuple(ids)
+    return _Snapshot(matrix, ids, tuple(documents), tuple(metadatas),
+                     {doc_id: i for i, doc_id in enumerate(ids)}, {})
+
+
+_EMPTY = _snapshot(np.zeros((0, 0), dtype=np.float32), (), (), ())
+
+
+def _apply_upsert(state, ids, vectors, documents, metadatas):
+    matrix = np.array(state.matrix, dtype=np.float32) if state.ids else \
+        np.zeros((0, vectors.shape[1]), dtype=np.float32)
+    all_ids, all_documents, all_metadatas = list(state.ids), list(state.documents), list(state.metadatas)
+    index = dict(state.index)
+    new_rows = []
+    for doc_id, vector, document, meta in zip(ids, vectors, documents, metadatas):
+        row = index.get(doc_id)
+        if row is None:
+            index[doc_id] = len(all_ids)
+            new_rows.append(vector)
+            all_ids.append(doc_id)
+            all_documents.append(document)
+            all_metadatas.append(meta or {})
+        else:
+            matrix[row] = vector
+            all_documents[row] = document
+            all_metadatas[row] = meta or {}
+    if new_rows:
+        matrix = np.vstack([matrix, np.stack(new_rows)])
+    return _snapshot(matrix, all_ids, all_documents, all_metadatas)
+
+
+def _apply_delete(state, ids):
+    drop = {state.index[doc_id] for doc_id in ids if doc_id in state.index}
+    if not drop:
+        return state
+    keep = [i for i in range(len(state.ids)) if i not in drop]
+    return _snapshot(np.array(state.matrix[keep], dtype=np.float32), [state.ids[i] for i in keep],
+                     [state.documents[i] for i in keep], [state.metadatas[i] for i in keep])
+
+
+class NumpyVectorStore:
+    """
+    Chroma에서 ReplyMateRAG가 쓰는 부분만 같은 형태로 제공합니다.
+    - 컬렉션 쪽: get / upsert / delete / count
+    - 검색 쪽: similarity_search(query, k, filter)
+    변경은 메모리에 먼저 반영되고 persist() 때 디스크에 기록됩니다.
+
+    내용은 _Snapshot 하나로 통째로 교체(copy-on-write)하므로, 읽는 쪽은 잠금 없이 self._state를
+    한 번 집어 끝까지 그 스냅샷만 씁니다. 다른 프로세스가 새로 저장한 파일을 읽으면 아직 기록하지 않은
+    변경을 그 위에 다시 적용하고, 기록은 파일 잠금 안에서 최신 파일을 반영한 뒤에 합니다.
+    """
+
+    def __init__(self, path, embedding_function=None):
+        self.path = Path(path)
+        self.embedding_function = embedding_function
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(str(self.path.parent / f"{self.path.name}.lock"))
+        self._loaded_version = None
+        self._pending = []  # persist() 전까지의 변경 [(함수, 인자)]
+        self._state = _EMPTY
+        self._refresh()
+
+    # ------------------------------------------------------------------
+    # 디스크
+    # ------------------------------------------------------------------
+    def _meta_version(self):
+        # 사이드카는 항상 새 파일로 교체되므로 inode까지 보면 mtime 해상도가 낮아도 변경을 놓치지 않음
+        try:
+            stat = (self.path / META_FILE).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self):
+        """디스크의 스냅샷과 그 버전 (파일 잠금 보유 시 호출: 행렬/사이드카 교체 도중을 읽지 않도록)"""
+        version = self._meta_version()
+        if version is None:
+            return _EMPTY, None
+        with open(self.path / META_FILE, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        # 읽기 전용 memory-map (쓰기 시에는 새 배열을 만들어 교체)
+        matrix = np.load(self.path / VECTORS_FILE, mmap_mode="r")
+        return _snapshot(matrix, meta["ids"], meta["documents"], meta["metadatas"]), version
+
+    def _refresh_locked(self):
+        """(self._lock 보유 시) 디스크가 바뀌었으면 새로 읽고 아직 기록하지 않은 변경을 다시 적용"""
+        if self._meta_version() == self._loaded_version:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._file_lock:
+            state, version = self._load()
+        for apply, args in self._pending:
+            state = apply(state, *args)
+        self._state, self._loaded_version = state, version
+
+    def _refresh(self):
+        """다른 프로세스/인스턴스가 다시 저장했으면 새로 읽음"""
+        if self._meta_version() != self._loaded_version:
+            with self._lock:
+                self._refresh_locked()
+
+    def persist(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._lock, self._file_lock:
+            # 그 사이 다른 프로세스가 기록했으면 그 내용 위에 이쪽 변경을 얹어서 기록
+            if self._meta_version() != self._loaded_version:
+                state, _ = self._load()
+                for apply, args in self._pending:
+                    state = apply(state, *args)
+                self._state = state
+            state = self._state
+            tmp_vectors = self.path / f"{VECTORS_FILE}.tmp"
+            tmp_meta = self.path / f"{META_FILE}.tmp"
+            with open(tmp_vectors, 'wb') as f:
+                np.save(f, np.ascontiguousarray(state.matrix, dtype=np.float32))
+            with open(tmp_meta, 'w', encoding='utf-8') as f:
+                json.dump({"ids": list(state.ids), "documents": list(state.documents),
+                           "metadatas": list(state.metadatas)}, f, ensure_ascii=False)
+            # 행렬을 먼저 교체하고 사이드카를 마지막에 교체 (사이드카 교체가 변경 신호)
+            os.replace(tmp_vectors, self.path / VECTORS_FILE)
+            os.replace(tmp_meta, self.path / META_FILE)
+            self._loaded_version = self._meta_version()
+            self._pending = []
+
+    # ------------------------------------------------------------------
+    # 컬렉션 API (Chroma collection과 같은 형태)
+    # ------------------------------------------------------------------
+    def _write(self, apply, *args):
+        with self._lock:
+            self._refresh_locked()
+            self._state = apply(self._state, *args)
+            self._pending.append((apply, args))
+
+    def count(self):
+        self._refresh()
+        return len(self._state.ids)
+
+    def upsert(self, ids, embeddings, documents, metadatas=None):
+        vectors = _normalize_rows(embeddings)
+        self._write(_apply_upsert, list(ids), vectors, list(documents), list(metadatas or [None] * len(ids)))
+
+    def delete(self, ids):
+        self._write(_apply_delete, list(ids))
+
+    def get(self, ids=None, where=None, limit=None, include=None):
+        self._refresh()
+        state = self._state
+        if ids is not None:
+            rows = [state.index[doc_id] for doc_id in ids if doc_id in state.index]
+        else:
+            rows = np.flatnonzero(self._mask(state, where)).tolist()
+        if limit is not None:
+            rows = rows[:limit]
+        result = {
+            "ids": [state.ids[i] for i in rows],
+            "documents": [state.documents[i] for i in rows],
+            "metadatas": [state.metadatas[i] for i in rows],
+        }
+        if include and "embeddings" in include:
+            result["embeddings"] = np.asarray(state.matrix[rows], dtype=np.float32)
+        return result
+
+    # ------------------------------------------------------------------
+    # 필터 (Chroma where 문법 중 $and / $or / $eq / $ne / $in 지원)
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _column(state, key):
+        column = state.columns.get(key)
+        if column is None:
+            column = np.array([m.get(key) for m in state.metadatas], dtype=object)
+            state.columns[key] = column
+        return column
+
+    def _mask(self, state, where):
+        n = len(state.ids)
+        if not where:
+            return np.ones(n, dtype=bool)
+        if "$and" in where:
+            mask = np.ones(n, dtype=bool)
+            for cond in where["$and"]:
+                mask &= self._mask(state, cond)
+            return mask
+        if "$or" in where:
+            mask = np.zeros(n, dtype=bool)
+            for cond in where["$or"]:
+                mask |= self._mask(state, cond)
+            return mask
+
+        mask = np.ones(n, dtype=bool)
+        for key, cond in where.items():
+            column = self._column(state, key)
+            if not isinstance(cond, dict):
+                cond = {"$eq": cond}
+            for op, value in cond.items():
+                if op == "$eq":
+                    mask &= column == value
+                elif op == "$ne":
+                    mask &= column != value
+                elif op == "$in":
+                    mask &= np.isin(column, list(value))
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+        return mask
+
+    # ------------------------------------------------------------------
+    # 검색
+    # ------------------------------------------------------------------
+    def search_by_vector(self, vector, k=4, filter=None):
+        """(행 번호, 코사인 유사도) 목록, 유사도 내림차순 (행 번호는 snapshot() 기준)"""
+        self._refresh()
+        return self._search(self._state, vector, k, filter)
+
+    def snapshot(self):
+        """지금 내용의 스냅샷 (search_by_vector의 행 번호를 ids/documents/metadatas로 바꿀 때 사용)"""
+        self._refresh()
+        return self._state
+
+    def _search(self, state, vector, k, filter):
+        matrix, n = state.matrix, len(state.ids)
+        if n == 0 or k <= 0:
+            return []
+        query = _normalize_rows(vector)[0]
+
+        if filter:
+            rows = np.flatnonzero(self._mask(state, filter))
+            if rows.size == 0:
+                return []
+            scores = matrix[rows] @ query
+        else:
+            rows = None
+            scores = matrix @ query
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        picked = rows[top] if rows is not None else top
+        return list(zip(picked.tolist(), scores[top].tolist()))
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        vector = self.embedding_function.embed_query(query)
+        state = self.snapshot()
+        return [
+            (Document(page_content=state.documents[i], metadata=state.metadatas[i]), score)
+            for i, score in self._search(state, vector, k, filter)
+        ]
+
+    def similarity_search(self, query, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(name, embedding_function, root=None):
+    """컬렉션 이름별 프로세스 공용 저장소 (인스턴스 간 변경이 바로 보이도록)"""
+    path = Path(root or VECTOR_DIR) / name
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = NumpyVectorStore(path, embedding_function)
+            _stores[path] = store
+        store.embedding_function = embedding_function
+        return store
+
+
+def list_stores(root=None):
+    root = Path(root or VECTOR_DIR)
+    if not root.exists():
+        return []
+    return [p.name for p in root.iterdir() if p.is_dir()]
+
+
+def evict_root(root):
+    """root 아래 저장소를 메모리에서 내림 (디스크는 그대로)"""
+    root = Path(root)
+    with _stores_lock:
+        for path in [p for p in _stores if p.parent == root]:
+            _stores.pop(path, None)
+
+
+def drop_store(name, root=None):
+    path = Path(root or VECTOR_DIR) / name
+    with _stores_lock:
+        _stores.pop(path, None)
+    shutil.rmtree(path, ignore_errors=True)
+    path.with_name(f"{path.name}.lock").unlink(missing_ok=True)
+
+
+# ------------------------------------------------------------------
+# 벤치마크
+# ------------------------------------------------------------------
+def _synthetic(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    sentiments, tones = ["positive", "negative"], ["polite", "friendly", "witty", "owner_custom"]
+    metadatas = []
+    for i in range(n):
+        if i % 6 == 0:
+            metadatas.append({"type": "menu", "name": f"menu-{i}"})
+        else:
+            metadatas.append({"sentiment": sentiments[i % 2], "tone": tones[i % 4], "category": f"c{i % 5}"})
+    return [f"doc-{i}" for i in range(n)], vectors, [f"문서 {i}" for i in range(n)], metadatas
+
+
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return float(np.median(samples))
+
+
+def _bench_size(n, dim, queries, workdir):
+    import chromadb
+
+    ids, vectors, documents, metadatas = _synthetic(n, dim)
+    query_vectors = np.random.default_rng(1).standard_normal((queries, dim)).astype(np.float32)
+    where = {"$and": [{"sentiment": {"$eq": "positive"}}, {"tone": {"$eq": "friendly"}}]}
+    batch = 5000
+
+    np_path = Path(workdir) / f"np-{n}"
+    store = NumpyVectorStore(np_path)
+    for i in range(0, n, batch):
+        store.upsert(ids[i:i + batch], vectors[i:i + batch], documents[i:i + batch], metadatas[i:i + batch])
+    store.persist()
+
+    chroma_path = str(Path(workdir) / f"chroma-{n}")
+    client = chromadb.PersistentClient(path=chroma_path)
+    collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+    for i in range(0, n, batch):
+        collection.add(ids=ids[i:i + batch], embeddings=vectors[i:i + batch].tolist(),
+                       documents=documents[i:i + batch], metadatas=metadatas[i:i + batch])
+    del client, collection
+
+    np_open = _timed(lambda: NumpyVectorStore(np_path), 5)
+    chroma_open = _timed(lambda: chromadb.PersistentClient(path=chroma_path).get_collection("bench"), 5)
+
+    np_store = NumpyVectorStore(np_path)
+    chroma_collection = chromadb.PersistentClient(path=chroma_path).get_collection("bench")
+    q = iter(query_vectors)
+    np_search = _timed(lambda: np_store.search_by_vector(next(q), k=2, filter=where), queries)
+    q = iter(query_vectors)
+    chroma_search = _timed(
+        lambda: chroma_collection.query(query_embeddings=[next(q).tolist()], n_results=2, where=where), queries
+    )
+    print(f"[BENCH] n={n:>6}: open numpy {np_open:8.2f}ms / chroma {chroma_open:8.2f}ms | "
+          f"filtered top-2 numpy {np_search:7.3f}ms / chroma {chroma_search:7.3f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NumPy 벡터 저장소와 Chroma의 열기/검색 지연 비교")
+    parser.add_argument("--bench", action="store_true", help="벤치마크 실행")
+    parser.add_argument("--sizes", default="100,10000,100000", help="문서 수 목록 (쉼표 구분)")
+    parser.add_argument("--dim", type=int, default=768, help="임베딩 차원")
+    parser.add_argument("--queries", type=int, default=50, help="크기별 검색 횟수")
+    args = parser.parse_args(argv)
+
+    if not args.bench:
+        parser.print_help()
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix="replymate-vector-bench-")
+    try:
+        for n in (int(s) for s in args.sizes.split(",")):
+            _bench_size(n, args.dim, args.queries, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from src import metrics, tenancy
+from src.rag import ReplyMateRAG, content_id, document_version
+from src.indexer import get_indexer
+
+# UI 밖(운영 스크립트, 동기화, git pull 등)에서 바뀐 지식 베이스 원본 파일을 감지해 반영
+WATCHED_FILES = ("templates.json", "menu_info.json")
+# 파일 이벤트(watchdog)를 못 쓰면 이 주기로 수정 시각을 확인, 쓸 수 있으면 놓친 이벤트 보정용
+POLL_INTERVAL_SEC = float(os.getenv("KB_WATCH_INTERVAL_SEC", "2"))
+EVENT_SAFETY_POLL_SEC = 30
+
+
+def is_enabled():
+    return os.getenv("KB_WATCH", "0") == "1"
+
+
+class DataWatcher:
+    """
+    data/ 아래 템플릿/메뉴 파일 변경을 감시합니다.
+    바뀐 파일은 레코드(문서 내용 해시) 단위로 이전 상태와 비교해, 실제로 달라진 문서가 있을 때만
+    재구축 워커에 알립니다. 재구축은 새 문서만 임베딩하고 나머지는 활성 버전에서 복사하므로
+    반영 비용은 바뀐 레코드 수에 비례합니다.
+    """
+
+    def __init__(self):
+        self.store_id = tenancy.current_store()
+        self._data_dir = tenancy.data_dir(self.store_id)
+        self._rag = ReplyMateRAG()
+        self._wake = threading.Event()
+        self._signatures = {}
+        self._records = {}
+        self._observer = self._start_observer()
+        for name in WATCHED_FILES:
+            self._signatures[name] = self._signature(name)
+            self._records[name] = self._read_records(name) or set()
+        self._catch_up()
+        self._thread = threading.Thread(target=self._loop, name=f"replymate-kb-watcher-{self.store_id}", daemon=True)
+        self._thread.start()
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            print(f"[INFO] watchdog not installed, polling data files every {POLL_INTERVAL_SEC}s")
+            return None
+
+        wake = self._wake
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                paths = (getattr(event, "src_path", ""), getattr(event, "dest_path", ""))
+                if any(os.path.basename(str(p)) in WATCHED_FILES for p in paths):
+                    wake.set()
+
+        observer = Observer()
+        observer.schedule(_Handler(), str(self._data_dir), recursive=False)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    # ------------------------------------------------------------------
+    # 파일 / 레코드
+    # ------------------------------------------------------------------
+    def _signature(self, name):
+        try:
+            stat = (self._data_dir / name).stat()
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def _read_records(self, name):
+        """파일의 문서 내용 해시 집합. 쓰는 도중이거나 (git checkout 등으로) 잠시 없으면 None"""
+        if not (self._data_dir / name).exists():
+            return None
+        try:
+            docs = self._rag.template_documents(name) if name == "templates.json" else self._rag.menu_documents(name)
+        except (json.JSONDecodeError, KeyError, OSError):
+            return None
+        return {content_id(doc) for doc in docs}
+
+    def _catch_up(self):
+        """꺼져 있는 동안 바뀐 내용이 있으면 시작하자마자 반영"""
+        expected = document_version(set().union(*self._records.values()))
+        active = self._rag.active_version()
+        if active and active != expected:
+            get_indexer(self.store_id).notify(f"data files changed while stopped ({active} -> {expected})")
+
+    def check(self):
+        """바뀐 파일의 레코드 차이를 계산하고, 달라진 문서가 있으면 재구축을 알림. 알림 번호 또는 None"""
+        changes = []
+        for name in WATCHED_FILES:
+            signature = self._signature(name)
+            if signature == self._signatures[name]:
+                continue
+            records = self._read_records(name)
+            if records is None:
+                # 다음 확인 때 다시 읽음
+                continue
+            self._signatures[name] = signature
+            added = records - self._records[name]
+            removed = self._records[name] - records
+            self._records[name] = records
+            if added or removed:
+                changes.append(f"{name} +{len(added)} -{len(removed)}")
+                metrics.incr("kb_watch.records_changed", len(added) + len(removed))
+
+        if not changes:
+            return None
+        metrics.incr("kb_watch.reloads")
+        return get_indexer(self.store_id).notify("external edit: " + ", ".join(changes))
+
+    def _loop(self):
+        interval = EVENT_SAFETY_POLL_SEC if self._observer else POLL_INTERVAL_SEC
+        while True:
+            self._wake.wait(timeout=interval)
+            self._wake.clear()
+            try:
+                with tenancy.use_store(self.store_id):
+                    self.check()
+            except Exception as e:
+                print(f"[WARN] Data file check failed: {e}")
+
+
+_instances = {}
+_instance_lock = threading.Lock()
+
+
+def start_watcher():
+    """KB_WATCH=1일 때만 현재 가게의 감시 스레드를 시작. 꺼져 있으면 None"""
+    if not is_enabled():
+        return None
+    store_id = tenancy.current_store()
+    with _instance_lock:
+        if store_id not in _instances:
+            _instances[store_id] = DataWatcher()
+        return _instances[store_id]
@@ -1,14 +1,30 @@
+import json
 import operator
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
 from typing import Annotated, TypedDict, List
 from langchain_core.messages import SystemMessage, HumanMessage
 from langgraph.graph import StateGraph, END, START
 
 from src.models import analyze_review_sentiment, get_llm
+from src.llm_gateway import estimate_tokens, get_gateway
 from src.rag import ReplyMateRAG
-
-# RAG 초기화
-rag = ReplyMateRAG()
-
+from src import metrics, tenancy
+from src.reuse import find_reusable_reply
+from src.fallback import fallback_result
+
+# 답글 1건에 허용하는 최대 소요 시간. 넘으면 템플릿 답글로 대체
+DEADLINE_SEC = float(os.getenv("REPLY_DEADLINE_SEC", "30"))
+# 묶음 생성 호출은 한 번에 여러 답글을 쓰므로, 묶음의 리뷰가 1건 늘 때마다 이만큼 시간을 더 허용
+GROUP_DEADLINE_PER_REVIEW_SEC = float(os.getenv("REPLY_GROUP_DEADLINE_PER_REVIEW_SEC", "5"))
+# 시작 전 대기 중인 작업이 있을 때 시작 여부를 다시 확인하는 간격
+_BUDGET_POLL_SEC = 0.05
+# 프롬프트에 함께 넣을 승인 답글 말투 예시 수
+STYLE_EXAMPLES = 2
+
+# 시간 제한 실행용 스레드 풀 (시간 초과된 호출은 백그라운드에서 끝날 때까지 두고 결과만 버림)
+_deadline_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="replymate-deadline")
 
 class GraphState(TypedDict):
     review_text: str
@@ -23,21 +39,114 @@ class GraphState(TypedDict):
     retrieved_menus: List[str]
     final_reply: str
     user_feedback: str
+    kobert_sentiment: str
+    priority: str
+    review_id: str
+    llm_sentiment: str
+    # 노드별 실행 기록 (병렬 분기에서 동시에 추가되므로 리스트를 이어 붙임)
+    trace: Annotated[list, operator.add]
+    speculative_reply: str
+    speculation: dict
+    # 이전 분석에서 나온 카테고리 (추측 생성이 분석 결과와 어긋났는지 판단용)
+    expected_category: str
 
 
 # ------------------------------------------------------------------
-# NODE 1: Analyze
+# 실행 추적 (노드별 소요 시간 / 임계 경로)
 # ------------------------------------------------------------------
-def analyze_node(state: GraphState):
-    review = state["review_text"]
-    cust_name = state.get("customer_name", "")
+# 각 노드의 선행 노드 (임계 경로 역추적용)
+NODE_DEPS = {
+    "templates": ["kobert"],
+    "spec_generate": ["templates", "menu"],
+    "join": ["spec_generate", "templates", "llm_analyze", "menu"],
+    "generate": ["join"]
+}
+
+
+def _trace(node, started):
+    ended = time.perf_counter()
+    return [{"node": node, "start": started, "end": ended, "ms": round((ended - started) * 1000, 1)}]
+
+
+def critical_path(trace):
+    """추적 기록에서 가장 늦게 끝난 경로와 전체 소요 시간(ms) 계산"""
+    if not trace:
+        return None
+    by_node = {e["node"]: e for e in trace}
+    last = max(trace, key=lambda e: e["end"])
+    path = [last["node"]]
+    while NODE_DEPS.get(path[-1]):
+        deps = [by_node[d] for d in NODE_DEPS[path[-1]] if d in by_node]
+        if not deps:
+            break
+        path.append(max(deps, key=lambda e: e["end"])["node"])
+    path.reverse()
+
+    return {
+        "path": path,
+        "critical_path_ms": round((last["end"] - min(e["start"] for e in trace)) * 1000, 1),
+        "serial_ms": round(sum(e["ms"] for e in trace), 1)
+    }
+
+
+def log_trace(result):
+    summary = critical_path(result.get("trace"))
+    if not summary:
+        return None
+    metrics.observe("graph.critical_path_ms", summary["critical_path_ms"])
+    metrics.observe("graph.serial_ms", summary["serial_ms"])
+    steps = ", ".join(f"{e['node']}={e['ms']:.0f}ms" for e in result["trace"])
+    print(f"[TRACE] {' -> '.join(summary['path'])} {summary['critical_path_ms']:.0f}ms "
+          f"(serial {summary['serial_ms']:.0f}ms; {steps})")
+    return summary
+
+
+# ------------------------------------------------------------------
+# NODE 1: 병렬 분석/검색 (KoBERT -> 템플릿 | LLM 분석 | 메뉴 조회)
+# ------------------------------------------------------------------
+def sentiment_branch_node(state: GraphState):
+    """
+    KoBERT 1차 분석 후 바로 그 감정으로 말투 템플릿을 검색합니다.
+    (LangGraph는 단계별로 실행되므로 두 작업을 한 노드에서 이어서 수행해야 LLM 분석을 기다리지 않음)
+    """
+    started = time.perf_counter()
 
-    # 1. KoBERT 1차 분석 (기계적 분석)
     # KoBERT는 텍스트 자체의 분위기만 봅니다.
-    kobert_result = analyze_review_sentiment(review)
-    initial_sentiment = kobert_result["label"]
+    # (배치 실행에서 미리 계산된 결과가 있으면 그대로 사용)
+    kobert_sentiment = state.get("kobert_sentiment")
+    if not kobert_sentiment:
+        kobert_sentiment = analyze_review_sentiment(state["review_text"])["label"]
+    trace = _trace("kobert", started)
+
+    started = time.perf_counter()
+    tone_docs = _tone_examples(state, kobert_sentiment)
+    trace += _trace("templates", started)
+
+    return {
+        "kobert_sentiment": kobert_sentiment,
+        "retrieved_templates": tone_docs,
+        "trace": trace
+    }
+
+
+def _tone_examples(state, sentiment):
+    """
+    말투 예시: templates.json 템플릿 + 비슷한 리뷰에 사장님이 승인한 실제 답글.
+    (템플릿이 앞에 오도록 유지 - 시간 초과 대체 답글은 앞쪽 템플릿을 사용)
+    """
+    rag = ReplyMateRAG()
+    examples = rag.search_templates(sentiment)
+    examples += rag.search_style_examples(state["review_text"], sentiment, tone=state.get("tone"),
+                                          k=STYLE_EXAMPLES)
+    return list(dict.fromkeys(examples))
+
+
+def llm_analyze_node(state: GraphState):
+    """LLM 2차 분석 (맥락 및 키워드 추출) - KoBERT와 동시에 실행"""
+    started = time.perf_counter()
+    review = state["review_text"]
+    cust_name = state.get("customer_name", "")
 
-    # 2. LLM 2차 분석 (맥락 및 키워드 추출)
     # [핵심] 고객 닉네임과 리뷰의 관계를 파악하도록 지시
     llm = get_llm()
 
@@ -47,14 +156,13 @@ def analyze_node(state: GraphState):
 
     Customer Name: "{cust_name}"
     Review Text: "{review}"
-    KoBERT Analysis: {initial_sentiment}
 
     Task:
     1. Extract category (taste, delivery, service, quantity, wrong_item).
     2. Extract menu name (or "null").
     3. **Determine Final Sentiment (Crucial):**
        - **Check the Nickname:** Does the nickname imply a specific action for good food? (e.g., "맛있으면 짖는 개" -> implies barking "멍멍" means delicious).
-       - **Context Match:** If the review text matches the nickname's condition, override KoBERT and mark it as **"positive"** (Extreme Praise).
+       - **Context Match:** If the review text matches the nickname's condition, mark it as **"positive"** (Extreme Praise) even if the text alone sounds negative.
        - Otherwise, follow standard sentiment analysis.
 
     JSON Output format:
@@ -66,75 +174,211 @@ def analyze_node(state: GraphState):
     """
 
     try:
-        res = llm.invoke(prompt)
+        res = llm.invoke(prompt, priority=state.get("priority", "interactive"), caller="analyze")
         content = res.content.replace("```json", "").replace("```", "").strip()
-        import json
         data = json.loads(content)
 
         category = data.get("category", "service")
         menu = data.get("menu", "null")
-        sentiment = data.get("final_sentiment", initial_sentiment)  # LLM의 판단을 최우선으로 함
-
-        # 디버깅용 로그
-        if sentiment != initial_sentiment:
-            print(f"[INFO] Sentiment Overridden by LLM: {initial_sentiment} -> {sentiment} (Reason: Context)")
+        llm_sentiment = data.get("final_sentiment")
 
     except Exception as e:
-        print(f"[WARN] LLM Analysis failed: {e}")
+        print(f"[WARN] LLM Analysis failed, using KoBERT result: {e}")
+        metrics.incr("analyze.llm_fallback")
         category = "service"
         menu = "null"
-        sentiment = initial_sentiment  # 실패 시 KoBERT 결과 사용
-
-    print(f"[INFO] Analyze Result: {sentiment}, {category}, {menu}")
+        llm_sentiment = None  # 실패 시 join에서 KoBERT 결과 사용
 
     return {
-        "sentiment": sentiment,
         "category": category,
-        "extracted_menu": menu
+        "extracted_menu": menu,
+        "llm_sentiment": llm_sentiment,
+        "trace": _trace("llm_analyze", started)
     }
 
 
-# ------------------------------------------------------------------
-# NODE 2: Retrieve
-# ------------------------------------------------------------------
-def retrieve_node(state: GraphState):
+def menu_node(state: GraphState):
     """
-    RAG 검색 노드 (메뉴 정보 및 말투 템플릿 검색)
+    메뉴 정보 조회 - 분석과 동시에 실행.
+    UI에서 선택한 메뉴가 있으면 DB 직접 조회, 없으면 리뷰 문장으로 유사도 검색을 미리 해 둡니다.
     """
-    print("--- RETRIEVE INFO ---")
-    rag = ReplyMateRAG()
+    started = time.perf_counter()
+    menu_docs = ReplyMateRAG().search_menu(state["review_text"], target_menu_name=state.get("manual_menu"))
+    return {
+        "retrieved_menus": menu_docs,
+        "trace": _trace("menu", started)
+    }
 
-    # 1. 타겟 메뉴명 확인 (UI 선택값 우선 -> 없으면 AI 추출값)
-    target_menu = state.get("manual_menu")
-    if not target_menu or target_menu == "null":
-        target_menu = state.get("extracted_menu")
 
-    print(f"검색 대상 메뉴: {target_menu}")  # 로그 확인용
+def speculative_branch_node(state: GraphState):
+    """
+    [추측 생성 모드] LLM 분석을 기다리지 않고 KoBERT 감정으로 바로 답글을 생성합니다.
+    LLM 분석/메뉴 조회도 이 노드 안에서 동시에 실행하여, 분석 결과가 나오면 추측 답글을 쓸지 정합니다.
+    - 감정이 KoBERT와 다르거나 카테고리가 이전 분석과 다르면 추측 답글을 기다리지 않고 버림.
+      이미 시작된 생성 호출은 멈출 수 없어 끝까지 실행되고(호출 한도/비용도 그대로 사용) 결과만 버려집니다.
+    - 그래서 추측 호출은 게이트웨이에 여유가 있을 때만 보냅니다. (대기열이 있거나 한도가 찼으면
+      추측 없이 분석 결과를 기다렸다가 generate에서 한 번만 생성)
+    - 메뉴 정보가 달라지는 경우는 join에서야 알 수 있어, 추측 답글이 끝날 때까지 기다린 뒤 다시 생성합니다.
+    """
+    pool = ThreadPoolExecutor(max_workers=3)
+    try:
+        analyze_future = tenancy.submit(pool, llm_analyze_node, state)
+        menu_future = tenancy.submit(pool, menu_node, state)
+        update = sentiment_branch_node(state)
+        menu_update = menu_future.result()
+
+        if not get_gateway().has_spare_capacity():
+            # 다른 호출이 기다리는 중이면 버려질 수 있는 호출로 한도를 쓰지 않음
+            metrics.incr("speculation.skipped")
+            analysis = analyze_future.result()
+            return {
+                **update,
+                **analysis,
+                "retrieved_menus": menu_update["retrieved_menus"],
+                "trace": update["trace"] + menu_update["trace"] + analysis["trace"]
+            }
+
+        started = time.perf_counter()
+        draft_state = {
+            **state,
+            "sentiment": update["kobert_sentiment"],
+            "retrieved_templates": update["retrieved_templates"],
+            "retrieved_menus": menu_update["retrieved_menus"]
+        }
+        draft_future = tenancy.submit(pool, generate_node, draft_state)
+
+        analysis = analyze_future.result()
+        result = {
+            **update,
+            **analysis,
+            "retrieved_menus": menu_update["retrieved_menus"],
+            "trace": update["trace"] + menu_update["trace"] + analysis["trace"]
+        }
+
+        mismatch = _speculation_mismatch(state, update["kobert_sentiment"], analysis)
+        if mismatch:
+            # 아직 시작 전이면 취소되고, 이미 실행 중인 호출은 끝난 뒤 결과만 버려짐
+            draft_future.cancel()
+            result["speculation"] = {"aborted": mismatch}
+            return result
+
+        result["speculative_reply"] = draft_future.result()["final_reply"]
+        result["trace"] += _trace("spec_generate", started)
+        return result
+    finally:
+        # 버린 추측 답글을 기다리지 않음
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _speculation_mismatch(state, kobert_sentiment, analysis):
+    """LLM 분석이 추측 생성의 가정(KoBERT 감정, 이전 카테고리)과 어긋난 항목. 맞으면 None"""
+    llm_sentiment = analysis.get("llm_sentiment")
+    if llm_sentiment and llm_sentiment != kobert_sentiment:
+        return "sentiment"
+    expected = state.get("expected_category")
+    if expected and analysis.get("category") != expected:
+        return "category"
+    return None
+
+
+def _settle_speculation(state, update):
+    """추측 생성 결과 채택 여부와 절약된 지연 시간 기록"""
+    by_node = {e["node"]: e for e in state.get("trace", [])}
+    spec, analyze = by_node.get("spec_generate"), by_node.get("llm_analyze")
+    aborted = (state.get("speculation") or {}).get("aborted")
+
+    # 분석 직후 버리지 않았더라도 답글 내용에 영향을 주는 감정(템플릿)이나 메뉴 정보가 바뀌면 폐기
+    hit = not aborted and "retrieved_templates" not in update and update.get(
+        "retrieved_menus", state.get("retrieved_menus")) == state.get("retrieved_menus")
+
+    # join이 추측 생성을 기다린 시간 (LLM 분석보다 늦게 끝난 만큼)
+    waited_ms = max(0.0, (spec["end"] - analyze["end"]) * 1000) if spec and analyze else 0.0
+    saved_ms = ((spec["ms"] if spec else 0.0) if hit else 0.0) - waited_ms
+
+    metrics.incr("speculation.runs")
+    if not hit:
+        metrics.incr("speculation.misses")
+    if aborted:
+        metrics.incr("speculation.aborted")
+    metrics.observe("speculation.saved_ms", saved_ms)
+    print(f"[INFO] Speculative reply {'accepted' if hit else 'discarded'}"
+          f"{f' early ({aborted} mismatch)' if aborted else ''} (saved {saved_ms:.0f}ms)")
+
+    if hit:
+        update["final_reply"] = state["speculative_reply"]
+    update["speculation"] = {"hit": hit, "saved_ms": round(saved_ms, 1), "aborted": aborted}
+
+
+def misspeculation_rate():
+    return metrics.ratio("speculation.misses", "speculation.runs")
 
-    # 2. [핵심] 수정된 search_menu 함수 호출 (target_menu_name 인자 전달)
-    # 이제 유사도 검색이 아니라 'DB 직접 조회'를 수행합니다.
-    menu_docs = rag.search_menu(state["review_text"], target_menu_name=target_menu)
 
-    # 3. 말투 템플릿 검색
-    tone_docs = rag.search_templates(
-        state["sentiment"],
-        # 카테고리나 톤 정보가 있으면 추가 필터링 가능 (여기서는 기본 검색)
-    )
+# ------------------------------------------------------------------
+# NODE 2: Join (감정 확정 / 필요한 경우에만 재검색)
+# ------------------------------------------------------------------
+def join_node(state: GraphState):
+    started = time.perf_counter()
+    kobert_sentiment = state["kobert_sentiment"]
+    sentiment = state.get("llm_sentiment") or kobert_sentiment  # LLM의 판단을 최우선으로 함
+    update = {"sentiment": sentiment}
 
-    # 검색 결과 로그 출력
-    print(f"검색된 메뉴 정보: {menu_docs}")
-    print(f"검색된 말투 예시: {len(tone_docs)}개")
+    # 디버깅용 로그
+    if sentiment != kobert_sentiment:
+        print(f"[INFO] Sentiment Overridden by LLM: {kobert_sentiment} -> {sentiment} (Reason: Context)")
+        # 템플릿은 KoBERT 감정으로 미리 검색했으므로 다시 검색
+        update["retrieved_templates"] = _tone_examples(state, sentiment)
 
-    return {
-        "retrieved_menus": menu_docs,
-        "retrieved_templates": tone_docs
-    }
+    # UI 선택 메뉴가 없고 AI가 메뉴명을 추출했다면 미리 검색한 결과 대신 DB 직접 조회
+    manual_menu = state.get("manual_menu")
+    extracted = state.get("extracted_menu")
+    if (not manual_menu or manual_menu == "null") and extracted and extracted != "null":
+        print(f"검색 대상 메뉴: {extracted}")  # 로그 확인용
+        update["retrieved_menus"] = ReplyMateRAG().search_menu(state["review_text"], target_menu_name=extracted)
+
+    print(f"[INFO] Analyze Result: {sentiment}, {state.get('category')}, {extracted}")
+    print(f"검색된 메뉴 정보: {update.get('retrieved_menus', state.get('retrieved_menus'))}")
+    print(f"검색된 말투 예시: {len(update.get('retrieved_templates', state.get('retrieved_templates')) or [])}개")
+
+    if state.get("speculative_reply") or state.get("speculation"):
+        _settle_speculation(state, update)
+
+    update["trace"] = _trace("join", started)
+    return update
+
+
+def _after_join(state: GraphState):
+    # 추측 생성한 답글이 채택되었으면 생성 단계를 건너뜀
+    return END if state.get("final_reply") else "generate"
 
 
 # ------------------------------------------------------------------
 # NODE 3: Generate
 # ------------------------------------------------------------------
+def _tone_instructions(tone):
+    """톤(Tone)에 따른 프롬프트 지시사항 (단건/묶음 생성 공용)"""
+    if tone == "정중한":
+        # [A] 정중한 모드: 이모티콘 금지, 격식체 강제
+        tone_instructions = """
+        3. **Tone & Manner (FORMAL MODE):**
+           - **STRICTLY FORBIDDEN:** Do NOT use emojis (e.g., ^^, ㅠㅠ, 😊) and Tildes (~).
+           - **Style:** Professional, Objective, and Polite (Like a Hotel Concierge).
+           - **Endings:** Use formal endings like "~입니다", "~하겠습니다", "~십시오".
+           - **Structure:** Start with "고객님," or "{state['customer_name']}님,".
+        """
+    else:
+        # [B] 사장님/친근한 모드: 데이터 모방, 텍스트 이모티콘 허용
+        tone_instructions = """
+        3. **Tone & Manner (OWNER/CASUAL MODE):**
+           - **Style Source:** Mimic 'Owner's Tone Examples' (BELOW) exactly.
+           - **Emojis:** Use text emojis (^^, ㅠㅠ) and Tildes (~) naturally as seen in examples.
+           - **Endings:** Use soft endings like "~요", "~네요", "~답니다".
+           - **Length:** Keep it short and friendly.
+        """
+    return tone_instructions
+
+
 def generate_node(state: GraphState):
+    started = time.perf_counter()
     llm = get_llm()
 
     # ------------------------------------------------------------------
@@ -153,26 +397,7 @@ def generate_node(state: GraphState):
     # ------------------------------------------------------------------
     # 2. 톤(Tone)에 따른 프롬프트 지시사항 분기 (핵심 로직)
     # ------------------------------------------------------------------
-    current_tone = state.get("tone", "친근한")
-
-    if current_tone == "정중한":
-        # [A] 정중한 모드: 이모티콘 금지, 격식체 강제
-        tone_instructions = """
-        3. **Tone & Manner (FORMAL MODE):**
-           - **STRICTLY FORBIDDEN:** Do NOT use emojis (e.g., ^^, ㅠㅠ, 😊) and Tildes (~).
-           - **Style:** Professional, Objective, and Polite (Like a Hotel Concierge).
-           - **Endings:** Use formal endings like "~입니다", "~하겠습니다", "~십시오".
-           - **Structure:** Start with "고객님," or "{state['customer_name']}님,".
-        """
-    else:
-        # [B] 사장님/친근한 모드: 데이터 모방, 텍스트 이모티콘 허용
-        tone_instructions = """
-        3. **Tone & Manner (OWNER/CASUAL MODE):**
-           - **Style Source:** Mimic 'Owner's Tone Examples' (BELOW) exactly.
-           - **Emojis:** Use text emojis (^^, ㅠㅠ) and Tildes (~) naturally as seen in examples.
-           - **Endings:** Use soft endings like "~요", "~네요", "~답니다".
-           - **Length:** Keep it short and friendly.
-        """
+    tone_instructions = _tone_instructions(state.get("tone", "친근한"))
 
     # ------------------------------------------------------------------
     # 3. 시스템 프롬프트 조립
@@ -226,14 +451,129 @@ def generate_node(state: GraphState):
     res = llm.invoke([
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_prompt)
-    ])
+    ], priority=state.get("priority", "interactive"), caller="generate")
 
     return {
         "final_reply": res.content,
-        "sentiment": state.get("sentiment", "unknown")
+        "sentiment": state.get("sentiment", "unknown"),
+        "trace": _trace("generate", started)
     }
 
 
+# ------------------------------------------------------------------
+# 묶음 생성 (일괄 생성용): 공통 지시문은 한 번만 보내고 여러 리뷰의 답글을 JSON으로 받음
+# ------------------------------------------------------------------
+def _format_list(items, empty):
+    return "\n".join([f"- {t}" for t in items]) if items else empty
+
+
+def _is_valid_reply(reply):
+    return isinstance(reply, str) and len(reply.strip()) >= 10 and "OO님" not in reply
+
+
+def _generate_group(states, priority):
+    """같은 톤/감정 그룹의 리뷰들을 한 번의 호출로 생성. key -> 답글 (검증 전)"""
+    llm = get_llm()
+    first = states[0]
+
+    # 말투 템플릿은 감정 기준으로 검색되므로 그룹 안에서는 사실상 공통
+    templates = list(dict.fromkeys(t for s in states for t in s.get("retrieved_templates") or []))
+    context_templates = _format_list(templates, "참고할 템플릿이 없습니다.")
+
+    system_prompt = f"""
+    You are the owner of the restaurant '{first.get("store_name", "우리 가게")}'.
+    Reply to EACH customer review below separately.
+
+    [Sources]
+    - **Content Source:** Use each review's own 'Matched Menu Info' for the solution.
+    - **Style Source:** Follow the 'Tone & Manner' instructions below.
+
+    [Shared Context]
+    - **Owner's Tone Examples:** {context_templates}
+
+    [Critical Instructions]
+    1. **Smart Addressing (CRITICAL):**
+       - **NEVER output "OO님" literally.** Use each review's own 'Customer Name'.
+       - **Case A (Normal Name/ID):** e.g. "홍길동", "minji99" -> "홍길동님 안녕하세요 ^^".
+       - **Case B (Awkward/Long Nickname):** e.g. "매일먹는사람" -> IGNORE the name and use "고객님" or "단골님".
+
+    2. **PRIORITY 1: The Solution (From Menu Info)**
+       - IF the menu info is relevant to that review, you MUST write the tip (e.g., "전자레인지 30초").
+       - IF IRRELEVANT or "None": Do NOT mention it.
+
+    {_tone_instructions(first.get("tone", "친근한"))}
+
+    4. **Structure:** Greeting (Smart Address + Hello) -> Empathy (thanks or apology) -> Friendly closing.
+
+    5. **Output Format (STRICT):**
+       - Return ONLY a JSON object mapping every review key to its reply text.
+       - Example: {{"r1": "...", "r2": "..."}}
+    """
+
+    blocks = []
+    for i, s in enumerate(states, start=1):
+        blocks.append(
+            f"[r{i}]\n"
+            f"Customer Name: {s['customer_name']}\n"
+            f"Matched Menu Info: {_format_list(s.get('retrieved_menus'), 'None')}\n"
+            f"고객 리뷰: {s['review_text']}"
+        )
+    messages = [SystemMessage(content=system_prompt), HumanMessage(content="\n\n".join(blocks))]
+
+    metrics.observe("generate.prompt_tokens_per_review", estimate_tokens(messages) / len(states))
+    res = llm.invoke(messages, priority=priority, caller="generate_batch")
+    content = res.content.replace("```json", "").replace("```", "").strip()
+    data = json.loads(content)
+    return data if isinstance(data, dict) else {}
+
+
+def generate_batch(states, priority="batch"):
+    """
+    분석/검색이 끝난 상태 목록의 답글을 한 번에 생성합니다.
+    응답이 없거나 검증에 실패한 리뷰만 기존 generate_node로 한 건씩 다시 생성합니다.
+    반환: states와 같은 순서의 결과 dict 목록
+    """
+    def with_single(state):
+        update = generate_node(state)
+        return {**state, **update, "trace": state.get("trace", []) + update["trace"]}
+
+    if len(states) == 1:
+        return [with_single(states[0])]
+
+    started = time.perf_counter()
+    try:
+        replies = _generate_group(states, priority)
+        metrics.incr("generate.batched_calls")
+    except Exception as e:
+        print(f"[WARN] Batched generation failed, falling back to per-review calls: {e}")
+        replies = {}
+
+    results = []
+    for i, state in enumerate(states, start=1):
+        reply = replies.get(f"r{i}")
+        if _is_valid_reply(reply):
+            metrics.incr("generate.batched_reviews")
+            results.append({**state, "final_reply": reply.strip(),
+                            "trace": state.get("trace", []) + _trace("generate", started)})
+        else:
+            metrics.incr("generate.batch_fallback")
+            results.append(with_single(state))
+    return results
+
+
+def _group_states(states, group_size):
+    """톤/감정별로 묶고 카테고리 순으로 정렬해 group_size씩 나눔"""
+    groups = {}
+    for state in states:
+        groups.setdefault((state.get("tone"), state.get("sentiment")), []).append(state)
+
+    chunks = []
+    for members in groups.values():
+        members.sort(key=lambda s: s.get("category") or "")
+        chunks.extend(members[i:i + group_size] for i in range(0, len(members), group_size))
+    return chunks
+
+
 tone_map = {
     "정중한": "polite",
     "친근한": "friendly",
@@ -241,15 +581,225 @@ tone_map = {
 }
 
 
-def build_graph():
+def _find_reuse(review, tone, reuse_mode, kobert_sentiment=None):
+    """
+    승인 답글 재사용 결과 (없으면 None).
+    감정은 재사용한 이웃 리뷰의 값이 아니라 이 리뷰의 KoBERT 결과를 씁니다.
+    """
+    reused = find_reusable_reply(review, tone)
+    if reused:
+        reused["sentiment"] = kobert_sentiment or analyze_review_sentiment(review["text"])["label"]
+        reused["reuse_pending"] = reuse_mode == "confirm"
+    return reused
+
+
+def run_review(app, review, store_name, tone, user_feedback=None, reuse_mode="off", deadline=None,
+               **extra_state):
+    """
+    리뷰 카드(dict) 1건에 대해 워크플로우 실행.
+    reuse_mode가 off가 아니면 먼저 비슷한 리뷰의 승인 답글을 찾아 LLM 호출 없이 재사용합니다.
+    (다시 쓰기 요청처럼 피드백이 있으면 재사용하지 않음)
+    deadline(초, 기본 DEADLINE_SEC)을 넘기면 템플릿으로 조립한 답글을 반환합니다. (reply_source="fallback")
+    """
+    if reuse_mode != "off" and not user_feedback:
+        reused = _find_reuse(review, tone, reuse_mode, extra_state.get("kobert_sentiment"))
+        if reused:
+            return reused
+
+    metrics.incr("workflow.runs")
+    initial = _initial_state(review, store_name, tone, user_feedback, **extra_state)
+    latest = {"state": initial}
+
+    def run():
+        # 단계별 상태를 받아 두어, 시간 초과 시 그때까지의 분석/검색 결과로 대체 답글을 만듦
+        for values in app.stream(initial, stream_mode="values"):
+            latest["state"] = values
+        return latest["state"]
+
+    try:
+        # 공용 스레드 풀에서도 현재 가게(contextvar)가 유지되도록 tenancy.submit 사용
+        result = tenancy.submit(_deadline_pool, run).result(timeout=deadline or DEADLINE_SEC)
+    except FuturesTimeout:
+        return fallback_result(review, tone, latest["state"])
+
+    log_trace(result)
+    return result
+
+
+def _initial_state(review, store_name, tone, user_feedback=None, **extra_state):
+    return {
+        "review_text": review["text"],
+        "customer_name": review.get("customer_name", ""),
+        "manual_menu": review.get("menu_name", ""),
+        "store_name": store_name,
+        "tone": tone,
+        "user_feedback": user_feedback,
+        "expected_category": review.get("category"),
+        **extra_state
+    }
+
+
+def group_deadline(size, deadline=None):
+    """리뷰 size건을 한 번에 생성하는 묶음 호출에 허용하는 시간(초)"""
+    return (deadline or DEADLINE_SEC) + GROUP_DEADLINE_PER_REVIEW_SEC * max(0, size - 1)
+
+
+def _run_budgeted(pool, fn, items, budget_of):
+    """
+    items를 pool에서 fn으로 실행하고, 각 작업은 워커에서 실제로 시작한 시각부터 budget_of(item)초 안에
+    끝나야 합니다. (풀에서 차례를 기다린 시간은 예산에 들어가지 않음)
+    반환: item 순서대로 ("ok", 결과) / ("error", 예외) / ("timeout", None)
+    """
+    started = {}
+
+    def run(index, item):
+        started[index] = time.monotonic()
+        return fn(item)
+
+    # 공용 스레드 풀에서도 현재 가게(contextvar)가 유지되도록 tenancy.submit 사용
+    futures = {tenancy.submit(pool, run, i, item): i for i, item in enumerate(items)}
+    outcomes = [None] * len(items)
+    pending = set(futures)
+    while pending:
+        now = time.monotonic()
+        next_due = None
+        for future in list(pending):
+            index = futures[future]
+            if future.done() or index not in started:
+                continue
+            due = started[index] + budget_of(items[index])
+            if now >= due:
+                pending.discard(future)
+                outcomes[index] = ("timeout", None)
+            else:
+                next_due = due if next_due is None else min(next_due, due)
+        if not pending:
+            break
+
+        # 시작하지 않은 작업이 있으면 시작 시각을 받기 위해 짧게 기다림
+        timeout = _BUDGET_POLL_SEC if len(started) < len(items) else None
+        if next_due is not None:
+            timeout = min(timeout, next_due - now) if timeout is not None else next_due - now
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            error = future.exception()
+            outcomes[futures[future]] = ("error", error) if error is not None else ("ok", future.result())
+    return outcomes
+
+
+def run_reviews(prepare_app, reviews, store_name, tone, group_size=8, reuse_mode="off",
+                kobert_labels=None, priority="batch", max_workers=4, deadline=None):
+    """
+    여러 리뷰를 묶음 생성으로 처리합니다. (prepare_app: build_graph(generate=False))
+    1) 재사용 가능한 승인 답글 확인 + 분석/검색(병렬) 2) 톤/감정 그룹별 묶음 생성
+    리뷰마다 워커에서 처리를 시작한 시각부터 deadline(초, 기본 DEADLINE_SEC) 안에 1단계가 끝나야 하고,
+    묶음 생성 호출은 시작한 시각부터 group_deadline(묶음 크기) 안에 끝나야 합니다.
+    (풀에서 차례를 기다린 시간은 넣지 않음) 넘긴 리뷰/묶음만 템플릿 답글로 대체합니다.
+    반환: review id -> 결과 dict 또는 예외
+    """
+    kobert_labels = kobert_labels or {}
+    outcomes = {}
+
+    def prepare(review):
+        # 재사용 답글 검색도 리뷰별 예산 안에서 실행
+        if reuse_mode != "off":
+            reused = _find_reuse(review, tone, reuse_mode, kobert_labels.get(review["id"]))
+            if reused:
+                return "reused", reused
+        extra = {"priority": priority, "review_id": review["id"]}
+        if kobert_labels.get(review["id"]):
+            extra["kobert_sentiment"] = kobert_labels[review["id"]]
+        return "prepared", prepare_app.invoke(_initial_state(review, store_name, tone, **extra))
+
+    states = []
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(reviews))))
+    try:
+        prepared = _run_budgeted(pool, prepare, reviews, lambda review: deadline or DEADLINE_SEC)
+        todo, reused = [], 0
+        for review, (status, value) in zip(reviews, prepared):
+            if status == "timeout":
+                label = kobert_labels.get(review["id"])
+                outcomes[review["id"]] = fallback_result(review, tone, {"kobert_sentiment": label} if label else None)
+            elif status == "error":
+                outcomes[review["id"]] = value
+            elif value[0] == "reused":
+                reused += 1
+                outcomes[review["id"]] = value[1]
+            else:
+                todo.append(review)
+                states.append(value[1])
+        metrics.incr("workflow.runs", len(reviews) - reused)
+
+        reviews_by_id = {r["id"]: r for r in todo}
+        groups = _group_states(states, max(1, group_size))
+        generated = _run_budgeted(pool, lambda group: generate_batch(group, priority), groups,
+                                  lambda group: group_deadline(len(group), deadline))
+        for group, (status, value) in zip(groups, generated):
+            if status == "ok":
+                for result in value:
+                    log_trace(result)
+                    outcomes[result["review_id"]] = result
+            elif status == "timeout":
+                metrics.incr("generate.group_timeouts")
+                for state in group:
+                    outcomes[state["review_id"]] = fallback_result(reviews_by_id[state["review_id"]], tone, state)
+            else:
+                for state in group:
+                    outcomes[state["review_id"]] = value
+    finally:
+        # 시간 초과된 호출을 기다리지 않고 반환
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return outcomes
+
+
+def apply_result(review, result):
+    """워크플로우 결과를 리뷰 카드(dict)에 반영"""
+    review["reply"] = result["final_reply"]
+    review["sentiment"] = result["sentiment"]
+    review["category"] = result.get("category")
+    review["status"] = "generated"
+    review["reply_source"] = result.get("reply_source", "llm")
+    review["reuse_pending"] = result.get("reuse_pending", False)
+    review["reuse_score"] = result.get("reuse_score")
+
+    # 메뉴명이 자동 추출되었다면 업데이트
+    extracted = result.get("extracted_menu")
+    if not review.get("menu_name") and extracted and extracted != "null":
+        review["menu_name"] = extracted
+
+
+def build_graph(generate=True, speculative=False):
+    """
+    START -> [감정 분기(KoBERT -> 템플릿) | LLM 분석 | 메뉴 조회] -> join -> generate -> END
+    generate=False이면 join까지만 수행 (묶음 생성 준비용)
+    speculative=True이면 감정 분기에서 KoBERT 감정으로 답글을 미리 생성하고,
+    join에서 분석 결과와 맞으면 그대로 채택합니다. (틀리면 generate에서 다시 생성)
+    이때 LLM 분석과 메뉴 조회는 추측 생성 노드 안에서 함께 실행됩니다.
+    """
     workflow = StateGraph(GraphState)
-    workflow.add_node("analyze", analyze_node)
-    workflow.add_node("retrieve", retrieve_node)
-    workflow.add_node("generate", generate_node)
+    workflow.add_node("join", join_node)
 
-    workflow.add_edge(START, "analyze")
-    workflow.add_edge("analyze", "retrieve")
-    workflow.add_edge("retrieve", "generate")
-    workflow.add_edge("generate", END)
+    if generate and speculative:
+        workflow.add_node("speculative_branch", speculative_branch_node)
+        branches = ["speculative_branch"]
+    else:
+        workflow.add_node("llm_analyze", llm_analyze_node)
+        workflow.add_node("sentiment_branch", sentiment_branch_node)
+        workflow.add_node("menu", menu_node)
+        branches = ["sentiment_branch", "llm_analyze", "menu"]
+
+    for branch in branches:
+        workflow.add_edge(START, branch)
+    # 모든 분기가 끝나야 join 실행
+    workflow.add_edge(branches, "join")
+
+    if generate:
+        workflow.add_node("generate", generate_node)
+        workflow.add_conditional_edges("join", _after_join, ["generate", END])
+        workflow.add_edge("generate", END)
+    else:
+        workflow.add_edge("join", END)
 
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile()
@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import metrics, tenancy  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """테스트 전용 빈 가게 (stores/ 대신 tmp_path 아래에 저장). 가게 데이터 폴더 경로 반환"""
+    monkeypatch.setattr(tenancy, "STORES_DIR", tmp_path / "stores")
+    with tenancy.use_store("test-store"):
+        data_dir = tenancy.data_dir()
+        data_dir.mkdir(parents=True)
+        yield data_dir
@@ -0,0 +1,59 @@
+import json
+import pandas as pd
+from src import archive
+
+
+def _review(review_id, timestamp, text="맛있어요"):
+    return {"id": review_id, "review_text": text, "sentiment": "positive", "timestamp": timestamp}
+
+
+def test_partition_key():
+    assert archive.partition_key({"timestamp": "2026-10-19 12:00:00"}) == "2026-10"
+    assert archive.partition_key({"timestamp": None}) == archive.UNDATED_PARTITION
+    assert archive.partition_key({"timestamp": "garbage"}) == archive.UNDATED_PARTITION
+
+
+def test_upsert_writes_monthly_partitions_and_manifest(store):
+    archive.upsert_review(_review("a", "2026-09-30 23:00:00"))
+    archive.upsert_review(_review("b", "2026-10-01 09:00:00"))
+    archive.upsert_review(_review("c", "2026-10-15 18:00:00"))
+
+    partitions = archive.load_manifest()["partitions"]
+    assert set(partitions) == {"2026-09", "2026-10"}
+    assert partitions["2026-10"] == {"count": 2, "min_ts": "2026-10-01 09:00:00", "max_ts": "2026-10-15 18:00:00"}
+    assert archive.count_reviews() == 3
+
+
+def test_upsert_replaces_by_id_and_moves_between_partitions(store):
+    archive.upsert_review(_review("a", "2026-09-30 23:00:00", text="처음"))
+    old_record, old_key = archive.upsert_review(_review("a", "2026-10-02 10:00:00", text="수정"))
+
+    assert old_record["review_text"] == "처음"
+    assert old_key == "2026-09"
+    assert "2026-09" not in archive.load_manifest()["partitions"]
+    assert [r["review_text"] for r in archive.load_partition("2026-10")] == ["수정"]
+    assert archive.count_reviews() == 1
+
+
+def test_load_reviews_since_skips_old_partitions(store):
+    archive.upsert_review(_review("old", "2026-08-10 10:00:00"))
+    archive.upsert_review(_review("undated", None))
+    archive.upsert_review(_review("new", "2026-10-10 10:00:00"))
+
+    since = pd.Timestamp("2026-10-01")
+    assert archive.partitions_since(since) == ["2026-10"]
+    assert [r["id"] for r in archive.load_reviews(since)] == ["new"]
+    # 전체 조회에서는 날짜 없는 파티션이 가장 오래된 것으로 먼저 나옴
+    assert [r["id"] for r in archive.iter_reviews()] == ["undated", "old", "new"]
+
+
+def test_legacy_file_is_migrated_once(store):
+    legacy = [_review("a", "2026-09-01 10:00:00"), _review("b", "2026-10-01 10:00:00")]
+    (store / archive.LEGACY_FILE).write_text(json.dumps(legacy), encoding="utf-8")
+
+    assert archive.count_reviews() == 2
+    assert not (store / archive.LEGACY_FILE).exists()
+    assert (store / f"{archive.LEGACY_FILE}.migrated").exists()
+    # 두 번째 호출은 아무 일도 하지 않음
+    archive.ensure_migrated()
+    assert archive.count_reviews() == 2
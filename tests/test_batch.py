@@ -0,0 +1,93 @@
+import asyncio
+import sys
+import types
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src import batch
+
+
+@pytest.fixture
+def workflow(store, monkeypatch):
+    """워크플로우 대신 리뷰마다 정해진 결과를 돌려주는 가짜 모듈 (failing에 든 리뷰는 실패)"""
+    fake = types.ModuleType("src.workflow")
+    fake.failing = set()
+    fake.calls = []
+
+    def run_reviews(app, reviews, store_name, tone, **kwargs):
+        fake.calls.append([r["id"] for r in reviews])
+        return {r["id"]: RuntimeError("boom") if r["id"] in fake.failing else
+                {"final_reply": f"reply {r['id']}", "sentiment": kwargs["kobert_labels"][r["id"]]}
+                for r in reviews}
+
+    def apply_result(card, result):
+        card.update(reply=result["final_reply"], sentiment=result["sentiment"], status="generated")
+
+    fake.run_reviews = run_reviews
+    fake.apply_result = apply_result
+    fake.build_graph = lambda generate=True: object()
+    monkeypatch.setitem(sys.modules, "src.workflow", fake)
+    # KoBERT 프로세스 풀 대신 같은 프로세스의 스레드에서 라벨을 붙임
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(1))
+    monkeypatch.setattr(batch, "_kobert_labels", lambda texts: ["negative" if "별로" in t else "positive"
+                                                                 for t in texts])
+    return fake
+
+
+def _reviews(n):
+    return [{"id": f"r{i}", "text": "별로예요" if i % 2 else "맛있어요", "customer_name": "고객"} for i in range(n)]
+
+
+def _run(reviews, output_path, **kwargs):
+    return asyncio.run(batch.run_batch(reviews, output_path, "가게", "친근한", concurrency=2, kobert_workers=1,
+                                       group_size=1, **kwargs))
+
+
+def test_failed_reviews_are_retried_from_checkpoint(workflow, tmp_path):
+    output_path = tmp_path / "reviews.results.jsonl"
+    reviews = _reviews(5)
+    workflow.failing = {"r2"}
+
+    stats = _run(reviews, output_path)
+    assert (stats["done"], stats["failed"]) == (4, 1)
+    done = batch.load_checkpoint(output_path)
+    assert sorted(done) == ["r0", "r1", "r3", "r4"]
+    assert done["r1"]["sentiment"] == "negative"
+
+    # 비정상 종료로 잘린 마지막 줄은 무시
+    with open(output_path, 'a', encoding='utf-8') as f:
+        f.write('{"id": "r2", "card": {"re')
+    assert sorted(batch.load_checkpoint(output_path)) == sorted(done)
+
+    # 다시 실행하면 체크포인트에 없는 리뷰만 처리 (잘린 줄 다음 줄부터 이어서 기록)
+    workflow.failing = set()
+    workflow.calls.clear()
+    pending = [r for r in reviews if r["id"] not in batch.load_checkpoint(output_path)]
+    stats = _run(pending, output_path)
+
+    assert workflow.calls == [["r2"]]
+    assert stats["done"] == 1
+    assert sorted(batch.load_checkpoint(output_path)) == ["r0", "r1", "r2", "r3", "r4"]
+
+
+def test_call_budget_skips_reviews_without_checkpointing_them(workflow, tmp_path, monkeypatch):
+    from src import llm_gateway
+    gateway = llm_gateway.LLMGateway(rpm=600, tpm=1_000_000, max_concurrency=2, max_retries=0)
+    original = workflow.run_reviews
+
+    def run_with_calls(app, reviews, *args, **kwargs):
+        outcomes = original(app, reviews, *args, **kwargs)
+        for review in reviews:
+            try:
+                gateway.call(lambda: None, caller="generate")
+            except llm_gateway.CallBudgetExceeded as e:
+                outcomes[review["id"]] = e
+        return outcomes
+
+    monkeypatch.setattr(workflow, "run_reviews", run_with_calls)
+    output_path = tmp_path / "reviews.results.jsonl"
+    stats = _run(_reviews(5), output_path, budget={"llm_calls": 3})
+
+    assert stats["stopped"] == "llm_calls"
+    assert (stats["done"], stats["failed"], stats["skipped"]) == (3, 0, 2)
+    # 예산 때문에 건너뛴 리뷰는 다음 실행에서 이어서 처리
+    assert len(batch.load_checkpoint(output_path)) == 3
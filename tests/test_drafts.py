@@ -0,0 +1,50 @@
+import threading
+from src import data_manager
+
+
+def _card(review_id, status="draft", **fields):
+    return {"id": review_id, "customer_name": "", "menu_name": "", "text": f"리뷰 {review_id}",
+            "reply": None, "status": status, **fields}
+
+
+def test_card_edits_do_not_overwrite_worker_results(store):
+    data_manager.save_drafts([_card("a"), _card("b")])
+    # 세션이 목록을 읽어 둔 뒤 워커가 b의 답글을 저장
+    session_cards = data_manager.load_drafts()
+    data_manager.update_draft("b", {"reply": "감사합니다", "status": "generated"})
+
+    # 세션에서 a만 고치면 b의 결과는 그대로 남아야 함
+    session_cards[0]["text"] = "수정한 리뷰"
+    data_manager.update_draft("a", {"text": session_cards[0]["text"]})
+
+    drafts = {d["id"]: d for d in data_manager.load_drafts()}
+    assert drafts["a"]["text"] == "수정한 리뷰"
+    assert drafts["b"]["reply"] == "감사합니다"
+    assert drafts["b"]["status"] == "generated"
+
+
+def test_add_and_delete_drafts(store):
+    data_manager.save_drafts([_card("a")])
+    data_manager.add_draft(_card("b"))
+    data_manager.update_draft("a", {"reply": "감사합니다"})
+
+    assert [d["id"] for d in data_manager.load_drafts()] == ["b", "a"]
+    assert data_manager.delete_drafts(["b", "missing"]) == 1
+    assert data_manager.load_drafts() == [_card("a", reply="감사합니다")]
+    # 저장 완료된 카드는 이후 갱신하지 않음
+    data_manager.update_draft("a", {"status": "saved"})
+    data_manager.update_draft("a", {"reply": "다른 답글"})
+    assert data_manager.load_drafts()[0]["reply"] == "감사합니다"
+
+
+def test_iter_drafts_releases_lock_before_yielding(store):
+    data_manager.save_drafts([_card("a"), _card("b")])
+    drafts = data_manager.iter_drafts()
+    assert next(drafts)["id"] == "a"
+
+    # 순회가 끝나지 않은 상태에서도 다른 스레드가 목록을 고칠 수 있어야 함
+    writer = threading.Thread(target=data_manager.update_draft, args=("b", {"reply": "감사합니다"}))
+    writer.start()
+    writer.join(timeout=5)
+    assert not writer.is_alive()
+    assert [d["id"] for d in drafts] == ["b"]
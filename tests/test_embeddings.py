@@ -0,0 +1,74 @@
+import sys
+import types
+import pytest
+from src import embeddings
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    for name in ("EMBEDDING_BACKEND", "LOCAL_EMBEDDING_MODEL", "EMBEDDING_INT8"):
+        monkeypatch.delenv(name, raising=False)
+    return monkeypatch
+
+
+def test_collection_name_follows_embedding_model(backend):
+    google = embeddings.collection_name("templates")
+    assert embeddings.embedding_id() == f"google-{embeddings.GOOGLE_MODEL}"
+
+    backend.setenv("EMBEDDING_BACKEND", "local")
+    local = embeddings.collection_name("templates")
+    backend.setenv("EMBEDDING_INT8", "1")
+    quantized = embeddings.collection_name("templates")
+
+    # 모델/양자화가 바뀌면 다른 컬렉션에 색인 (차원과 벡터 공간이 다름)
+    assert len({google, local, quantized}) == 3
+    assert local == "templates__local-jhgan-ko-sroberta-multitask"
+    assert quantized.endswith("-int8")
+
+
+def test_local_backend_encodes_in_batches(backend):
+    encoded = []
+
+    class SentenceTransformer:
+        def __init__(self, model_name, device):
+            assert device == "cpu"
+
+        def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy):
+            import numpy as np
+            encoded.append(list(texts))
+            return np.ones((len(texts), 3), dtype=np.float32)
+
+    backend.setitem(sys.modules, "sentence_transformers",
+                    types.SimpleNamespace(SentenceTransformer=SentenceTransformer))
+    local = embeddings.LocalSentenceEmbeddings(batch_size=8)
+
+    assert local.embed_documents(["a", "b"]) == [[1.0, 1.0, 1.0]] * 2
+    assert local.embed_query("c") == [1.0, 1.0, 1.0]
+    assert encoded == [["a", "b"], ["c"]]
+    assert local.is_remote is False
+
+
+def test_local_backend_explains_missing_dependency(backend):
+    backend.setitem(sys.modules, "sentence_transformers", None)
+    with pytest.raises(RuntimeError, match="sentence-transformers"):
+        embeddings.LocalSentenceEmbeddings()
+
+
+def test_query_embeddings_are_cached():
+    class Inner:
+        is_remote = False
+        queries = 0
+
+        def embed_query(self, text):
+            self.queries += 1
+            return [float(len(text))]
+
+        def embed_documents(self, texts):
+            return [[float(len(t))] for t in texts]
+
+    inner = Inner()
+    cached = embeddings.CachedQueryEmbeddings(inner)
+    assert cached.embed_query("맛있어요") == cached.embed_query("맛있어요") == [4.0]
+    assert inner.queries == 1
+    assert cached.embed_documents(["a"]) == [[1.0]]
+    assert cached.is_remote is False
@@ -0,0 +1,83 @@
+import json
+import time
+import types
+import pytest
+
+pytest.importorskip("transformers")
+
+from src import workflow  # noqa: E402
+
+BRANCH_SEC = 0.3
+
+
+def _entry(node, start, end):
+    return {"node": node, "start": start, "end": end, "ms": round((end - start) * 1000, 1)}
+
+
+def test_critical_path_follows_latest_branch():
+    trace = [_entry("kobert", 0.0, 0.1), _entry("templates", 0.1, 0.2), _entry("llm_analyze", 0.0, 0.5),
+             _entry("menu", 0.0, 0.05), _entry("join", 0.5, 0.51)]
+    summary = workflow.critical_path(trace)
+
+    assert summary["path"] == ["llm_analyze", "join"]
+    assert summary["critical_path_ms"] == pytest.approx(510.0)
+    assert summary["serial_ms"] == pytest.approx(760.0)
+    assert workflow.critical_path([]) is None
+
+
+class SlowRag:
+    menu_targets = []
+
+    def search_templates(self, sentiment):
+        time.sleep(BRANCH_SEC / 2)
+        return [f"{sentiment} 템플릿"]
+
+    def search_style_examples(self, review_text, sentiment, tone=None, k=2):
+        return []
+
+    def search_menu(self, query, target_menu_name=None):
+        SlowRag.menu_targets.append(target_menu_name)
+        time.sleep(BRANCH_SEC)
+        return [f"메뉴: {target_menu_name}"]
+
+
+class SlowLLM:
+    def invoke(self, prompt, **kwargs):
+        time.sleep(BRANCH_SEC)
+        return types.SimpleNamespace(content=json.dumps(
+            {"category": "taste", "menu": "떡볶이", "final_sentiment": "negative"}))
+
+
+@pytest.fixture
+def branches(monkeypatch):
+    SlowRag.menu_targets = []
+
+    def kobert(text):
+        time.sleep(BRANCH_SEC / 2)
+        return {"label": "positive", "score": 0.9}
+
+    monkeypatch.setattr(workflow, "analyze_review_sentiment", kobert)
+    monkeypatch.setattr(workflow, "ReplyMateRAG", SlowRag)
+    monkeypatch.setattr(workflow, "get_llm", lambda: SlowLLM())
+
+
+def test_branches_run_concurrently_and_join_settles(branches):
+    app = workflow.build_graph(generate=False)
+    started = time.perf_counter()
+    result = app.invoke(workflow._initial_state({"text": "맛있으면 짖는데 멍멍", "customer_name": "멍멍이"},
+                                                "가게", "친근한"))
+    elapsed = time.perf_counter() - started
+
+    # KoBERT+템플릿 / LLM 분석 / 메뉴 조회가 동시에 실행됨 (차례로 실행하면 분기만 0.9초 + join 0.45초)
+    by_node = {e["node"]: e for e in result["trace"]}
+    assert by_node["llm_analyze"]["start"] < by_node["kobert"]["end"]
+    assert by_node["menu"]["start"] < by_node["kobert"]["end"]
+    assert elapsed < BRANCH_SEC * 4
+    # LLM 판단이 KoBERT를 이기고, 바뀐 감정으로 템플릿을 다시 검색
+    assert result["sentiment"] == "negative"
+    assert result["retrieved_templates"] == ["negative 템플릿"]
+    # 선택한 메뉴가 없으면 추출한 메뉴명으로 다시 조회
+    assert SlowRag.menu_targets == ["", "떡볶이"]
+    assert result["retrieved_menus"] == ["메뉴: 떡볶이"]
+    assert set(by_node) == {"kobert", "templates", "llm_analyze", "menu", "join"}
+    assert workflow.critical_path(result["trace"])["path"][-1] == "join"
@@ -0,0 +1,58 @@
+import threading
+import time
+import pytest
+from src import indexer, metrics
+
+
+class FakeRag:
+    builds = []
+    release = threading.Event()
+
+    def init_db(self, on_progress=None):
+        FakeRag.builds.append(threading.current_thread().name)
+        if on_progress:
+            on_progress(1, 1)
+        assert FakeRag.release.wait(5)
+        return True
+
+    def active_version(self):
+        return f"v{len(FakeRag.builds)}"
+
+
+@pytest.fixture
+def maintainer(store, monkeypatch):
+    FakeRag.builds = []
+    FakeRag.release = threading.Event()
+    FakeRag.release.set()
+    monkeypatch.setattr(indexer, "ReplyMateRAG", FakeRag)
+    monkeypatch.setattr(indexer, "DEBOUNCE_SEC", 0.1)
+    monkeypatch.setattr(indexer, "MAX_DELAY_SEC", 2.0)
+    return indexer.IndexMaintainer("test-store")
+
+
+def test_burst_of_notifications_runs_one_rebuild(maintainer):
+    tickets = [maintainer.notify(f"save {i}") for i in range(10)]
+
+    outcome = maintainer.wait(tickets[-1], timeout=5)
+    assert outcome == {"complete": True, "error": None, "version": "v1"}
+    # 앞선 알림도 같은 재구축으로 반영됨
+    assert maintainer.wait(tickets[0], timeout=0) == outcome
+    assert FakeRag.builds == ["replymate-indexer-test-store"]
+    counters = metrics.snapshot()["counters"]
+    assert counters["indexer.requests"] == 10
+    assert counters["indexer.rebuilds"] == 1
+
+
+def test_notification_during_rebuild_triggers_one_more(maintainer):
+    FakeRag.release.clear()
+    first = maintainer.notify()
+    while not FakeRag.builds:
+        time.sleep(0.01)
+
+    # 재구축 중에 들어온 알림은 끝난 뒤 한 번 더 (합쳐서) 반영
+    later = [maintainer.notify() for _ in range(3)]
+    FakeRag.release.set()
+    assert maintainer.wait(first, timeout=5)["version"] == "v1"
+    assert maintainer.wait(later[-1], timeout=5)["version"] == "v2"
+    assert len(FakeRag.builds) == 2
+    assert maintainer.status()["pending"] == 0
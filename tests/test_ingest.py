@@ -0,0 +1,62 @@
+import io
+import json
+from src import archive, data_manager, ingest
+
+
+def test_normalize_row_maps_platform_columns():
+    review = ingest.normalize_row({"닉네임": "김고객", "주문 메뉴": "떡볶이", "리뷰 내용": " 맛있어요 ",
+                                   "별점": "★★★★☆", "작성일": "2026-10-01"})
+    assert review["customer_name"] == "김고객"
+    assert review["menu_name"] == "떡볶이"
+    assert review["text"] == "맛있어요"
+    assert review["rating"] == 4.0
+    assert review["created_at"] == "2026-10-01"
+    assert review["status"] == "draft"
+    # ID가 없으면 내용 기반 고정 ID
+    assert ingest.normalize_row({"review": "맛있어요", "nickname": "김고객", "menu": "떡볶이"})["id"] == \
+        ingest.normalize_row({"review": "맛있어요", "nickname": "김고객", "menu": "떡볶이"})["id"]
+    assert ingest.normalize_row({"Review_ID": 12.0, "Rating": "4.5", "text": "굿"})["id"] == "12"
+    assert ingest.normalize_row({"rating": 5, "text": "  "}) is None
+
+
+def test_content_hash_ignores_spacing_and_unicode_forms():
+    assert ingest.content_hash("김고객", "떡볶이", "정말  맛있어요\n") == \
+        ingest.content_hash(" 김고객", "떡볶이", "정말 맛있어요")
+    assert ingest.content_hash(None, "ＡＢ", "맛") == ingest.content_hash("", "AB", "맛")
+    assert ingest.content_hash("김고객", "떡볶이", "맛있어요") != ingest.content_hash("김고객", "떡볶이", "별로예요")
+
+
+def test_iter_json_array_reads_across_chunks(monkeypatch):
+    monkeypatch.setattr(ingest, "JSON_READ_CHUNK", 7)
+    items = [{"text": f"리뷰 {i}", "tags": [i, "a,]b"]} for i in range(20)]
+    stream = io.StringIO(json.dumps(items, ensure_ascii=False, indent=1))
+    assert list(ingest.iter_json_array(stream)) == items
+    assert list(ingest.iter_json_array(io.StringIO(" [ ] "))) == []
+
+
+def test_iter_rows_detects_cp949_csv():
+    raw = io.BytesIO("닉네임,리뷰\n김고객,맛있어요\n".encode("cp949"))
+    assert list(ingest.iter_reviews(raw, "export.csv"))[0]["text"] == "맛있어요"
+
+
+def test_import_skips_existing_and_repeated_reviews(store):
+    data_manager.save_drafts([{"id": "d1", "customer_name": "김고객", "menu_name": "떡볶이",
+                               "text": "맛있어요", "reply": None, "status": "draft"}])
+    archive.upsert_review({"id": "s1", "customer_name": "박고객", "menu_name": "튀김",
+                           "review_text": "바삭해요", "timestamp": "2026-10-01 10:00:00"})
+    rows = [
+        {"nickname": "김고객", "menu": "떡볶이", "review": "맛있어요 "},   # 작성 중 목록에 있음
+        {"nickname": "박고객", "menu": "튀김", "review": "바삭해요"},      # 완료 기록에 있음
+        {"nickname": "최고객", "menu": "순대", "review": "또 올게요"},
+        {"nickname": "최고객", "menu": "순대", "review": "또  올게요"},     # 파일 안에서 중복
+        {"nickname": "이고객", "menu": "순대"},                              # 리뷰 내용 없음
+    ]
+    payload = "\n".join(json.dumps(r, ensure_ascii=False) for r in rows).encode("utf-8")
+
+    stats = ingest.import_reviews(io.BytesIO(payload), "export.jsonl")
+
+    assert stats == {"rows": 5, "imported": 1, "duplicates": 3, "skipped": 1}
+    drafts = data_manager.load_drafts()
+    assert [d["text"] for d in drafts] == ["또 올게요", "맛있어요"]
+    # 다시 가져오면 모두 중복
+    assert ingest.import_reviews(io.BytesIO(payload), "export.jsonl")["imported"] == 0
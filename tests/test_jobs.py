@@ -0,0 +1,146 @@
+import sys
+import time
+import types
+import pytest
+from src import jobs, scheduler
+
+
+@pytest.fixture
+def workflow(monkeypatch):
+    """워크플로우 대신 리뷰마다 정해진 결과를 돌려주는 가짜 모듈 (fail_apply에 든 리뷰는 반영 중 예외)"""
+    fake = types.ModuleType("src.workflow")
+    fake.fail_apply = set()
+    fake.calls = []
+
+    def run_reviews(app, reviews, store_name, tone, **kwargs):
+        fake.calls.append([r["id"] for r in reviews])
+        return {r["id"]: {"final_reply": f"reply {r['id']}", "sentiment": "positive"} for r in reviews}
+
+    def apply_result(card, result):
+        if card["id"] in fake.fail_apply:
+            raise RuntimeError("cannot apply")
+        card.update(reply=result["final_reply"], sentiment=result["sentiment"], status="generated")
+
+    fake.run_reviews = run_reviews
+    fake.apply_result = apply_result
+    fake.build_graph = lambda generate=True: object()
+    monkeypatch.setitem(sys.modules, "src.workflow", fake)
+    monkeypatch.setattr(scheduler, "sentiment_prepass", lambda reviews: {})
+    return fake
+
+
+@pytest.fixture
+def queue(store, tmp_path, monkeypatch, workflow):
+    monkeypatch.setattr(jobs, "JOBS_DIR", tmp_path / "jobs")
+    # 워커가 한 번에 두 건씩 꺼내도록 (GROUP_SIZE * 2)
+    monkeypatch.setattr(jobs, "GROUP_SIZE", 1)
+    return jobs.JobQueue(max_workers=1)
+
+
+def _reviews(n, prefix="r"):
+    return [{"id": f"{prefix}{i}", "text": f"리뷰 {i}", "customer_name": "고객"} for i in range(n)]
+
+
+def _wait(queue, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.get(job_id)
+        if status["status"] == jobs.DONE:
+            return status
+        time.sleep(0.02)
+    pytest.fail(f"job did not finish: {queue.get(job_id)}")
+
+
+def test_job_runs_all_reviews(queue):
+    status = _wait(queue, queue.submit(_reviews(3), "가게", "친근한"))
+
+    assert status["counts"][jobs.DONE] == 3
+    assert status["results"]["r0"]["reply"] == "reply r0"
+
+
+def test_failure_after_generation_does_not_kill_worker(queue, workflow):
+    workflow.fail_apply = {"r1"}
+    status = _wait(queue, queue.submit(_reviews(3), "가게", "친근한"))
+
+    assert status["counts"][jobs.DONE] == 2
+    assert status["counts"][jobs.FAILED] == 1
+    assert "cannot apply" in status["errors"]["r1"]
+
+    # 같은 워커가 다음 작업도 처리해야 함
+    status = _wait(queue, queue.submit(_reviews(2, prefix="s"), "가게", "친근한"))
+    assert status["counts"][jobs.DONE] == 2
+
+
+def test_unexpected_error_marks_running_items_failed(queue, monkeypatch):
+    def broken(job, reviews, review_ids):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(queue, "_run_items", broken)
+    status = _wait(queue, queue.submit(_reviews(2), "가게", "친근한"))
+
+    assert status["counts"][jobs.FAILED] == 2
+    assert status["errors"]["r0"] == "boom"
+    assert all(t.is_alive() for t in queue._workers)
+
+
+def test_pinned_and_low_rated_reviews_run_first(queue, workflow):
+    reviews = _reviews(4)
+    reviews[2]["pinned"] = True
+    reviews[3]["rating"] = 1
+    _wait(queue, queue.submit(reviews, "가게", "친근한"))
+
+    assert workflow.calls[0] == ["r2", "r3"]
+
+
+def test_call_budget_stops_job_and_skips_rest(queue, monkeypatch):
+    # 묶음 1개마다 LLM 호출 1회로 집계되도록 미터를 채움
+    from src import llm_gateway
+    original = sys.modules["src.workflow"].run_reviews
+
+    def run_with_calls(*args, **kwargs):
+        llm_gateway._meter.get().charge(1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(sys.modules["src.workflow"], "run_reviews", run_with_calls)
+    status = _wait(queue, queue.submit(_reviews(6), "가게", "친근한", budget={"llm_calls": 2}))
+
+    assert status["stopped"] == "llm_calls"
+    assert status["counts"][jobs.DONE] == 4
+    assert status["counts"][jobs.SKIPPED] == 2
+
+
+def test_call_budget_is_enforced_within_a_slice(queue, monkeypatch):
+    # 리뷰마다 게이트웨이를 거쳐 호출 1회 (한 번에 두 건씩 처리)
+    from src import llm_gateway
+    gateway = llm_gateway.LLMGateway(rpm=600, tpm=1_000_000, max_concurrency=2, max_retries=0)
+    original = sys.modules["src.workflow"].run_reviews
+
+    def run_with_calls(app, reviews, *args, **kwargs):
+        outcomes = original(app, reviews, *args, **kwargs)
+        for review in reviews:
+            try:
+                gateway.call(lambda: None, caller="generate")
+            except llm_gateway.CallBudgetExceeded as e:
+                outcomes[review["id"]] = e
+        return outcomes
+
+    monkeypatch.setattr(sys.modules["src.workflow"], "run_reviews", run_with_calls)
+    job_id = queue.submit(_reviews(6), "가게", "친근한", budget={"llm_calls": 3})
+    status = _wait(queue, job_id)
+
+    # 두 번째 묶음의 두 번째 호출에서 멈춤 (묶음 단위로 확인하면 4건까지 넘침)
+    assert status["stopped"] == "llm_calls"
+    assert status["counts"][jobs.DONE] == 3
+    assert status["counts"][jobs.SKIPPED] == 3
+    assert queue._jobs[job_id]["llm_calls"] == 3
+
+
+def test_time_budget_starts_at_first_dispatch(queue):
+    # 워커가 꺼내기 전에 한 시간 동안 대기열에 있었던 것처럼 만듦
+    with queue._cond:
+        job_id = queue.submit(_reviews(4), "가게", "친근한", budget={"seconds": 60})
+        queue._jobs[job_id]["created_at"] -= 3600
+    status = _wait(queue, job_id)
+
+    assert status["stopped"] is None
+    assert status["counts"][jobs.DONE] == 4
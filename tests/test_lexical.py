@@ -0,0 +1,48 @@
+from src import lexical
+from src.lexical import LexicalIndex
+
+MENUS = [
+    ("메뉴명: 눈꽃치즈 떡볶이 / 특징: 모짜렐라 치즈", {"type": "menu", "name": "눈꽃치즈 떡볶이"}),
+    ("메뉴명: 바삭 왕새우튀김(3개) / 특징: 에어프라이어 3분", {"type": "menu", "name": "바삭 왕새우튀김(3개)"}),
+    ("메뉴명: 로제 떡볶이 / 특징: 크림 소스", {"type": "menu", "name": "로제 떡볶이"}),
+    ("감사합니다! 또 찾아주세요", {"sentiment": "positive", "tone": "friendly"}),
+]
+
+
+def _index():
+    return LexicalIndex([doc for doc, _ in MENUS], [meta for _, meta in MENUS])
+
+
+def test_ngrams_normalize_text():
+    assert lexical.ngrams("치즈 떡!") == ["치즈", "즈떡", "치즈떡"]
+    assert lexical.ngrams("Ａ") == ["a"]
+    assert lexical.menu_key("바삭 왕새우튀김(3개)") == "바삭 왕새우튀김"
+
+
+def test_bm25_ranks_matching_document_first():
+    results = _index().search("왕새우튀김이 눅눅했어요", k=2)
+    assert results[0][0] == 1
+    assert all(score > 0 for _, score in results)
+    assert _index().search("zzz") == []
+
+
+def test_search_applies_where_filter():
+    where = {"$and": [{"type": {"$eq": "menu"}}, {"name": {"$ne": "눈꽃치즈 떡볶이"}}]}
+    ids = [i for i, _ in _index().search("떡볶이", k=5, where=where)]
+    assert ids == [2]
+    assert _index().candidates({"sentiment": "positive"}) == [3]
+    assert lexical.matches({"tone": "witty"}, {"tone": {"$in": ["witty", "polite"]}})
+
+
+def test_confident_menus_requires_unambiguous_name():
+    index = _index()
+    assert index.confident_menus("바삭 왕새우튀김 최고") == [MENUS[1][0]]
+    # 두 떡볶이 메뉴 모두 일부만 일치하면 확정하지 않음
+    assert index.confident_menus("떡볶이 맛있어요") == []
+
+
+def test_reciprocal_rank_fusion():
+    fused = lexical.reciprocal_rank_fusion(["a", "b", "c"], ["b", "c", "d"])
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "d"}
+    assert lexical.reciprocal_rank_fusion(["a", "b"], ["b"], k=1) == ["b"]
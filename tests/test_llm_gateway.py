@@ -0,0 +1,205 @@
+import pytest
+from src import llm_gateway, metrics, tenancy
+from src.llm_gateway import CircuitOpenError, LLMGateway, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(llm_gateway.time, "monotonic", fake)
+    return fake
+
+
+def _gateway(**kwargs):
+    options = dict(rpm=600, tpm=1_000_000, max_concurrency=2, max_retries=2, base_delay=0.001, max_delay=0.002)
+    options.update(kwargs)
+    return LLMGateway(**options)
+
+
+def test_token_bucket_refills_per_second(clock):
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60) == 0
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+
+    clock.now += 30
+    assert bucket.wait_time(30) == 0
+    assert bucket.wait_time(31) == pytest.approx(1.0)
+    # 용량보다 큰 요청은 용량만큼만 기다림
+    clock.now += 3600
+    assert bucket.tokens <= bucket.capacity
+    assert bucket.wait_time(1000) == 0
+
+
+def test_estimate_tokens_counts_messages():
+    class Message:
+        content = "가" * 100
+
+    assert llm_gateway.estimate_tokens("가" * 100) == 50 + llm_gateway.OUTPUT_TOKEN_ALLOWANCE
+    assert llm_gateway.estimate_tokens([Message(), Message()]) > llm_gateway.estimate_tokens([Message()])
+
+
+def test_retries_retryable_errors_and_meters_every_attempt():
+    gateway = _gateway()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("429 ResourceExhausted")
+        return "ok"
+
+    with llm_gateway.metered() as meter:
+        assert gateway.call(flaky, tokens=10) == "ok"
+    assert meter.calls == 3
+    assert meter.tokens == 30
+    assert metrics.snapshot()["counters"]["llm.retries"] == 2
+
+
+def test_call_budget_is_charged_per_call():
+    gateway = _gateway()
+    sent = []
+    meter = llm_gateway.CallMeter(limit=3, calls=1)
+
+    with llm_gateway.metered(meter):
+        gateway.call(lambda: sent.append(1))
+        gateway.call(lambda: sent.append(1))
+        # 예산을 다 쓴 뒤의 호출은 보내지 않고 거절 (재시도하지 않음)
+        with pytest.raises(llm_gateway.CallBudgetExceeded):
+            gateway.call(lambda: sent.append(1))
+    assert len(sent) == 2
+    assert meter.calls == 3
+    assert metrics.snapshot()["counters"]["llm.budget_rejected"] == 1
+    # 예산이 없는 흐름은 그대로 호출
+    assert gateway.call(lambda: "ok") == "ok"
+
+
+def test_non_retryable_error_is_raised_immediately():
+    gateway = _gateway()
+    attempts = []
+
+    def bad_request():
+        attempts.append(1)
+        raise ValueError("invalid argument")
+
+    with pytest.raises(ValueError):
+        gateway.call(bad_request)
+    assert len(attempts) == 1
+
+
+def test_circuit_opens_after_consecutive_failures():
+    gateway = _gateway(max_retries=0, breaker_threshold=2, breaker_cooldown=60)
+
+    def unavailable():
+        raise RuntimeError("503 unavailable")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            gateway.call(unavailable)
+    with pytest.raises(CircuitOpenError):
+        gateway.call(lambda: "ok")
+
+
+def test_store_quota_is_per_store(monkeypatch, tmp_path, clock):
+    monkeypatch.setattr(tenancy, "STORES_DIR", tmp_path / "stores")
+    gateway = _gateway(store_rpm=2)
+    waited = []
+
+    def fake_wait(timeout=None):
+        # 기다리는 대신 가짜 시계를 앞으로 돌림
+        waited.append(timeout)
+        clock.now += timeout
+
+    monkeypatch.setattr(gateway._cond, "wait", fake_wait)
+
+    with tenancy.use_store("store-a"):
+        gateway.call(lambda: "ok")
+        gateway.call(lambda: "ok")
+    # store-a는 한도를 다 썼지만 store-b는 바로 호출됨
+    with tenancy.use_store("store-b"):
+        gateway.call(lambda: "ok")
+    assert waited == []
+
+    with tenancy.use_store("store-a"):
+        gateway.call(lambda: "ok")
+    assert sum(waited) == pytest.approx(30.0)
+    assert metrics.snapshot()["counters"]["llm.store_throttled"] == 1
+
+
+def test_half_open_allows_a_single_trial_call(clock):
+    gateway = _gateway(max_retries=0, breaker_threshold=2, breaker_cooldown=60)
+
+    def unavailable():
+        raise RuntimeError("503 unavailable")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            gateway.call(unavailable)
+
+    # 쿨다운이 지나면 시험 호출 1건만 통과하고, 그동안 다른 호출은 거절
+    clock.now += 61
+    rejected = []
+
+    def trial():
+        with pytest.raises(CircuitOpenError):
+            gateway.call(lambda: "other")
+        rejected.append(1)
+        raise RuntimeError("503 unavailable")
+
+    with pytest.raises(RuntimeError):
+        gateway.call(trial)
+    assert rejected == [1]
+    # 시험 호출이 실패하면 다시 차단
+    with pytest.raises(CircuitOpenError, match="remaining"):
+        gateway.call(lambda: "ok")
+
+    # 다음 시험 호출이 성공하면 닫힘
+    clock.now += 61
+    assert gateway.call(lambda: "ok") == "ok"
+    assert gateway.call(lambda: "ok") == "ok"
+
+
+def test_remote_embeddings_go_through_gateway():
+    from src.embeddings import GatedEmbeddings
+
+    class Remote:
+        def embed_query(self, text):
+            return [1.0]
+
+        def embed_documents(self, texts):
+            return [[1.0] for _ in texts]
+
+    embeddings = GatedEmbeddings(Remote(), gateway=_gateway())
+    with llm_gateway.metered() as meter:
+        embeddings.embed_query("맛있어요")
+        embeddings.embed_documents(["a", "b"])
+    assert meter.calls == 2
+    counters = metrics.snapshot()["counters"]
+    assert counters["llm.calls.embed_query"] == 1
+    assert counters["llm.calls.embed"] == 1
+
+
+def test_spare_capacity_requires_idle_slot_and_quota(clock):
+    gateway = _gateway(rpm=2, max_concurrency=1, breaker_threshold=1, breaker_cooldown=60)
+    assert gateway.has_spare_capacity()
+
+    gateway._acquire(1, "batch")
+    assert not gateway.has_spare_capacity()
+    gateway._release()
+    assert gateway.has_spare_capacity()
+
+    # 분당 요청 한도를 다 쓰면 여유 없음
+    gateway.call(lambda: "ok")
+    assert not gateway.has_spare_capacity()
+    clock.now += 60
+    with pytest.raises(RuntimeError):
+        gateway.call(lambda: (_ for _ in ()).throw(RuntimeError("503 unavailable")))
+    assert not gateway.has_spare_capacity()
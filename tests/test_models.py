@@ -0,0 +1,57 @@
+import json
+import re
+import threading
+import types
+import pytest
+
+pytest.importorskip("transformers")
+
+from src import models  # noqa: E402
+
+
+class FakeLLM:
+    """번호 붙은 답글마다 분류 결과를 돌려줌 ("retry"로 시작하는 답글은 처음 한 번 잘못된 값)"""
+
+    def __init__(self, always_bad=()):
+        self.always_bad = set(always_bad)
+        self.seen = {}
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt, **kwargs):
+        replies = re.findall(r'^\s*(\d+)\. "(.*)"$', prompt, flags=re.M)
+        with self._lock:
+            self.prompts.append([text for _, text in replies])
+            data = {}
+            for number, text in replies:
+                self.seen[text] = self.seen.get(text, 0) + 1
+                bad = text in self.always_bad or (text.startswith("retry") and self.seen[text] == 1)
+                data[number] = {"sentiment": "positive", "category": "unknown" if bad else "service"}
+        return types.SimpleNamespace(content=json.dumps(data))
+
+
+def test_only_invalid_rows_are_retried(monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(models, "get_llm", lambda: llm)
+    replies = ["ok 1", "retry 2", "ok 3", "", "retry 5"]
+
+    results = models.auto_classify_replies(replies, chunk_size=2, max_workers=2)
+
+    assert [r["category"] for r in results] == ["service", "service", "service",
+                                                models.DEFAULT_REPLY_META["category"], "service"]
+    # 빈 답글은 보내지 않고, 두 번째 요청에는 잘못 분류된 두 행만 들어감
+    assert sorted(llm.prompts[-1]) == ["retry 2", "retry 5"]
+    assert sum(len(p) for p in llm.prompts) == 4 + 2
+    assert llm.seen["ok 1"] == 1
+
+
+def test_rows_that_keep_failing_use_defaults(monkeypatch):
+    llm = FakeLLM(always_bad={"bad"})
+    monkeypatch.setattr(models, "get_llm", lambda: llm)
+    progress = []
+
+    results = models.auto_classify_replies(["bad", "ok"], max_attempts=3, on_progress=lambda d, t: progress.append(d))
+
+    assert results == [models.DEFAULT_REPLY_META, {"sentiment": "positive", "category": "service"}]
+    assert llm.seen["bad"] == 3
+    assert progress[-1] == 2
@@ -0,0 +1,128 @@
+import json
+import zlib
+import pytest
+from src import rag, vector_store
+
+
+class FakeEmbeddings:
+    """글자 해시로 만든 고정 벡터 (로컬 모델처럼 한 스레드에서 처리)"""
+    is_remote = False
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        return [1.0 + zlib.crc32(f"{text}|{i}".encode()) % 97 for i in range(8)]
+
+
+@pytest.fixture
+def kb(store, monkeypatch):
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(rag, "VECTOR_STORE", "numpy")
+    monkeypatch.setattr(rag, "get_embeddings", lambda: embeddings)
+    gets = []
+    original_get = vector_store.NumpyVectorStore.get
+
+    def counting_get(self, *args, **kwargs):
+        gets.append(kwargs.get("ids"))
+        return original_get(self, *args, **kwargs)
+
+    monkeypatch.setattr(vector_store.NumpyVectorStore, "get", counting_get)
+    yield embeddings, gets
+    vector_store.evict_root(rag.tenancy.path("vector_db"))
+
+
+def _write_data(store, n_menus):
+    templates = [{"content": "감사합니다!", "metadata": {"sentiment": "positive", "tone": "friendly"}}]
+    menus = [{"menu_name": f"메뉴 {i}", "description": f"설명 {i}"} for i in range(n_menus)]
+    (store / "templates.json").write_text(json.dumps(templates, ensure_ascii=False), encoding="utf-8")
+    (store / "menu_info.json").write_text(json.dumps(menus, ensure_ascii=False), encoding="utf-8")
+
+
+def test_init_db_lists_existing_ids_once(store, kb):
+    embeddings, gets = kb
+    _write_data(store, 300)
+
+    assert rag.ReplyMateRAG().init_db()
+    # 문서 수와 관계없이 새 버전의 기존 ID 목록은 한 번만 읽고, 복사할 임베딩은 묶음 단위로 조회
+    assert gets.count(None) == 1
+    assert all(len(ids) <= rag.COPY_BATCH for ids in gets if ids is not None)
+    assert len(gets) <= 2
+    assert embeddings.embedded == 301
+
+
+def test_rebuild_copies_unchanged_documents(store, kb):
+    embeddings, gets = kb
+    _write_data(store, 5)
+    first = rag.ReplyMateRAG()
+    assert first.init_db()
+    first_version = first.active_version()
+
+    _write_data(store, 6)
+    second = rag.ReplyMateRAG()
+    assert second.init_db()
+
+    assert second.active_version() != first_version
+    # 기존 6개 문서는 활성 버전에서 복사하고 새 메뉴 하나만 임베딩
+    assert embeddings.embedded == 6 + 1
+    assert second._collection().count() == 7
+    # 같은 내용으로 다시 실행하면 아무 작업도 하지 않음
+    assert rag.ReplyMateRAG().init_db()
+    assert embeddings.embedded == 7
+
+
+def test_failed_chunk_resumes_on_next_rebuild(store, kb, monkeypatch):
+    embeddings, _ = kb
+    monkeypatch.setattr(rag, "EMBED_CHUNK_DOCS", 10)
+    original = embeddings.embed_documents
+    calls = []
+
+    def flaky(texts):
+        calls.append(len(texts))
+        if len(calls) == 2:
+            raise RuntimeError("503 unavailable")
+        return original(texts)
+
+    monkeypatch.setattr(embeddings, "embed_documents", flaky)
+    _write_data(store, 25)
+
+    first = rag.ReplyMateRAG()
+    progress = []
+    assert not first.init_db(on_progress=lambda done, total: progress.append((done, total)))
+    # 실패한 청크가 있으면 새 버전으로 바꾸지 않음
+    assert first.active_version() is None
+    assert progress[-1] == (26, 26)
+    assert embeddings.embedded == 16
+
+    # 다시 실행하면 만들던 버전에서 실패한 청크만 임베딩하고 활성화
+    second = rag.ReplyMateRAG()
+    assert second.init_db()
+    assert calls[3:] == [10]
+    assert embeddings.embedded == 26
+    assert second.active_version() is not None
+    assert second._collection().count() == 26
+
+
+def test_evicting_store_releases_chroma_system(store, monkeypatch):
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(rag, "VECTOR_STORE", "chroma")
+    monkeypatch.setattr(rag, "get_embeddings", lambda: embeddings)
+    _write_data(store, 3)
+    assert rag.ReplyMateRAG().init_db()
+
+    persist_dir = rag.ReplyMateRAG().persist_dir
+    assert persist_dir in SharedSystemClient._identifier_to_system
+
+    rag._evict_store("test-store")
+    assert persist_dir not in SharedSystemClient._identifier_to_system
+    # 다시 쓰면 디스크에서 새로 열림
+    reopened = rag.ReplyMateRAG()
+    reopened.load_db()
+    assert reopened._collection().count() == 4
+    rag._evict_store("test-store")
@@ -0,0 +1,154 @@
+import threading
+import zlib
+import pytest
+from langchain_core.documents import Document
+from src import archive, rag, reuse
+
+
+class FakeRag:
+    def __init__(self, score, **meta):
+        self.score = score
+        self.meta = {"reply": "김고객님, 떡볶이 맛있게 드셔주셔서 감사합니다!", "customer_name": "김고객",
+                     "menu": "떡볶이", "sentiment": "negative", "category": "delivery_delay", **meta}
+
+    def search_approved_reply(self, review_text, tone=None):
+        return Document(page_content="이웃 리뷰", metadata=self.meta), self.score
+
+
+@pytest.fixture
+def fake_rag(monkeypatch):
+    def use(score, **meta):
+        monkeypatch.setattr(reuse, "_get_rag", lambda: FakeRag(score, **meta))
+
+    class Idle:
+        def ensure_synced(self):
+            pass
+
+    monkeypatch.setattr(reuse, "get_reuse_indexer", lambda store_id=None: Idle())
+    return use
+
+
+def test_below_threshold_is_not_reused(fake_rag):
+    fake_rag(reuse.REUSE_THRESHOLD - 0.01)
+    assert reuse.find_reusable_reply({"text": "맛있어요"}, "친근한") is None
+    assert reuse.hit_rate() == 0
+
+
+def test_reused_reply_swaps_names_and_menu(fake_rag):
+    fake_rag(reuse.REUSE_THRESHOLD)
+    result = reuse.find_reusable_reply({"text": "맛있어요", "customer_name": "박고객", "menu_name": "순대",
+                                        "sentiment": "positive"}, "친근한")
+
+    assert result["final_reply"] == "박고객님, 순대 맛있게 드셔주셔서 감사합니다!"
+    assert result["reply_source"] == "reuse"
+    # 감정/카테고리/메뉴는 이웃 리뷰가 아니라 이 리뷰의 값
+    assert result["sentiment"] == "positive"
+    assert result["category"] is None
+    assert result["extracted_menu"] == "null"
+
+
+def test_review_without_menu_does_not_take_neighbour_menu(fake_rag):
+    fake_rag(0.99)
+    result = reuse.find_reusable_reply({"text": "맛있어요", "customer_name": "박고객"}, "친근한")
+
+    assert result["extracted_menu"] == "null"
+    assert result["sentiment"] == "unknown"
+
+
+class FakeEmbeddings:
+    is_remote = False
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append((threading.current_thread().name, len(texts)))
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        return [1.0 + zlib.crc32(f"{text}|{i}".encode()) % 97 for i in range(8)]
+
+
+@pytest.fixture
+def approved(store, monkeypatch):
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(rag, "get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(reuse, "_rags", {})
+    monkeypatch.setattr(reuse, "_indexers", {})
+    return embeddings
+
+
+def _saved(review_id):
+    return {"id": review_id, "customer_name": "고객", "menu_name": "떡볶이", "review_text": f"리뷰 {review_id}",
+            "reply_text": "감사합니다", "tone": "친근한", "sentiment": "positive",
+            "timestamp": "2026-10-01 10:00:00"}
+
+
+def test_backfill_and_indexing_run_in_background_batches(approved, monkeypatch):
+    for i in range(5):
+        archive.upsert_review(_saved(f"r{i}"))
+    archive.upsert_review({**_saved("no-reply"), "reply_text": ""})
+
+    indexer = reuse.get_reuse_indexer()
+    assert indexer.wait_idle(timeout=30)
+    assert reuse._get_rag().count_approved_replies() == 5
+    # 기존 기록은 한 번의 묶음 요청으로 채움
+    assert [n for _, n in approved.calls] == [5]
+
+    reuse.index_approved_reply(_saved("r5"))
+    assert indexer.wait_idle(timeout=30)
+    assert reuse._get_rag().count_approved_replies() == 6
+    # 저장한 스레드가 아니라 색인 워커가 임베딩
+    assert all(name.startswith("replymate-reuse-") for name, _ in approved.calls)
+
+    # 임베딩 모델이 바뀌면 새 컬렉션을 기존 기록으로 다시 채움 (저장 기록에 없는 r5는 제외)
+    monkeypatch.setenv("EMBEDDING_BACKEND", "local")
+    reuse.get_reuse_indexer().ensure_synced()
+    assert indexer.wait_idle(timeout=30)
+    assert reuse._get_rag().approved_collection_name.endswith("ko-sroberta-multitask")
+    assert reuse._get_rag().count_approved_replies() == 5
+
+
+def test_backfill_skips_reviews_already_indexed(approved):
+    for i in range(3):
+        archive.upsert_review(_saved(f"r{i}"))
+    reuse._get_rag().add_approved_replies([_saved("r0"), _saved("r1")])
+    approved.calls.clear()
+
+    assert reuse.get_reuse_indexer().wait_idle(timeout=30)
+    assert [n for _, n in approved.calls] == [1]
+    assert reuse._get_rag().count_approved_replies() == 3
+
+
+def _approved_reply(i, sentiment, reply=None):
+    return {**_saved(f"s{i}"), "sentiment": sentiment, "category": "taste",
+            "reply_text": reply or f"{sentiment} 답글 {i}", "timestamp": f"2026-10-01 10:{i:02d}:00"}
+
+
+def test_style_index_keeps_latest_examples_of_each_kind(approved, monkeypatch):
+    monkeypatch.setattr(rag, "_style_checked", set())
+    index = rag.ReplyMateRAG()
+    index.add_approved_replies([_approved_reply(i, "positive") for i in range(6)]
+                               + [_approved_reply(10 + i, "negative") for i in range(2)]
+                               + [_approved_reply(20, "positive", reply="positive 답글 5")])
+
+    index.prune_style_examples(max_examples=4)
+    kept = index._get_style_store()._collection.get()
+    # 같은 답글은 최신 것만, 묶음(감정/카테고리/톤)을 번갈아 최신 순으로 남김
+    assert sorted(kept["ids"]) == ["s10", "s11", "s20", "s4"]
+    assert sorted(kept["documents"]) == ["negative 답글 10", "negative 답글 11", "positive 답글 4", "positive 답글 5"]
+    # 재사용 인덱스는 그대로
+    assert index.count_approved_replies() == 9
+
+
+def test_style_index_is_pruned_when_it_grows_past_the_limit(approved, monkeypatch):
+    monkeypatch.setattr(rag, "_style_checked", set())
+    monkeypatch.setattr(rag, "STYLE_MAX_EXAMPLES", 5)
+    index = rag.ReplyMateRAG()
+    index.add_approved_replies([_approved_reply(i, "positive") for i in range(5)])
+    assert index._get_style_store()._collection.count() == 5
+
+    # 여유분(10%)을 넘으면 상한까지 줄임
+    index.add_approved_replies([_approved_reply(5 + i, "positive") for i in range(2)])
+    assert index._get_style_store()._collection.count() == 5
+    assert index.search_style_examples("리뷰", "positive", tone="친근한", k=5)
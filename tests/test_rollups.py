@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pytest
+from src import archive, data_manager, tenancy
+
+
+@pytest.fixture(autouse=True)
+def _no_reuse_index(monkeypatch):
+    # 승인 답글 임베딩은 이 테스트 범위 밖
+    monkeypatch.setattr(data_manager.reuse, "index_approved_reply", lambda review: None)
+
+
+def _review(review_id, timestamp, sentiment="positive", category="taste", menu="떡볶이"):
+    return {"id": review_id, "customer_name": "고객", "menu_name": menu, "review_text": "맛있어요",
+            "reply_text": "감사합니다", "tone": "친근한", "sentiment": sentiment, "category": category,
+            "timestamp": timestamp}
+
+
+def test_save_updates_rollup_rows(store):
+    data_manager.save_completed_review(_review("a", "2026-10-01 10:00:00"))
+    data_manager.save_completed_review(_review("b", "2026-10-01 12:00:00"))
+    data_manager.save_completed_review(_review("c", "2026-10-02 09:00:00", sentiment="negative"))
+
+    rows = data_manager.load_rollups()
+    assert rows["2026-10-01|positive|taste|떡볶이"] == {"count": 2, "latest": "2026-10-01 12:00:00"}
+    assert rows["2026-10-02|negative|taste|떡볶이"]["count"] == 1
+    daily = data_manager.query_daily_series()
+    assert daily["리뷰 수"].tolist() == [2, 1]
+    assert daily["부정 비율(%)"].tolist() == [0, 100]
+
+
+def test_period_uses_calendar_days(store):
+    now = pd.Timestamp("2026-10-07 09:30:00")
+    assert data_manager.period_start("오늘", now) == pd.Timestamp("2026-10-07")
+    assert data_manager.period_start("7일", now) == pd.Timestamp("2026-10-01")
+    assert data_manager.period_start("전체", now) is None
+
+    # 시작일 0시 직후 리뷰는 목록 지표와 일별 추이 모두에 포함
+    data_manager.save_completed_review(_review("a", "2026-09-30 23:59:00"))
+    data_manager.save_completed_review(_review("b", "2026-10-01 00:01:00", sentiment="negative"))
+    start = data_manager.period_start("7일", now)
+    df, _ = data_manager.generate_analytics_data(build_wordcloud=False, since=start)
+    metrics = data_manager.summarize_frame(df)
+    assert metrics["count"] == data_manager.query_daily_series(start)["리뷰 수"].sum() == 1
+    assert metrics["positive"] == 0
+    assert metrics["latest"] == pd.Timestamp("2026-10-01 00:01:00")
+
+
+def test_update_moves_count_and_recomputes_latest(store):
+    data_manager.save_completed_review(_review("a", "2026-10-01 10:00:00"))
+    data_manager.save_completed_review(_review("b", "2026-10-01 12:00:00"))
+
+    # 가장 최근 리뷰의 감정을 바꾸면 원래 행의 latest는 남은 리뷰 기준으로 돌아가야 함
+    data_manager.save_completed_review(_review("b", "2026-10-01 12:00:00", sentiment="negative"))
+
+    rows = data_manager.load_rollups()
+    assert rows["2026-10-01|positive|taste|떡볶이"] == {"count": 1, "latest": "2026-10-01 10:00:00"}
+    assert rows["2026-10-01|negative|taste|떡볶이"] == {"count": 1, "latest": "2026-10-01 12:00:00"}
+
+
+def test_incremental_rollups_match_rebuild(store):
+    for i in range(10):
+        data_manager.save_completed_review(
+            _review(f"r{i}", f"2026-{9 + i % 2:02d}-0{1 + i % 3} 1{i}:00:00",
+                    sentiment=("positive", "negative")[i % 2])
+        )
+    data_manager.save_completed_review(_review("r3", "2026-11-05 08:00:00", category="delivery"))
+
+    incremental = data_manager.load_rollups()
+    assert data_manager.rebuild_rollups() == incremental
+
+
+def test_review_without_timestamp_is_saved(store):
+    data_manager.save_completed_review(_review("a", None))
+    data_manager.save_completed_review(_review("b", "not a date"))
+
+    assert archive.count_reviews() == 2
+    assert data_manager.load_rollups() == {}
+
+
+def test_concurrent_saves_do_not_lose_updates(store):
+    def save(worker):
+        for j in range(15):
+            data_manager.save_completed_review(_review(f"{worker}-{j}", f"2026-10-0{1 + j % 3} 10:00:{worker:02d}"))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for future in [tenancy.submit(pool, save, w) for w in range(4)]:
+            future.result()
+
+    rows = data_manager.load_rollups()
+    assert sum(row["count"] for row in rows.values()) == 60
+    assert archive.count_reviews() == 60
@@ -0,0 +1,51 @@
+import time
+import pandas as pd
+from src import metrics, scheduler
+
+NOW = pd.Timestamp("2026-10-19 12:00:00")
+
+
+def test_priority_order():
+    pinned = scheduler.priority({"pinned": True, "rating": 5}, now=NOW)
+    negative = scheduler.priority({"rating": 5}, sentiment="negative", now=NOW)
+    one_star = scheduler.priority({"rating": 1}, now=NOW)
+    old = scheduler.priority({"rating": 5, "created_at": "2026-10-16 12:00:00"}, now=NOW)
+    fresh = scheduler.priority({"rating": 5}, now=NOW)
+
+    assert pinned > negative > one_star > old > fresh == 0
+
+
+def test_age_is_capped_and_tolerates_bad_dates():
+    month_old = scheduler.priority({"created_at": "2026-09-19 12:00:00"}, now=NOW)
+    assert month_old == scheduler.AGE_WEIGHT_PER_DAY * scheduler.AGE_CAP_DAYS
+    assert scheduler.priority({"created_at": "어제"}, now=NOW) == 0
+    # 시간대가 붙은 값도 비교 가능
+    assert scheduler.priority({"timestamp": "2026-10-18T12:00:00+00:00"}, now=NOW) > 0
+
+
+def test_prioritize_uses_prepass_labels_and_keeps_ties_stable():
+    reviews = [{"id": "a"}, {"id": "b"}, {"id": "c"}, {"id": "d", "rating": 2}]
+    ordered = scheduler.prioritize(reviews, labels={"c": "negative"})
+    assert [r["id"] for r in ordered] == ["c", "d", "a", "b"]
+
+
+def test_budget_exhausted():
+    assert scheduler.budget_exhausted(None, time.time() - 999, 999) is None
+    assert scheduler.budget_exhausted({"seconds": 10}, time.time() - 11, 0) == "time"
+    assert scheduler.budget_exhausted({"seconds": 10}, time.time(), 0) is None
+    # 아직 처리를 시작하지 않은 작업은 시간 예산이 줄지 않음
+    assert scheduler.budget_exhausted({"seconds": 10}, None, 0) is None
+    assert scheduler.budget_exhausted({"llm_calls": 3}, None, 3) == "llm_calls"
+
+
+def test_record_reply_measures_from_review_arrival():
+    arrived = (pd.Timestamp.now() - pd.Timedelta(hours=2)).isoformat()
+    scheduler.record_reply({"created_at": arrived}, "negative")
+    scheduler.record_reply({"created_at": arrived}, "positive")
+    # 들어온 시각을 모르는 리뷰는 기록하지 않음
+    scheduler.record_reply({}, "negative")
+
+    observations = metrics.snapshot()["observations"]
+    assert observations["batch.time_to_reply_ms"]["count"] == 2
+    assert observations["batch.negative_time_to_reply_ms"]["count"] == 1
+    assert 7190 < scheduler.negative_time_to_reply() < 7210
@@ -0,0 +1,57 @@
+import pytest
+from src import metrics, sentiment_cache
+from src.sentiment_cache import SentimentCache, text_key
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sentiment_cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(sentiment_cache, "CACHE_DB", tmp_path / "sentiment.sqlite")
+    monkeypatch.setattr(sentiment_cache, "_cache", None)
+    return tmp_path
+
+
+def test_normalized_text_hits_cache(cache_dir):
+    cache = SentimentCache(10, "kobert|local")
+    cache.put_many([(text_key("정말  맛있어요"), {"label": "positive", "score": 0.9})])
+
+    # 공백/전각/대소문자가 달라도 같은 리뷰로 봄
+    found = cache.get_many([text_key(" 정말 맛있어요\n"), text_key("별로예요")])
+    assert found == {text_key("정말 맛있어요"): {"label": "positive", "score": 0.9}}
+    assert text_key("ＯＫ 굿") == text_key("ok 굿")
+    counters = metrics.snapshot()["counters"]
+    assert counters["sentiment_cache.hits"] == 1
+    assert counters["sentiment_cache.misses"] == 1
+
+
+def test_least_recently_used_entry_is_dropped(cache_dir):
+    cache = SentimentCache(2, "kobert|local")
+    cache.put_many([("a", {"label": "positive", "score": 0.9}), ("b", {"label": "negative", "score": 0.8})])
+    cache.get_many(["a"])
+    cache.put_many([("c", {"label": "positive", "score": 0.7})])
+
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+
+
+def test_namespace_change_discards_entries(cache_dir, monkeypatch):
+    monkeypatch.setenv("SENTIMENT_CACHE_PERSIST", "1")
+    cache = sentiment_cache.get_cache("kobert|local")
+    cache.put_many([("a", {"label": "positive", "score": 0.9})])
+    cache.close()
+
+    # 같은 모델로 다시 열면 디스크 기록을 그대로 씀
+    reopened = SentimentCache(10, "kobert|local", persist=True)
+    assert reopened.get_many(["a"]) == {"a": {"label": "positive", "score": 0.9}}
+    reopened.close()
+
+    # 모델/백엔드가 바뀌면 메모리와 디스크 기록을 모두 버림
+    changed = sentiment_cache.get_cache("kobert|service")
+    assert changed is not cache
+    assert changed.get_many(["a"]) == {}
+    changed.close()
+    assert SentimentCache(10, "kobert|service", persist=True).get_many(["a"]) == {}
+
+
+def test_cache_can_be_disabled(cache_dir, monkeypatch):
+    monkeypatch.setenv("SENTIMENT_CACHE_SIZE", "0")
+    assert sentiment_cache.get_cache("kobert|local") is None
@@ -0,0 +1,114 @@
+import os
+import stat
+import sys
+import threading
+from multiprocessing.connection import Listener
+import pytest
+from src import sentiment_service
+
+
+@pytest.fixture
+def run_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sentiment_service, "RUN_DIR", tmp_path)
+    monkeypatch.setattr(sentiment_service, "ADDRESS_FILE", tmp_path / "sentiment.addr")
+    monkeypatch.delenv("SENTIMENT_AUTHKEY", raising=False)
+    monkeypatch.setattr(sentiment_service, "_client", None)
+    monkeypatch.setattr(sentiment_service, "_process", None)
+    return tmp_path
+
+
+def test_authkey_is_generated_per_launch(run_dir):
+    first, second = sentiment_service._new_authkey(), sentiment_service._new_authkey()
+    assert first != second and len(first) == 32
+
+    sentiment_service._publish_address("/tmp/sock", first)
+    assert sentiment_service._read_address() == ("/tmp/sock", first)
+    # 키가 담긴 파일은 소유자만 읽을 수 있음
+    assert stat.S_IMODE(os.stat(sentiment_service.ADDRESS_FILE).st_mode) == 0o600
+
+
+def test_authkey_from_environment_is_not_written(run_dir, monkeypatch):
+    monkeypatch.setenv("SENTIMENT_AUTHKEY", "shared-secret")
+    key = sentiment_service._new_authkey()
+    assert key == b"shared-secret"
+
+    sentiment_service._publish_address("/tmp/sock", key)
+    assert "authkey" not in sentiment_service.ADDRESS_FILE.read_text(encoding="utf-8")
+    assert sentiment_service._read_address() == ("/tmp/sock", key)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="unix socket")
+def test_client_connects_with_published_key(run_dir):
+    key = sentiment_service._new_authkey()
+    address = str(run_dir / "test.sock")
+    listener = Listener(address, authkey=key)
+
+    def serve():
+        conn = listener.accept()
+        req_id, texts = conn.recv()
+        conn.send((req_id, [{"label": "positive"} for _ in texts], None))
+
+    server = threading.Thread(target=serve, daemon=True)
+    server.start()
+    sentiment_service._publish_address(address, key)
+
+    client = sentiment_service._connect()
+    assert client.analyze(["맛있어요"], timeout=5) == [{"label": "positive"}]
+    client.close()
+    listener.close()
+
+    # 이전 실행의 키로는 연결되지 않음
+    sentiment_service._publish_address(address, sentiment_service._new_authkey())
+    assert sentiment_service._connect() is None
+
+
+class FakeProcess:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.started = 0
+
+    def start(self):
+        self.started += 1
+
+    def is_alive(self):
+        return self.started > 0
+
+
+def test_get_client_waits_for_startup_outside_lock(run_dir, monkeypatch):
+    processes = []
+
+    class Context:
+        def Process(self, **kwargs):
+            processes.append(FakeProcess(**kwargs))
+            return processes[-1]
+
+    ready = threading.Event()
+    waiting = threading.Event()
+    client = object()
+
+    def connect(wait_sec=0.0, process=None):
+        if not wait_sec:
+            return None
+        waiting.set()
+        assert ready.wait(5)
+        return client
+
+    monkeypatch.setattr(sentiment_service, "get_context", lambda method: Context())
+    monkeypatch.setattr(sentiment_service, "_connect", connect)
+
+    results = []
+    starter = threading.Thread(target=lambda: results.append(sentiment_service.get_client()))
+    starter.start()
+    assert waiting.wait(5)
+
+    # 모델을 불러오는 동안에도 잠금은 비어 있음
+    assert sentiment_service._client_lock.acquire(timeout=1)
+    sentiment_service._client_lock.release()
+    # 다른 호출은 이미 시작한 프로세스를 다시 띄우지 않음
+    assert sentiment_service.get_client(start=False) is None
+
+    ready.set()
+    starter.join(timeout=5)
+    assert results == [client]
+    assert len(processes) == 1 and processes[0].started == 1
+    assert len(processes[0].kwargs["args"][0]) == 32
@@ -0,0 +1,86 @@
+import time
+from datetime import datetime
+import pytest
+from src import archive, data_manager, snapshot
+
+pytestmark = pytest.mark.skipif(not snapshot.is_available(), reason="pyarrow not installed")
+
+
+@pytest.fixture
+def kst(monkeypatch):
+    # tz가 붙은 값은 로컬 시간으로 바뀌므로 시스템 시간대를 고정
+    monkeypatch.setenv("TZ", "Asia/Seoul")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_to_table_tolerates_bad_timestamps(capsys, kst):
+    table = snapshot._to_table([
+        {"id": "a", "timestamp": "2026-10-01 12:00:00"},
+        {"id": "b"},
+        {"id": "c", "timestamp": "not a date"},
+        {"id": "d", "timestamp": "2026-10-01T12:00:00+09:00"},
+    ])
+
+    assert table.column("timestamp").to_pylist() == [
+        datetime(2026, 10, 1, 12), None, None, datetime(2026, 10, 1, 12)
+    ]
+    assert "[WARN]" in capsys.readouterr().out
+
+
+def test_append_and_load_snapshot(store):
+    reviews = [{"id": f"r{i}", "review_text": "맛있어요", "sentiment": "positive",
+                "timestamp": f"2026-10-0{i + 1} 10:00:00"} for i in range(3)]
+    # 스냅샷은 아카이브 manifest의 파티션 목록을 따라 읽음
+    for review in reviews:
+        archive.upsert_review(review)
+    snapshot.rebuild_snapshot(reviews[:2])
+    snapshot.append_review(reviews[2])
+    # 같은 ID를 다시 저장하면 최신 값 하나만 남음
+    snapshot.append_review({**reviews[0], "sentiment": "negative"})
+
+    df = snapshot.load_snapshot().set_index("id")
+    assert sorted(df.index) == ["r0", "r1", "r2"]
+    assert df.loc["r0", "sentiment"] == "negative"
+
+
+def test_tz_aware_timestamps_use_local_time_everywhere(store, kst, monkeypatch):
+    monkeypatch.setattr(data_manager.reuse, "index_approved_reply", lambda review: None)
+    snapshot.rebuild_snapshot([])
+    # UTC 9월 30일 20시 = 한국 시간 10월 1일 5시
+    review = {"id": "a", "review_text": "맛있어요", "sentiment": "positive", "timestamp": "2026-09-30T20:00:00+00:00"}
+    data_manager.save_completed_review(review)
+
+    assert archive.partition_key(review) == "2026-10"
+    assert list(data_manager.load_rollups()) == ["2026-10-01|positive|unknown|"]
+    start = data_manager.period_start("오늘", "2026-10-01 09:00:00")
+    df = snapshot.load_snapshot(start)
+    assert df["timestamp"].tolist() == [datetime(2026, 10, 1, 5)]
+    assert [r["id"] for r in archive.load_reviews(start)] == ["a"]
+
+
+def test_load_retries_when_compaction_removes_deltas(store, monkeypatch):
+    reviews = [{"id": f"r{i}", "review_text": "맛있어요", "timestamp": f"2026-10-0{i + 1} 10:00:00"} for i in range(4)]
+    for review in reviews:
+        archive.upsert_review(review)
+    snapshot.rebuild_snapshot(reviews[:1])
+    for review in reviews[1:]:
+        snapshot.append_review(review)
+
+    # 다른 세션이 delta 목록을 만든 직후 compaction을 끝낸 상황 재현
+    read_mapped = snapshot._read_mapped
+    compacted = []
+
+    def racing_read(path):
+        if not compacted and path.name.startswith(snapshot.DELTA_PREFIX):
+            compacted.append(path)
+            snapshot.compact("2026-10")
+        return read_mapped(path)
+
+    monkeypatch.setattr(snapshot, "_read_mapped", racing_read)
+    df = snapshot.load_snapshot()
+
+    assert compacted and not snapshot._delta_files("2026-10")
+    assert sorted(df["id"]) == ["r0", "r1", "r2", "r3"]
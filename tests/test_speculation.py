@@ -0,0 +1,71 @@
+import pytest
+
+pytest.importorskip("transformers")
+
+from src import workflow  # noqa: E402
+
+
+class Gateway:
+    def __init__(self, spare):
+        self.spare = spare
+
+    def has_spare_capacity(self):
+        return self.spare
+
+
+@pytest.fixture
+def nodes(monkeypatch):
+    drafts = []
+    monkeypatch.setattr(workflow, "sentiment_branch_node", lambda state: {
+        "kobert_sentiment": "positive", "retrieved_templates": ["감사합니다"], "trace": []})
+    monkeypatch.setattr(workflow, "menu_node", lambda state: {"retrieved_menus": ["떡볶이"], "trace": []})
+
+    def generate_node(state):
+        drafts.append(state["sentiment"])
+        return {"final_reply": "추측 답글", "trace": []}
+
+    monkeypatch.setattr(workflow, "generate_node", generate_node)
+
+    def analysis(sentiment):
+        monkeypatch.setattr(workflow, "llm_analyze_node", lambda state: {
+            "category": "taste_good", "extracted_menu": "null", "llm_sentiment": sentiment, "trace": []})
+
+    def gateway(spare):
+        monkeypatch.setattr(workflow, "get_gateway", lambda: Gateway(spare))
+
+    return drafts, analysis, gateway
+
+
+STATE = {"review_text": "맛있어요", "customer_name": "고객", "manual_menu": "", "tone": "친근한"}
+
+
+def test_speculates_when_gateway_has_spare_capacity(nodes):
+    drafts, analysis, gateway = nodes
+    analysis("positive")
+    gateway(True)
+
+    result = workflow.speculative_branch_node(dict(STATE))
+    assert drafts == ["positive"]
+    assert result["speculative_reply"] == "추측 답글"
+
+
+def test_mismatch_discards_draft(nodes):
+    drafts, analysis, gateway = nodes
+    analysis("negative")
+    gateway(True)
+
+    result = workflow.speculative_branch_node(dict(STATE))
+    assert "speculative_reply" not in result
+    assert result["speculation"] == {"aborted": "sentiment"}
+
+
+def test_busy_gateway_skips_speculation(nodes):
+    drafts, analysis, gateway = nodes
+    analysis("positive")
+    gateway(False)
+
+    result = workflow.speculative_branch_node(dict(STATE))
+    assert drafts == []
+    assert "speculative_reply" not in result and "speculation" not in result
+    assert result["llm_sentiment"] == "positive"
+    assert workflow.metrics.snapshot()["counters"]["speculation.skipped"] == 1
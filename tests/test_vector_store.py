@@ -0,0 +1,132 @@
+import threading
+import numpy as np
+import pytest
+from src.vector_store import NumpyVectorStore
+
+VECTORS = {
+    "a": [1.0, 0.0, 0.0],
+    "b": [0.8, 0.6, 0.0],
+    "c": [0.0, 1.0, 0.0],
+    "d": [0.0, 0.0, 2.0],
+}
+METAS = {
+    "a": {"type": "menu"},
+    "b": {"type": "template", "tone": "friendly"},
+    "c": {"type": "template", "tone": "polite"},
+    "d": {"type": "menu"},
+}
+
+
+@pytest.fixture
+def vectors(tmp_path):
+    store = NumpyVectorStore(tmp_path / "kb")
+    ids = list(VECTORS)
+    store.upsert(ids, [VECTORS[i] for i in ids], [f"doc {i}" for i in ids], [METAS[i] for i in ids])
+    return store
+
+
+def _ids(store, results):
+    ids = store.snapshot().ids
+    return [ids[row] for row, _ in results]
+
+
+def test_top_k_is_sorted_by_cosine(vectors):
+    results = vectors.search_by_vector([1.0, 0.1, 0.0], k=3)
+    assert _ids(vectors, results) == ["a", "b", "c"]
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    # 저장 시 정규화되므로 길이가 다른 벡터도 코사인 1.0
+    assert vectors.search_by_vector([0.0, 0.0, 5.0], k=1)[0][1] == pytest.approx(1.0)
+
+
+def test_filtered_top_k(vectors):
+    results = vectors.search_by_vector([1.0, 0.0, 0.0], k=5, filter={"type": "template"})
+    assert _ids(vectors, results) == ["b", "c"]
+    where = {"$and": [{"type": {"$eq": "template"}}, {"tone": {"$in": ["polite"]}}]}
+    assert _ids(vectors, vectors.search_by_vector([1.0, 0.0, 0.0], k=5, filter=where)) == ["c"]
+    assert vectors.search_by_vector([1.0, 0.0, 0.0], filter={"type": "review"}) == []
+    with pytest.raises(ValueError):
+        vectors.get(where={"type": {"$gt": 1}})
+
+
+def test_upsert_replaces_and_delete_removes(vectors):
+    vectors.upsert(["a"], [[0.0, 1.0, 0.0]], ["new a"], [{"type": "menu"}])
+    assert vectors.count() == 4
+    assert vectors.get(ids=["a"])["documents"] == ["new a"]
+
+    vectors.delete(["c", "missing"])
+    assert vectors.count() == 3
+    assert vectors.get(where={"type": "template"})["ids"] == ["b"]
+    assert _ids(vectors, vectors.search_by_vector([0.0, 1.0, 0.0], k=1)) == ["a"]
+
+
+def test_persist_round_trip(vectors, tmp_path):
+    vectors.persist()
+    reloaded = NumpyVectorStore(tmp_path / "kb")
+
+    assert reloaded.count() == 4
+    assert reloaded.get(ids=["b"])["metadatas"] == [METAS["b"]]
+    np.testing.assert_allclose(
+        reloaded.get(ids=["d"], include=["embeddings"])["embeddings"], [[0.0, 0.0, 1.0]]
+    )
+    assert _ids(reloaded, reloaded.search_by_vector([0.0, 1.0, 0.0], k=2)) == ["c", "b"]
+
+
+def test_readers_see_whole_snapshots_during_writes(vectors):
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        while not stop.is_set():
+            try:
+                for row, _ in vectors.search_by_vector([1.0, 0.0, 0.0], k=2, filter={"type": "menu"}):
+                    assert row < len(vectors.snapshot().ids)
+                result = vectors.get(where={"type": "menu"})
+                assert len(result["ids"]) == len(result["documents"]) == len(result["metadatas"])
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(200):
+        vectors.upsert([f"m{i}"], [[1.0, 0.0, float(i)]], [f"doc m{i}"], [{"type": "menu"}])
+        if i % 3 == 0:
+            vectors.delete([f"m{i}"])
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert vectors.count() == 4 + 200 - 67
+
+
+def test_persist_keeps_rows_written_by_another_instance(vectors, tmp_path):
+    vectors.persist()
+    other = NumpyVectorStore(tmp_path / "kb")
+
+    other.upsert(["e"], [[1.0, 1.0, 0.0]], ["doc e"], [{"type": "menu"}])
+    other.persist()
+    # 먼저 연 인스턴스가 예전 파일을 덮어쓰지 않고 e 위에 자기 변경을 얹음
+    vectors.upsert(["f"], [[0.0, 1.0, 1.0]], ["doc f"], [{"type": "menu"}])
+    vectors.delete(["a"])
+    vectors.persist()
+
+    reloaded = NumpyVectorStore(tmp_path / "kb")
+    assert sorted(reloaded.get()["ids"]) == ["b", "c", "d", "e", "f"]
+    assert other.count() == 5
+
+
+def test_unpersisted_changes_survive_a_reload(vectors, tmp_path):
+    vectors.persist()
+    vectors.upsert(["f"], [[0.0, 1.0, 1.0]], ["doc f"], [{"type": "menu"}])
+
+    other = NumpyVectorStore(tmp_path / "kb")
+    other.delete(["b"])
+    other.persist()
+
+    # 다른 인스턴스의 기록을 읽어도 아직 기록하지 않은 f는 남아 있음
+    assert sorted(vectors.get()["ids"]) == ["a", "c", "d", "f"]
+    vectors.persist()
+    assert sorted(NumpyVectorStore(tmp_path / "kb").get()["ids"]) == ["a", "c", "d", "f"]
@@ -0,0 +1,81 @@
+import json
+import os
+import pytest
+from src import rag, watcher
+
+
+class FakeIndexer:
+    def __init__(self):
+        self.reasons = []
+
+    def notify(self, reason=""):
+        self.reasons.append(reason)
+        return len(self.reasons)
+
+
+class FakeEmbeddings:
+    is_remote = False
+
+
+@pytest.fixture
+def data(store, monkeypatch):
+    notified = FakeIndexer()
+    monkeypatch.setattr(rag, "get_embeddings", lambda: FakeEmbeddings())
+    monkeypatch.setattr(watcher, "get_indexer", lambda store_id=None: notified)
+    monkeypatch.setattr(watcher.DataWatcher, "_start_observer", lambda self: None)
+    # 감시 스레드는 테스트 중에 깨어나지 않도록 하고 check()를 직접 호출
+    monkeypatch.setattr(watcher, "POLL_INTERVAL_SEC", 3600)
+    _write(store / "templates.json", [{"content": "감사합니다!", "metadata": {"sentiment": "positive"}}])
+    _write(store / "menu_info.json", [{"menu_name": "떡볶이", "description": "매콤"}])
+    return store, notified
+
+
+_stamp = [1_700_000_000_000_000_000]
+
+
+def _write(path, value, indent=None, raw=None):
+    path.write_text(raw if raw is not None else json.dumps(value, ensure_ascii=False, indent=indent),
+                    encoding="utf-8")
+    # 빠르게 연달아 써도 수정 시각이 달라지도록
+    _stamp[0] += 1_000_000
+    os.utime(path, ns=(_stamp[0], _stamp[0]))
+
+
+def test_only_record_changes_trigger_rebuild(data):
+    store, notified = data
+    data_watcher = watcher.DataWatcher()
+    assert data_watcher.check() is None
+
+    # 서식만 바뀐 저장은 문서가 같으므로 무시
+    _write(store / "menu_info.json", [{"menu_name": "떡볶이", "description": "매콤"}], indent=2)
+    assert data_watcher.check() is None
+
+    _write(store / "menu_info.json", [{"menu_name": "떡볶이", "description": "매콤"},
+                                      {"menu_name": "순대", "description": "쫄깃"}])
+    assert data_watcher.check() == 1
+    _write(store / "menu_info.json", [{"menu_name": "떡볶이", "description": "아주 매콤"},
+                                      {"menu_name": "순대", "description": "쫄깃"}])
+    assert data_watcher.check() == 2
+    assert notified.reasons == ["external edit: menu_info.json +1 -0", "external edit: menu_info.json +1 -1"]
+
+
+def test_half_written_file_is_read_again_later(data):
+    store, notified = data
+    data_watcher = watcher.DataWatcher()
+
+    _write(store / "templates.json", None, raw='[{"content": "감사')
+    assert data_watcher.check() is None
+    (store / "templates.json").unlink()
+    assert data_watcher.check() is None
+
+    _write(store / "templates.json", [{"content": "또 오세요!", "metadata": {}}])
+    assert data_watcher.check() == 1
+    assert notified.reasons == ["external edit: templates.json +1 -1"]
+
+
+def test_changes_while_stopped_are_caught_up(data, monkeypatch):
+    store, notified = data
+    monkeypatch.setattr(rag.ReplyMateRAG, "active_version", lambda self: "old-version")
+    watcher.DataWatcher()
+    assert len(notified.reasons) == 1
+    assert notified.reasons[0].startswith("data files changed while stopped (old-version -> ")
@@ -0,0 +1,96 @@
+import time
+import pytest
+
+pytest.importorskip("transformers")
+
+from src import workflow  # noqa: E402
+
+
+class PrepareApp:
+    """분석/검색 단계 대신 리뷰에 적힌 감정을 그대로 돌려줌"""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+
+    def invoke(self, state):
+        time.sleep(self.delays.get(state["review_id"], 0))
+        return {**state, "sentiment": state["review_text"].split(":")[0], "category": None,
+                "retrieved_templates": [], "extracted_menu": "null"}
+
+
+def _reviews(*specs):
+    return [{"id": f"r{i}", "text": f"{sentiment}:리뷰 {i}", "customer_name": "고객"}
+            for i, sentiment in enumerate(specs)]
+
+
+@pytest.fixture
+def slow_groups(store, monkeypatch):
+    """감정별 묶음 생성 시간을 정해 두는 가짜 generate_batch"""
+    delays = {}
+
+    def generate_batch(states, priority="batch"):
+        time.sleep(delays.get(states[0]["sentiment"], 0))
+        return [{**s, "final_reply": f"답글 {s['review_id']}", "reply_source": "llm"} for s in states]
+
+    monkeypatch.setattr(workflow, "generate_batch", generate_batch)
+    monkeypatch.setattr(workflow, "DEADLINE_SEC", 0.2)
+    monkeypatch.setattr(workflow, "GROUP_DEADLINE_PER_REVIEW_SEC", 0.3)
+    return delays
+
+
+def test_group_budget_scales_with_group_size(slow_groups):
+    # 묶음 3건: 0.2 + 0.3 * 2 = 0.8초까지 허용 (리뷰 1건 기준 0.2초보다 오래 걸려도 성공)
+    slow_groups["positive"] = 0.5
+    outcomes = workflow.run_reviews(PrepareApp(), _reviews("positive", "positive", "positive"), "가게", "친근한")
+
+    assert [outcomes[f"r{i}"]["reply_source"] for i in range(3)] == ["llm"] * 3
+    assert workflow.group_deadline(3, 0.2) == pytest.approx(0.8)
+
+
+def test_slow_group_falls_back_without_affecting_other_groups(slow_groups):
+    slow_groups["negative"] = 1.5
+    outcomes = workflow.run_reviews(PrepareApp(), _reviews("negative", "negative", "positive"), "가게", "친근한")
+
+    assert outcomes["r0"]["reply_source"] == outcomes["r1"]["reply_source"] == "fallback"
+    assert outcomes["r0"]["sentiment"] == "negative"
+    assert outcomes["r2"]["final_reply"] == "답글 r2"
+
+
+def test_each_review_gets_its_own_budget_from_dispatch(slow_groups):
+    # 한 번에 1건씩 처리해도 차례를 기다린 시간은 예산에 들어가지 않음 (0.15초씩 x 3 > 0.2초)
+    app = PrepareApp({"r0": 0.15, "r1": 0.15, "r2": 0.15})
+    outcomes = workflow.run_reviews(app, _reviews("positive", "positive", "positive"), "가게", "친근한",
+                                    max_workers=1)
+    assert [outcomes[f"r{i}"]["reply_source"] for i in range(3)] == ["llm"] * 3
+
+
+def test_slow_review_falls_back_to_template(slow_groups):
+    app = PrepareApp({"r1": 1.0})
+    outcomes = workflow.run_reviews(app, _reviews("positive", "negative"), "가게", "친근한",
+                                    kobert_labels={"r1": "negative"})
+
+    assert outcomes["r0"]["final_reply"] == "답글 r0"
+    assert outcomes["r1"]["reply_source"] == "fallback"
+    assert outcomes["r1"]["sentiment"] == "negative"
+    assert outcomes["r1"]["final_reply"]
+
+
+def test_reuse_lookup_runs_inside_the_budget(slow_groups, monkeypatch):
+    def find_reusable_reply(review, tone):
+        if review["id"] == "r0":
+            time.sleep(1.0)
+        if review["id"] == "r1":
+            return {"final_reply": "재사용 답글", "sentiment": "unknown", "category": None,
+                    "extracted_menu": "null", "reply_source": "reuse", "reuse_score": 0.99}
+        return None
+
+    monkeypatch.setattr(workflow, "find_reusable_reply", find_reusable_reply)
+    outcomes = workflow.run_reviews(PrepareApp(), _reviews("positive", "positive", "positive"), "가게", "친근한",
+                                    reuse_mode="confirm", kobert_labels={"r0": "positive", "r1": "positive"})
+
+    assert outcomes["r0"]["reply_source"] == "fallback"
+    assert outcomes["r1"]["final_reply"] == "재사용 답글"
+    assert outcomes["r1"]["reuse_pending"] is True
+    # 재사용한 답글의 감정은 이 리뷰의 KoBERT 결과
+    assert outcomes["r1"]["sentiment"] == "positive"
+    assert outcomes["r2"]["reply_source"] == "llm"